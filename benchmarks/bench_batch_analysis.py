@@ -0,0 +1,94 @@
+# Benchmark + equivalence check: analyze_chords_batch vs get_chord_name
+# Run from the repo root: python benchmarks/bench_batch_analysis.py  (needs numpy)
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import chord_suggester as cs
+
+
+def batch_names(chord_ids, roots, count, basses, tonic_note, mode, prefer_flats):
+    names = []
+    for chord_id, root, n, bass in zip(chord_ids, roots, count, basses):
+        if n < 3:
+            names.append(None)
+        elif chord_id < 0:
+            names.append("Unrecognized chord")
+        else:
+            names.append(cs.format_chord_name(int(root), int(chord_id), tonic_note, mode, prefer_flats,
+                                              bass if bass != root else None))
+    return names
+
+
+def check_masks():
+    """All 4096 packed masks, every tonic and mode, against the scalar recognizer."""
+    masks = np.arange(4096, dtype=np.uint16)
+    count = [bin(m).count('1') for m in range(4096)]
+    basses = [(m & -m).bit_length() - 1 for m in range(4096)]
+    for mode in cs.mode_intervals:
+        for tonic_note in range(12):
+            chord_ids, roots, degrees = cs.analyze_chords_batch(masks, tonic_note, mode)
+            names = batch_names(chord_ids, roots, count, basses, tonic_note, mode, False)
+            for mask, name, root, degree in zip(range(4096), names, roots, degrees):
+                notes = {60 + pc for pc in range(12) if mask >> pc & 1}
+                expected = cs.get_chord_name(notes, False, tonic_note, mode)
+                assert name == expected, (mode, tonic_note, mask, name, expected)
+                if root >= 0:
+                    assert degree == cs.get_scale_degree_name(int(root), tonic_note, mode)
+
+
+def random_voicings(n, rng):
+    matrix = np.zeros((n, 128), dtype=bool)
+    for row in range(n):
+        size = rng.integers(1, 8)
+        matrix[row, rng.choice(np.arange(24, 100), size=size, replace=False)] = True
+    return matrix
+
+
+def check_voicings(matrix, tonic_note, mode):
+    chord_ids, roots, _ = cs.analyze_chords_batch(matrix, tonic_note, mode)
+    count = matrix.sum(axis=1)
+    basses = [int(row.argmax()) % 12 for row in matrix]
+    names = batch_names(chord_ids, roots, count, basses, tonic_note, mode, False)
+    for row, name in zip(matrix, names):
+        expected = cs.get_chord_name(set(np.flatnonzero(row).tolist()), False, tonic_note, mode)
+        assert name == expected, (np.flatnonzero(row), name, expected)
+
+
+def main():
+    check_masks()
+    print("✅ packed masks match get_chord_name for every tonic and mode")
+
+    rng = np.random.default_rng(0)
+    check_voicings(random_voicings(20000, rng), 2, 'dorian')
+    print("✅ (N x 128) voicings match get_chord_name")
+
+    matrix = random_voicings(200000, rng)
+    note_sets = [set(np.flatnonzero(row).tolist()) for row in matrix]
+
+    start = time.perf_counter()
+    for notes in note_sets:
+        cs.get_chord_name(notes, False, 0, 'ionian')
+    scalar = len(note_sets) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    cs.analyze_chords_batch(matrix, 0, 'ionian')
+    batch = len(matrix) / (time.perf_counter() - start)
+
+    masks = cs.pack_pitch_classes(matrix)
+    start = time.perf_counter()
+    cs.analyze_chords_batch(masks, 0, 'ionian')
+    packed = len(masks) / (time.perf_counter() - start)
+
+    print(f"🐢 get_chord_name loop:     {scalar:,.0f} voicings/s")
+    print(f"🚀 batch (N x 128 matrix):  {batch:,.0f} voicings/s")
+    print(f"🚀 batch (packed uint16):   {packed:,.0f} voicings/s")
+
+
+if __name__ == '__main__':
+    main()
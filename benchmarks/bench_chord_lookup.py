@@ -0,0 +1,174 @@
+# Benchmark: table-driven get_chord_name vs the old per-root if/elif chain, plus
+# sanity checks on the chord dictionary that replaced it
+# Run from the repo root: python benchmarks/bench_chord_lookup.py
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import chord_suggester as cs
+from chord_suggester import note_name, get_scale_degree_name
+
+
+# The recognizer as it was before the lookup table, kept here as the baseline
+
+def legacy_get_chord_name(notes, prefer_flats, tonic_note, mode):
+    if len(notes) < 3:
+        return None
+
+    sorted_notes = sorted(notes)
+    best_match = None
+
+    for try_root in sorted_notes:
+        intervals = sorted([(n - try_root) % 12 for n in sorted_notes])
+        chord_name = note_name(try_root, prefer_flats)
+        degree = get_scale_degree_name(try_root, tonic_note, mode)
+
+        # --- EXTENDED CHORDS ---
+        if set(intervals) >= {0, 3, 7, 10, 2}:  # m9
+            best_match = f"{chord_name}m9 ({degree})" if degree else f"{chord_name}m9"
+        elif set(intervals) >= {0, 3, 7, 10, 5}:  # m11
+            best_match = f"{chord_name}m11 ({degree})" if degree else f"{chord_name}m11"
+        elif set(intervals) >= {0, 4, 7, 11, 2}:  # maj9
+            best_match = f"{chord_name}maj9 ({degree})" if degree else f"{chord_name}maj9"
+        elif set(intervals) >= {0, 4, 7, 10, 1}:  # 7♭9
+            best_match = f"{chord_name}7♭9 ({degree})" if degree else f"{chord_name}7♭9"
+        elif set(intervals) >= {0, 4, 7, 10, 3}:  # 7♯9
+            best_match = f"{chord_name}7♯9 ({degree})" if degree else f"{chord_name}7♯9"
+        elif set(intervals) >= {0, 4, 7, 11, 6}:  # maj7♯11
+            best_match = f"{chord_name}maj7♯11 ({degree})" if degree else f"{chord_name}maj7♯11"
+        elif set(intervals) >= {0, 4, 7, 10, 9}:  # 13
+            best_match = f"{chord_name}13 ({degree})" if degree else f"{chord_name}13"
+
+        # --- SEVENTH CHORDS ---
+        elif intervals == [0, 4, 7, 10]:
+            best_match = f"{chord_name}7 ({degree})" if degree else f"{chord_name}7"
+        elif intervals == [0, 4, 7, 11]:
+            best_match = f"{chord_name}maj7 ({degree})" if degree else f"{chord_name}maj7"
+        elif intervals == [0, 3, 7, 10]:
+            best_match = f"{chord_name}m7 ({degree})" if degree else f"{chord_name}m7"
+        elif intervals == [0, 3, 6, 10]:
+            best_match = f"{chord_name}m7♭5 ({degree})" if degree else f"{chord_name}m7♭5"
+
+        # --- TRIADS ---
+        elif intervals == [0, 4, 7]:
+            best_match = f"{chord_name} ({degree})" if degree else f"{chord_name} major"
+        elif intervals == [0, 3, 7]:
+            best_match = f"{chord_name} ({degree})" if degree else f"{chord_name} minor"
+        elif intervals == [0, 3, 6]:
+            best_match = f"{chord_name} ({degree})" if degree else f"{chord_name} diminished"
+
+        if best_match:
+            break
+
+    return best_match or "Unrecognized chord"
+
+
+def check_spec():
+    """Every dictionary entry's tones agree with the intervals the Chord it names is voiced with."""
+    for quality, extensions, tones, _, _ in cs.CHORD_PATTERNS:
+        required, optional = cs.parse_tones(tones)
+        voiced = {i % 12 for i in cs.chord_intervals(quality, extensions)}
+        assert set(required) <= voiced <= set(required) | set(optional), (tones, sorted(voiced))
+
+
+def check_round_trip():
+    """Every chord the engine can suggest, played in root position, is recognized as itself."""
+    combos = {(q, e) for q, e, _, _, _ in cs.CHORD_PATTERNS} | set(cs.altered_dominants) | set(cs.jazz_resolutions)
+    combos |= {v for table in (cs.jazz_voicings, cs.jazz_spice) for options in table.values() for v in options}
+    combos |= {(q, 0) for q in cs.plain_qualities.values()}
+    for quality, extensions in combos:
+        for root in range(12):
+            notes = {48 + root + i for i in cs.chord_intervals(quality, extensions)}
+            chord = cs.recognize_chord(notes, 0, 'ionian')
+            assert chord is cs.chord_in_key(root, quality, extensions, 0, 'ionian'), (sorted(notes), chord)
+    return len(combos)
+
+
+def check_name_round_trip():
+    """Every diatonic chord (plain and voiced) reads back as itself from its name, in every key and mode."""
+    checked = 0
+    for mode in cs.mode_intervals:
+        for tonic in cs.root_names:
+            for prefer_flats in (False, True):
+                engine = cs.get_suggestion_engine(tonic, mode, 'jazz', prefer_flats)
+                for chord in engine.plain_chords + [c for options in engine.jazz_voicings for c in options]:
+                    name = chord.describe(mode, prefer_flats)
+                    parsed = cs.parse_chord(name, engine.tonic_index, mode, prefer_flats)
+                    assert parsed is chord, (tonic, mode, name, parsed)
+                    checked += 1
+    return checked
+
+
+def check_against_legacy():
+    """
+    Every pitch-class mask, every tonic, every mode, both spellings: whatever the old
+    recognizer named is still named, and root-position triads and sevenths read the same.
+    """
+    checked = newly_named = 0
+    for mode in cs.mode_intervals:
+        for tonic_note in range(12):
+            for prefer_flats in (False, True):
+                for mask in range(4096):
+                    notes = {60 + pc for pc in range(12) if mask >> pc & 1}
+                    expected = legacy_get_chord_name(notes, prefer_flats, tonic_note, mode)
+                    got = cs.get_chord_name(notes, prefer_flats, tonic_note, mode)
+                    if expected != "Unrecognized chord" and got == "Unrecognized chord":
+                        raise AssertionError(f"{mode} {tonic_note} {sorted(notes)}: no longer named ({expected!r})")
+                    newly_named += expected == "Unrecognized chord" and got != expected
+                    checked += 1
+
+                for quality in (cs.MAJOR, cs.MINOR, cs.DIMINISHED, cs.DOMINANT7, cs.MAJOR7, cs.MINOR7,
+                                cs.HALF_DIMINISHED7):
+                    for root in range(12):
+                        notes = {48 + root + i for i in cs.quality_intervals[quality]}
+                        expected = legacy_get_chord_name(notes, prefer_flats, tonic_note, mode)
+                        got = cs.get_chord_name(notes, prefer_flats, tonic_note, mode)
+                        if got != expected:
+                            raise AssertionError(f"{mode} {tonic_note} {sorted(notes)}: {got!r} != {expected!r}")
+                        checked += 1
+    return checked, newly_named
+
+
+def lookups_per_second(fn, voicings, tonic_note, mode, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for notes in voicings:
+            fn(notes, False, tonic_note, mode)
+        best = min(best, time.perf_counter() - start)
+    return len(voicings) / best
+
+
+def main():
+    start = time.perf_counter()
+    cs.chord_quality_table()
+    cs.chord_name_table(0, 'ionian', False)
+    print(f"🧱 Table build (first key): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    check_spec()
+    print(f"✅ {len(cs.CHORD_PATTERNS)} dictionary entries agree with chord_intervals")
+    print(f"✅ {check_round_trip()} chord shapes the engine can suggest are recognized back in all 12 roots")
+    print(f"✅ {check_name_round_trip():,} diatonic chord names parse back to the same chord")
+    checked, newly_named = check_against_legacy()
+    print(f"✅ {checked:,} lookups: nothing the old recognizer named is lost, root-position triads and sevenths "
+          f"read the same")
+    print(f"📖 {newly_named:,} (mask, key, spelling) lookups the old recognizer couldn't name now are")
+
+    rng = random.Random(1)
+    voicings = []
+    for _ in range(20000):
+        pcs = rng.sample(range(12), rng.randint(3, 6))
+        voicings.append({48 + rng.randint(0, 2) * 12 + pc for pc in pcs})
+
+    old = lookups_per_second(legacy_get_chord_name, voicings, 0, 'ionian')
+    new = lookups_per_second(cs.get_chord_name, voicings, 0, 'ionian')
+    print(f"🐢 if/elif chain: {old:,.0f} lookups/s")
+    print(f"🚀 lookup table:  {new:,.0f} lookups/s  ({new / old:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
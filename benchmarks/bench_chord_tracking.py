@@ -0,0 +1,157 @@
+# How many get_chord_name calls does ChordState save on a real-ish performance?
+# Run from the repo root: python benchmarks/bench_chord_tracking.py [--midi recording.mid] [--debounce-ms 30]
+# Without --midi, a humanized performance is generated: rolled chords, re-struck notes,
+# octave doublings, sustain pedal and aftertouch.
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import mido
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import chord_suggester as cs
+
+
+def humanized_performance(bars, rng):
+    """(seconds, message) pairs."""
+    scale = cs.mode_intervals['ionian']
+    events, t = [], 0.0
+    for _ in range(bars):
+        degree = rng.randrange(7)
+        chord = [48 + scale[(degree + s) % 7] + 12 * ((degree + s) // 7) for s in (0, 2, 4, 6)[:rng.randint(3, 4)]]
+        chord.append(chord[0] + 12)  # octave doubling
+        events.append((t, mido.Message('control_change', control=64, value=127)))
+        for note in chord:  # rolled
+            t += rng.uniform(0.005, 0.04)
+            events.append((t, mido.Message('note_on', note=note, velocity=rng.randint(60, 100))))
+        for _ in range(rng.randint(5, 20)):
+            t += rng.uniform(0.01, 0.05)
+            events.append((t, mido.Message('aftertouch', value=rng.randint(0, 127))))
+        for _ in range(rng.randint(0, 2)):  # re-strike a held note
+            t += rng.uniform(0.05, 0.2)
+            events.append((t, mido.Message('note_on', note=rng.choice(chord), velocity=70)))
+        t += rng.uniform(0.3, 1.0)
+        for note in chord:
+            events.append((t, mido.Message('note_off', note=note)))
+            t += rng.uniform(0.0, 0.01)
+        events.append((t, mido.Message('control_change', control=64, value=0)))
+    return events
+
+
+def load_performance(path):
+    events, t = [], 0.0
+    for msg in mido.MidiFile(path):
+        t += msg.time
+        if not msg.is_meta:
+            events.append((t, msg))
+    return events
+
+
+def old_loop(events):
+    """The original loop: name the chord on every message while 3+ notes are held."""
+    active_notes, calls, changes, last = set(), 0, [], None
+    for _, msg in events:
+        if msg.type == 'note_on' and msg.velocity > 0:
+            active_notes.add(msg.note)
+        elif msg.type == 'note_off' or (msg.type == 'note_on' and msg.velocity == 0):
+            active_notes.discard(msg.note)
+        if len(active_notes) >= 3:
+            calls += 1
+            chord = cs.get_chord_name(active_notes, False, 0, 'ionian')
+            if chord != last:
+                changes.append(chord)
+                last = chord
+    return calls, changes
+
+
+def tracked(events):
+    """ChordState: name the chord only when its signature changes. Returns change times too."""
+    state, last_signature, last = cs.ChordState(), None, None
+    calls, changes, change_times = 0, [], []
+    for t, msg in events:
+        if state.apply(msg) is None:
+            continue
+        signature = state.signature()
+        if signature is None or signature == last_signature:
+            continue
+        last_signature = signature
+        calls += 1
+        change_times.append(t)
+        chord = cs.get_chord_name(state.notes, False, 0, 'ionian')
+        if chord != last:
+            changes.append(chord)
+            last = chord
+    return calls, changes, change_times
+
+
+def debounced_calls(change_times, window):
+    """
+    A change is only analyzed if nothing else changes within `window` seconds after it, or
+    if it's the newest when a run of changes has been settling for DEBOUNCE_LIMIT windows.
+    """
+    calls, started = 0, None
+    for t, nxt in zip(change_times, change_times[1:] + [float('inf')]):
+        started = t if started is None else started
+        if nxt - t >= window or nxt >= started + window * cs.DEBOUNCE_LIMIT:
+            calls += 1
+            started = None
+    return calls
+
+
+def trill_updates(window, seconds=2.0, step=0.01):
+    """Chord updates while C-G is held under a D-E trill that never settles for `window`."""
+    messages = [(0.0, 0, mido.Message('note_on', note=n, velocity=80)) for n in (48, 55)]
+    for i in range(int(seconds / step)):
+        note = 62 if i % 2 == 0 else 64
+        messages.append((i * step, 0, mido.Message('note_on', note=note, velocity=80)))
+        messages.append((i * step + step * 0.9, 0, mido.Message('note_off', note=note)))
+    updates = []
+    pipeline = cs.LivePipeline(cs.NullMidiOutput(), 'C', 'ionian', 'pop', False, debounce=window,
+                               render=lambda update: updates.append(time.perf_counter()))
+    start = time.perf_counter()
+    cs.replay_events(['Trill'], messages, pipeline, speed=1.0, lockstep=False)
+    return [t - start for t in updates]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--midi', help="recorded performance to replay (default: generated)")
+    parser.add_argument('--bars', type=int, default=2000)
+    parser.add_argument('--debounce-ms', type=float, default=30.0)
+    args = parser.parse_args()
+
+    events = load_performance(args.midi) if args.midi else humanized_performance(args.bars, random.Random(0))
+    print(f"🎹 {len(events):,} MIDI messages")
+
+    start = time.perf_counter()
+    old_calls, old_changes = old_loop(events)
+    old_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new_calls, new_changes, change_times = tracked(events)
+    new_time = time.perf_counter() - start
+
+    assert new_changes == old_changes, "ChordState changed which chords get reported"
+    print(f"✅ same {len(new_changes):,} chord changes reported")
+
+    settled = debounced_calls(change_times, args.debounce_ms / 1000)
+    print(f"🐢 name on every message:     {old_calls:>8,} get_chord_name calls  ({old_time * 1000:.0f} ms)")
+    print(f"🚀 ChordState:                {new_calls:>8,} calls  ({new_time * 1000:.0f} ms, "
+          f"{1 - new_calls / old_calls:.1%} saved)")
+    print(f"🎸 + {args.debounce_ms:.0f} ms debounce:          {settled:>8,} calls  "
+          f"({1 - settled / old_calls:.1%} saved)")
+
+    window = args.debounce_ms / 1000
+    updates = trill_updates(window)
+    gaps = [b - a for a, b in zip([0.0] + updates, updates)]
+    assert len(updates) > 2 and max(gaps[:-1]) < window * (cs.DEBOUNCE_LIMIT + 2), gaps
+    print(f"✅ a 2 s trill that never settles is still named every {max(gaps[:-1]) * 1000:.0f} ms or sooner "
+          f"({len(updates)} updates)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+# Benchmark: the live terminal dashboard vs a printout per chord change, on fast replayed input
+# Run from the repo root: python benchmarks/bench_dashboard.py [--events 20000] [--fps 30]
+#
+# Output goes to a fake terminal that keeps the screen, counts bytes and notes which threads
+# wrote to it, and takes a microsecond per byte like a slow terminal would.
+
+import argparse
+import contextlib
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import chord_suggester as cs
+from bench_replay import session
+
+ROW_WRITE = re.compile(r'\x1b\[(\d+);1H(.*?)\x1b\[K')
+
+
+class FakeTerminal:
+    def __init__(self, byte_cost=1e-6):
+        self.byte_cost = byte_cost
+        self.bytes = 0
+        self.writes = 0
+        self.threads = set()
+        self.screen = {}
+        self.chord_rows = []  # the chord row's text each time it changed
+
+    def write(self, text):
+        self.bytes += len(text.encode())
+        self.writes += 1
+        self.threads.add(threading.get_ident())
+        for row, content in ROW_WRITE.findall(text):
+            self.screen[int(row)] = content
+            if row == '3':
+                self.chord_rows.append(content.split(None, 2)[-1])
+        time.sleep(len(text) * self.byte_cost)
+
+    def flush(self):
+        pass
+
+
+def replay(events, speed, lockstep, fps=None, seed=0):
+    """Run events through a LivePipeline drawing to a FakeTerminal: a dashboard at fps, or prints."""
+    terminal = FakeTerminal()
+    updates = []
+
+    def render(update):
+        updates.append(update.name)
+        cs.print_chord_update(update)
+
+    dashboard = cs.TerminalDashboard(fps, out=terminal) if fps else None
+    pipeline = cs.LivePipeline(cs.NullMidiOutput(), 'D', 'dorian', 'jazz', False, render=render,
+                               timings=cs.StageTimings(), dashboard=dashboard)
+    input_threads = set()
+    on_message = pipeline.on_message
+
+    def tracked(msg):
+        input_threads.add(threading.get_ident())
+        on_message(msg)
+
+    pipeline.on_message = tracked
+    with contextlib.redirect_stdout(terminal):
+        start = time.perf_counter()
+        cs.replay_events(['Synthetic Keyboard'], events, pipeline, speed, seed, lockstep)
+        elapsed = time.perf_counter() - start
+    assert not terminal.threads & input_threads, "the input thread wrote to the terminal"
+    return terminal, dashboard, updates, pipeline, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--fps', type=float, default=30)
+    args = parser.parse_args()
+
+    events = [(t, 0, msg) for t, msg in session(random.Random(0), args.events)]
+
+    # Lockstep: every chord change is drawn, and the dashboard shows the same chords as the printout
+    short = events[:600]
+    _, _, printed, _, _ = replay(short, 0, True)
+    terminal, dashboard, _, _, _ = replay(short, 0, True, fps=1000)
+    assert terminal.chord_rows[0] == '-'  # nothing played yet
+    assert terminal.chord_rows[1:] == [name for i, name in enumerate(printed) if i == 0 or printed[i - 1] != name], \
+        (terminal.chord_rows[:5], printed[:5])
+    assert dashboard.drawn and terminal.screen[3].endswith(printed[-1])
+    print(f"✅ lockstep: the dashboard's chord row went through the same {len(terminal.chord_rows) - 1} chords "
+          f"as the printout")
+
+    # Free-running at 20x the recorded pace: a chord change every ~10 ms, far faster than a screen needs
+    speed = 20
+    print(f"\n🎹 {len(events):,} messages at {speed}x ({events[-1][0] / speed:.1f} s), "
+          f"slow terminal (1 µs per byte)")
+    for fps in (None, args.fps):
+        terminal, dashboard, updates, pipeline, elapsed = replay(events, speed, False, fps=fps)
+        suggest = pipeline.timings.histograms['suggest'].percentile(99) / 1e6
+        thru = pipeline.timings.histograms['thru'].percentile(99) / 1e3
+        if dashboard is None:
+            what = f"{len(updates):,} printouts"
+        else:
+            what = f"{dashboard.frames:,} frames, {dashboard.rows_written:,} rows"
+            most = args.fps * elapsed + 2
+            assert dashboard.frames <= most, f"{dashboard.frames} frames in {elapsed:.1f} s at {args.fps:g} fps"
+        label = f"🖥️  dashboard {fps:g} fps" if fps else "🖨️  print per chord"
+        print(f"{label:<22} {what:<28} {terminal.bytes:>10,} bytes in {terminal.writes:>6,} writes   "
+              f"thru p99 {thru:6.0f} µs   suggestion p99 {suggest:5.2f} ms")
+    print(f"✅ dashboard stayed under {args.fps:g} frames a second, input thread never drew")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# Benchmark: offline MIDI file analysis throughput and scaling across worker processes
+# Run from the repo root: python benchmarks/bench_file_analyzer.py [--files 400] [--workers 1 2 4]
+
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+import mido
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import chord_suggester as cs
+
+
+def write_song(path, rng, chords=64):
+    """A one-track file of block chords drawn from C major, with the odd passing note."""
+    midi_file = mido.MidiFile(ticks_per_beat=480)
+    track = mido.MidiTrack()
+    midi_file.tracks.append(track)
+    scale = cs.mode_intervals['ionian']
+    events = 0
+    for _ in range(chords):
+        degree = rng.randrange(7)
+        notes = [48 + scale[(degree + step) % 7] + 12 * ((degree + step) // 7)
+                 for step in (0, 2, 4, 6)[:rng.randint(3, 4)]]
+        for note in notes:
+            track.append(mido.Message('note_on', note=note, velocity=90, time=0))
+        track.append(mido.Message('note_off', note=notes[0], velocity=0, time=480))
+        for note in notes[1:]:
+            track.append(mido.Message('note_off', note=note, velocity=0, time=0))
+        events += 2 * len(notes)
+    midi_file.save(path)
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=400)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        events = sum(write_song(os.path.join(directory, f"song_{i:05d}.mid"), rng)
+                     for i in range(args.files))
+        print(f"🎼 {args.files} generated files, {events:,} note events")
+
+        baseline = None
+        for workers in args.workers:
+            out = io.StringIO()
+            start = time.perf_counter()
+            cs.analyze_directory(directory, 'C', 'ionian', 'pop', workers=workers, out=out)
+            elapsed = time.perf_counter() - start
+            lines = out.getvalue().count('\n')
+            rate = args.files / elapsed
+            baseline = baseline or rate
+            print(f"⚙️  {workers:>2} worker(s): {rate:8.1f} files/s  {events / elapsed:>11,.0f} events/s  "
+                  f"{events / elapsed / workers:>10,.0f} events/s/worker  "
+                  f"scaling {rate / baseline:4.2f}x  ({lines} JSONL lines)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# Guard: importing chord_suggester must stay fast and must not pull in MIDI backends
+# Run from the repo root: python benchmarks/bench_import_time.py [--budget-ms 50]
+# Exits non-zero if the import is over budget or loads a heavy module.
+
+import argparse
+import os
+import py_compile
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Modules that only the live/offline entry points (or batch analysis) should load
+FORBIDDEN = ['mido', 'pygame', 'rtmidi', 'numpy', 'multiprocessing', 'json', 'argparse']
+
+PROBE = f"""
+import sys
+import chord_suggester
+loaded = [m for m in {FORBIDDEN!r} if m in sys.modules]
+print(','.join(loaded))
+"""
+
+
+def import_time_us():
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE],
+                            capture_output=True, text=True, cwd=ROOT, env=env, check=True)
+    for line in result.stderr.splitlines():
+        if line.rstrip().endswith('| chord_suggester'):
+            cumulative = int(line.split('|')[1])
+            return cumulative, [m for m in result.stdout.strip().split(',') if m]
+    raise RuntimeError("chord_suggester import line not found in -X importtime output")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--budget-ms', type=float, default=50.0)
+    args = parser.parse_args()
+
+    # Measure the steady state (cached bytecode), like a service restart would see
+    py_compile.compile(os.path.join(ROOT, 'chord_suggester.py'))
+
+    times, loaded = [], []
+    for _ in range(args.runs):
+        us, loaded = import_time_us()
+        times.append(us / 1000)
+
+    median = statistics.median(times)
+    print(f"⏱️  import chord_suggester: median {median:.1f} ms, min {min(times):.1f} ms, max {max(times):.1f} ms")
+
+    ok = True
+    if loaded:
+        print(f"❌ import pulled in: {', '.join(loaded)}")
+        ok = False
+    if median > args.budget_ms:
+        print(f"❌ over the {args.budget_ms:.0f} ms budget")
+        ok = False
+    if ok:
+        print(f"✅ no MIDI backends loaded, within the {args.budget_ms:.0f} ms budget")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
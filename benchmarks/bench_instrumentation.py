@@ -0,0 +1,84 @@
+# Benchmark: cost of --instrument, and proof that leaving it off is free.
+# Run from the repo root: python benchmarks/bench_instrumentation.py
+
+import asyncio
+import os
+import random
+import sys
+import time
+import timeit
+
+import mido
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import chord_suggester as cs
+
+
+class NullOutput:
+    def note_on(self, note, velocity):
+        pass
+
+    def note_off(self, note, velocity):
+        pass
+
+
+def check_accuracy():
+    """Histogram percentiles vs exact percentiles on a skewed latency distribution."""
+    rng = random.Random(0)
+    samples = [int(rng.lognormvariate(11, 1.2)) for _ in range(200000)]  # ~60 µs median, long tail
+    h = cs.LatencyHistogram()
+    for ns in samples:
+        h.record(ns)
+    ordered = sorted(samples)
+    for q in (50, 90, 99, 99.9):
+        exact = ordered[int(q / 100 * len(ordered)) - 1]
+        approx = h.percentile(q)
+        error = abs(approx - exact) / exact
+        print(f"   p{q:<5} exact {exact / 1e3:9.1f} µs   histogram {approx / 1e3:9.1f} µs   error {error:5.1%}")
+        assert error < 0.07, f"p{q} off by {error:.1%}"
+    assert h.max == ordered[-1]
+
+
+def per_message_ns(timings, messages, repeat=5):
+    """Cost of LivePipeline.on_message (note tracking + thru + hand-off) per message."""
+    best = float('inf')
+    for _ in range(repeat):
+        loop = asyncio.new_event_loop()
+        pipeline = cs.LivePipeline(NullOutput(), 'C', 'ionian', 'pop', False, timings=timings)
+        pipeline.bind(loop)
+        start = time.perf_counter()
+        for msg in messages:
+            pipeline.on_message(msg)
+        best = min(best, time.perf_counter() - start)
+        loop.close()
+    return best / len(messages) * 1e9
+
+
+def main():
+    print("🎯 Histogram accuracy")
+    check_accuracy()
+
+    rng = random.Random(1)
+    messages = []
+    for _ in range(20000):
+        note = rng.randint(48, 72)
+        messages.append(mido.Message('note_on', note=note, velocity=80))
+        messages.append(mido.Message('note_off', note=note))
+
+    off = per_message_ns(None, messages)
+    on = per_message_ns(cs.StageTimings(), messages)
+
+    # What "off" costs over code with no instrumentation at all: the `is not None` guards
+    guard = min(timeit.repeat('if t is not None: pass', setup='t = None', number=1000000, repeat=5)) * 1e3
+    guards_per_message = 2
+
+    print("⚙️  Callback cost per message")
+    print(f"   instrumentation off: {off:8.0f} ns")
+    print(f"   instrumentation on:  {on:8.0f} ns   (+{on - off:.0f} ns, {(on - off) / off:.1%})")
+    print(f"   disabled guards:     {guard * guards_per_message:8.1f} ns   "
+          f"({guard * guards_per_message / off:.2%} of the callback)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# Benchmark: streaming key/mode detection, accuracy on generated modulating input and cost per event
+# Run from the repo root: python benchmarks/bench_key_detection.py
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import chord_suggester as cs
+
+BUDGET_US = 1000  # per note event
+
+
+def scale_of(tonic_note, mode):
+    return frozenset((tonic_note + i) % 12 for i in cs.mode_intervals[mode])
+
+
+def play_key(rng, tonic_note, mode, chords, start_time):
+    """Note-ons for generated progressions in one key: a chord a second, rolled, middle register."""
+    events, now = [], start_time
+    tonic = cs.key_name(tonic_note)
+    while len(events) < chords:
+        progression = rng.choice(cs.generate_progressions(tonic, mode, 'pop', 8, 16, 3))
+        for chord in progression.chords:
+            voicing = rng.choice([v for v in cs.chord_voicings(chord) if 48 <= v[0] < 60])
+            events.append([(note, now + 0.02 * i, i == 0) for i, note in enumerate(voicing)])
+            now += 1.0
+    return [event for chord in events[:chords] for event in chord], now
+
+
+def generated_session(rng, keys=40, chords=24):
+    """(note, time, is bass, true key) for a long session that modulates every `chords` chords."""
+    stream, now = [], 0.0
+    for _ in range(keys):
+        key = (rng.randrange(12), rng.choice(list(cs.mode_intervals)))
+        events, now = play_key(rng, *key, chords, now)
+        stream.extend((note, t, bass, key) for note, t, bass in events)
+    return stream
+
+
+def main():
+    rng = random.Random(0)
+    stream = generated_session(rng)
+
+    detector = cs.KeyDetector()
+    exact = same_scale = counted = 0
+    switches = 0
+    previous_key, since_change = None, 0
+    settle = []
+    for note, now, bass, key in stream:
+        if key != previous_key:
+            previous_key, since_change, found = key, 0, False
+        since_change += 1
+        if detector.update(note, now, 2.0 if bass else 1.0):
+            switches += 1
+        if detector.key == key and not found:
+            settle.append(since_change)
+            found = True
+        if since_change > 40:  # after the first dozen or so chords in a new key
+            counted += 1
+            exact += detector.key == key
+            same_scale += scale_of(*detector.key) == scale_of(*key)
+    print(f"🎼 {len(stream):,} note-ons, 24 chords in each of 40 random keys, {switches} key switches")
+    print(f"🎯 settled key correct: {exact / counted:6.1%} exact, {same_scale / counted:6.1%} same notes "
+          f"(relative modes share a scale)")
+    if settle:
+        settle.sort()
+        print(f"⏱️  note-ons until the new key is found: median {settle[len(settle) // 2]}, "
+              f"found in {len(settle)} of 40 keys")
+
+    # Dense input (a note-on every millisecond), every event timed on its own
+    detector = cs.KeyDetector()
+    costs = []
+    for i, (note, _, bass, _) in enumerate(stream * 3):
+        start = time.perf_counter()
+        detector.update(note, i * 0.001, 2.0 if bass else 1.0)
+        costs.append(time.perf_counter() - start)
+    costs.sort()
+    pick = lambda q: costs[min(len(costs) - 1, int(q * len(costs)))] * 1e6
+    print(f"🚀 per note-on: p50 {pick(0.5):.1f} µs  p99 {pick(0.99):.1f} µs  max {costs[-1] * 1e6:.1f} µs "
+          f"({len(costs) / sum(costs):,.0f} events/s)")
+    assert pick(0.99) < BUDGET_US, f"p99 {pick(0.99):.0f} µs is over the {BUDGET_US} µs budget"
+    print(f"✅ p99 well under {BUDGET_US} µs per event")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# Benchmark: input->thru and input->suggestion latency under a burst of MIDI events,
+# for the asyncio LivePipeline vs the old inline loop (thru, analysis and print in one thread).
+# Run from the repo root: python benchmarks/bench_live_latency.py [--events 3000] [--render-ms 5]
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+
+import mido
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import chord_suggester as cs
+
+
+class FakeOutput:
+    """Stands in for pygame.midi.Output and timestamps every thru write."""
+
+    def __init__(self):
+        self.writes = []
+
+    def note_on(self, note, velocity):
+        self.writes.append(time.perf_counter())
+
+    def note_off(self, note, velocity):
+        self.writes.append(time.perf_counter())
+
+
+def burst(events, rng):
+    """(offset seconds, message): rolled chords from C major, a few ms between notes."""
+    scale = cs.mode_intervals['ionian']
+    schedule, t = [], 0.0
+    while len(schedule) < events:
+        degree = rng.randrange(7)
+        notes = [48 + scale[(degree + s) % 7] + 12 * ((degree + s) // 7) for s in (0, 2, 4, 6)[:rng.randint(3, 4)]]
+        for note in notes:
+            t += rng.uniform(0.0, 0.002)
+            schedule.append((t, mido.Message('note_on', note=note, velocity=90)))
+        t += rng.uniform(0.005, 0.03)
+        for note in notes:
+            schedule.append((t, mido.Message('note_off', note=note)))
+    return schedule[:events]
+
+
+def play(schedule, handler, arrivals):
+    """Deliver each message at its scheduled time (or as soon as the handler lets us)."""
+    start = time.perf_counter()
+    for offset, msg in schedule:
+        due = start + offset
+        while time.perf_counter() < due:
+            pass
+        arrivals.append(due)
+        handler(msg)
+
+
+def percentiles(samples):
+    ms = sorted(x * 1000 for x in samples)
+    if not ms:
+        return "no samples"
+    pick = lambda q: ms[min(len(ms) - 1, int(q * len(ms)))]
+    return f"p50 {pick(0.5):7.3f}  p90 {pick(0.9):7.3f}  p99 {pick(0.99):7.3f}  max {ms[-1]:7.3f} ms  (n={len(ms)})"
+
+
+def run_inline(schedule, render_s, style):
+    """The pre-pipeline loop: everything happens before the next message is read."""
+    out = FakeOutput()
+    engine = cs.SuggestionEngine('C', 'ionian', style, False, rng=random.Random(0))
+    state, last = cs.ChordState(), [None]
+    active_notes = state.notes
+    arrivals, suggestion_latency = [], []
+
+    def handle(msg):
+        change = state.apply(msg)
+        if change == 'on':
+            out.note_on(msg.note, msg.velocity)
+        elif change == 'off':
+            out.note_off(msg.note, 0)
+        if len(active_notes) >= 3:
+            chord = cs.get_chord_name(active_notes, False, 0, 'ionian')
+            if chord and chord != last[0]:
+                engine.suggest(cs.parse_chord(chord, 0, 'ionian'))
+                suggestion_latency.append(time.perf_counter() - arrivals[-1])
+                time.sleep(render_s)  # print() to a slow terminal
+                last[0] = chord
+
+    play(schedule, handle, arrivals)
+    return [w - a for w, a in zip(out.writes, arrivals)], suggestion_latency
+
+
+def run_pipeline(schedule, render_s, style):
+    out = FakeOutput()
+    suggestion_latency = []
+
+    def render(update):
+        suggestion_latency.append(time.perf_counter() - update.received_at)
+        time.sleep(render_s)
+
+    pipeline = cs.LivePipeline(out, 'C', 'ionian', style, False, render=render)
+    pipeline.stream.engine = cs.SuggestionEngine('C', 'ionian', style, False, rng=random.Random(0))
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        pipeline.bind(loop)
+        done = loop.create_future()
+        arrivals = []
+
+        def feed():
+            play(schedule, pipeline.on_message, arrivals)
+            time.sleep(0.2 + render_s * 2)
+            loop.call_soon_threadsafe(done.set_result, None)
+
+        threading.Thread(target=feed, daemon=True).start()
+        await pipeline.run(done)
+        return arrivals
+
+    arrivals = asyncio.run(main())
+    return [w - a for w, a in zip(out.writes, arrivals)], suggestion_latency
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=3000)
+    parser.add_argument('--render-ms', type=float, default=5.0, help="simulated terminal time per update")
+    parser.add_argument('--style', default='jazz')
+    args = parser.parse_args()
+
+    schedule = burst(args.events, random.Random(0))
+    render_s = args.render_ms / 1000
+    print(f"🎹 {len(schedule)} events over {schedule[-1][0]:.2f} s, {args.render_ms} ms per rendered update")
+
+    thru, suggestion = run_inline(schedule, render_s, args.style)
+    print("🐢 inline loop")
+    print(f"   input -> thru:       {percentiles(thru)}")
+    print(f"   input -> suggestion: {percentiles(suggestion)}")
+
+    thru, suggestion = run_pipeline(schedule, render_s, args.style)
+    print("🚀 asyncio pipeline")
+    print(f"   input -> thru:       {percentiles(thru)}")
+    print(f"   input -> suggestion: {percentiles(suggestion)}")
+
+
+if __name__ == '__main__':
+    main()
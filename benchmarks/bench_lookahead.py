@@ -0,0 +1,88 @@
+# Benchmark: beam-search progression generator, time vs beam width and length
+# Run from the repo root: python benchmarks/bench_lookahead.py
+
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import chord_suggester as cs
+
+WIDTHS = [4, 16, 64, 256]
+LENGTHS = [4, 8, 16, 32]
+INTERACTIVE_MS = 50
+
+
+def exhaustive(search, length, top_k, start=0):
+    """Score every possible progression the slow way."""
+    weights = cs.lookahead_weights
+    results = []
+    for rest in itertools.product(range(7), repeat=length - 1):
+        degrees = (start,) + rest
+        if (degrees[-2], degrees[-1]) not in search.cadence_pairs:
+            continue
+        score, used = 0.0, set()
+        for i in range(1, length):
+            a, b = degrees[i - 1], degrees[i]
+            score += search.step[a][b]
+            if i > 1 and degrees[i - 2] == b:
+                score -= weights['back_and_forth']
+            if (a, b) in used:
+                score -= weights['repeat']
+            used.add((a, b))
+        if score > float('-inf'):
+            results.append((score, degrees))
+    return sorted(results, reverse=True)[:top_k]
+
+
+def check_against_exhaustive(length=6):
+    for mode in cs.mode_intervals:
+        for style in ('pop', 'jazz'):
+            search = cs.ProgressionSearch(cs.get_suggestion_engine('C', mode, style, False))
+            expected = [round(score, 9) for score, _ in exhaustive(search, length, 5)]
+            wide = [round(score, 9) for score, _ in search.search(length, 7 ** (length - 1), 5)]
+            narrow = search.search(length, 16, 1)[0][0]
+            assert wide == expected, f"{mode} {style}: {wide} != {expected}"
+            assert narrow > expected[0] - 1.0, f"{mode} {style}: beam 16 best {narrow} vs {expected[0]}"
+    print(f"✅ full-width beam matches exhaustive top 5 ({length} chords, every mode, pop + jazz)")
+
+
+def time_search(length, width, style='jazz'):
+    """Worst mode, in ms, with fresh tables each time (no memoized results)."""
+    worst = 0.0
+    for mode in cs.mode_intervals:
+        engine = cs.get_suggestion_engine('C', mode, style, False)
+        best = float('inf')
+        for _ in range(3):
+            start = time.perf_counter()
+            cs.ProgressionSearch(engine).search(length, width, 5)
+            best = min(best, time.perf_counter() - start)
+        worst = max(worst, best)
+    return worst * 1000
+
+
+def main():
+    check_against_exhaustive()
+
+    print("\n⏱️  worst mode, ms (cold: step tables and bounds rebuilt)   beam width →")
+    print("   chords " + "".join(f"{w:>10}" for w in WIDTHS))
+    table = {}
+    for length in LENGTHS:
+        row = [time_search(length, width) for width in WIDTHS]
+        table.update({(length, w): ms for w, ms in zip(WIDTHS, row)})
+        print(f"   {length:>6} " + "".join(f"{ms:>10.2f}" for ms in row))
+
+    cs.generate_progressions('C', 'dorian', 'jazz', 16, 64)
+    start = time.perf_counter()
+    for _ in range(1000):
+        cs.generate_progressions('C', 'dorian', 'jazz', 16, 64)
+    print(f"\n🧠 memoized repeat call: {(time.perf_counter() - start) * 1000:.2f} µs")
+
+    assert table[16, 64] < INTERACTIVE_MS, f"16 chords at beam 64 took {table[16, 64]:.1f} ms"
+    print(f"✅ 16-chord lookahead at beam 64 within {INTERACTIVE_MS} ms in every mode")
+
+
+if __name__ == '__main__':
+    main()
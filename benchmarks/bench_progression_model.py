@@ -0,0 +1,97 @@
+# Benchmark: training the n-gram progression model, loading it through mmap, and lookups
+# Run from the repo root: python benchmarks/bench_progression_model.py [--files 200]
+
+import argparse
+import array
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import chord_suggester as cs
+from bench_file_analyzer import write_song
+
+
+def reference_counts(directory, order):
+    """The obvious dict-of-tuples count, to check the packed layout against."""
+    counts = Counter()
+    for path in cs.find_midi_files(directory):
+        for track in cs.read_midi_file(path).tracks:
+            chords = [chord for _, _, chord in cs.track_chord_changes(track, 0, 'ionian')]
+            states = [cs.OUTSIDE] * order + cs.progression_states(chords)
+            for i in range(order, len(states)):
+                if states[i] == cs.OUTSIDE or (i > order and states[i] == states[i - 1]):
+                    continue
+                for k in range(order + 1):
+                    counts[tuple(states[i - k:i]), states[i]] += 1
+    return counts
+
+
+def check_counts(model, expected):
+    for (context, degree), count in expected.items():
+        index = sum(state * 8 ** j for j, state in enumerate(reversed(context)))
+        row = (model.mode_offsets['ionian'] + model.level_offsets[len(context)] + index) * 7
+        assert model.counts[row + degree] == count, f"{context} -> {degree}: {model.counts[row + degree]} != {count}"
+    assert sum(model.counts) == sum(expected.values())
+
+
+def best_of(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--order', type=int, default=2)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        for i in range(args.files):
+            write_song(os.path.join(directory, f"song_{i:05d}.mid"), rng)
+        model_path = os.path.join(directory, 'model.cspm')
+
+        start = time.perf_counter()
+        cs.train_progression_model(directory, model_path, 'C', 'ionian', args.order, workers=1)
+        elapsed = time.perf_counter() - start
+        print(f"📈 trained order-{args.order} model: {args.files / elapsed:,.0f} files/s (1 worker)")
+
+        model = cs.ProgressionModel(model_path)
+        check_counts(model, reference_counts(directory, args.order))
+        print("✅ packed counts match a dict-of-tuples count")
+
+        states = [[rng.randrange(8) for _ in range(rng.randint(1, 4))] for _ in range(10000)]
+        elapsed = best_of(lambda: [model.ranked('ionian', s) for s in states])
+        print(f"🔎 ranked lookups:  {len(states) / elapsed:>12,.0f} /s")
+
+        names = [cs.get_chord_name({60 + pc for pc in random.Random(i).sample(range(12), 4)}, False, 0, 'ionian')
+                 for i in range(2000)]
+        for label, use in (("rule tables", None), ("trained model", model)):
+            elapsed = best_of(lambda: [cs.suggest_next_chords(n, 'C', 'ionian', 'pop', False, model=use)
+                                       for n in names])
+            print(f"🎧 suggest_next_chords, {label + ':':<14} {len(names) / elapsed:>10,.0f} calls/s")
+        model.close()
+
+        # A big model: order 5 is ~7 MB. Loading shouldn't depend on the size.
+        for order in (2, 5):
+            path = os.path.join(directory, f"order{order}.cspm")
+            rows = cs._model_layout(order)[1] * 7 * len(cs.model_modes)
+            cs.write_progression_model(path, order, array.array('I', (rng.randrange(100) for _ in range(rows))))
+            mapped = best_of(lambda: cs.ProgressionModel(path).close())
+            read = best_of(lambda: array.array('I', open(path, 'rb').read()))
+            print(f"💾 order {order} ({os.path.getsize(path) / 1e6:5.2f} MB): mmap load {mapped * 1e6:7.1f} µs"
+                  f"   read into memory {read * 1e6:8.1f} µs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# Benchmark: rendering progressions to MIDI files, streamed writer vs building tracks in
+# memory with mido, and batch throughput over the process pool
+# Run from the repo root: python benchmarks/bench_render.py [--files 2000] (needs mido)
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import mido
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import chord_suggester as cs
+
+
+def check_file(path, chords, tempo):
+    """Read a render back: tempo, one bar per chord, every note released, right pitch classes."""
+    midi = mido.MidiFile(path)
+    bar = 4 * midi.ticks_per_beat
+    tick, held, sounding = 0, {}, [set() for _ in chords]
+    for msg in midi.tracks[0]:
+        tick += msg.time
+        if msg.type == 'set_tempo':
+            assert round(mido.tempo2bpm(msg.tempo)) == tempo, msg
+        elif msg.type == 'note_on' and msg.velocity:
+            held[msg.channel, msg.note] = tick
+            sounding[tick // bar].add((msg.channel, msg.note % 12))
+        elif msg.type in ('note_on', 'note_off'):
+            start = held.pop((msg.channel, msg.note))
+            assert start // bar == (tick - 1) // bar, f"{path}: note {msg.note} rings over a bar line"
+    assert not held, f"{path}: notes left on: {held}"
+    assert tick == bar * len(chords), f"{path}: {tick} ticks for {len(chords)} chords"
+    for chord, notes in zip(chords, sounding):
+        pcs = set(chord.pitch_classes())
+        assert {pc for channel, pc in notes if channel == 0} <= pcs, (path, chord, notes)
+        assert {pc for channel, pc in notes if channel == 1} == {chord.root}, (path, chord, notes)
+
+
+def check_renders(directory):
+    for style in ('pop', 'jazz', 'classical'):
+        for rhythm in cs.rhythm_patterns:
+            for seed in range(5):
+                engine = cs.SuggestionEngine('Eb', 'dorian', style, True, rng=random.Random(seed))
+                chords = cs.suggestion_walk(engine, 8)
+                path = os.path.join(directory, f"{style}_{rhythm}_{seed}.mid")
+                cs.render_progression(path, chords, 96, style, rhythm, True)
+                check_file(path, chords, 96)
+    print(f"✅ renders read back in mido with the right bars, pitch classes and bass, "
+          f"every note released ({3 * len(cs.rhythm_patterns) * 5} files)")
+
+    files, _ = cs.render_progressions(directory, 'Eb', 'dorian', 'jazz', 8, variations=20, seed=3, workers=1)
+    for seed in (3, 22):
+        engine = cs.SuggestionEngine('Eb', 'dorian', 'jazz', True, rng=random.Random(seed))
+        check_file(os.path.join(directory, f"Eb_dorian_jazz_{seed:05}.mid"), cs.suggestion_walk(engine, 8), 100)
+    print(f"✅ batch variations match a seeded walk through the suggestions ({files} files)")
+
+
+def in_memory_render(path, chords, tempo, style):
+    """The same file built as a whole mido track first, then saved."""
+    sound = {**cs.render_defaults, **cs.render_styles.get(style, {})}
+    bar = 4 * cs.RENDER_TICKS_PER_BEAT
+    track = mido.MidiTrack([mido.MetaMessage('set_tempo', tempo=mido.bpm2tempo(tempo))])
+    events, voicing = [], cs.RENDER_START_VOICING
+    for i, chord in enumerate(chords):
+        voicing = cs.voicing_table.move(voicing, chord)[1]
+        notes = cs.styled_voicing(voicing, chord, sound['voicing'])
+        for onset, length, voice, accent in cs.rhythm_patterns[sound['rhythm']]:
+            on = i * bar + round(onset * cs.RENDER_TICKS_PER_BEAT)
+            off = on + round(length * cs.RENDER_TICKS_PER_BEAT)
+            for note in notes if voice is None else (notes[voice % len(notes)],):
+                events += [(on, 1, note), (off, 0, note)]
+    events.sort()
+    now = 0
+    for tick, on, note in events:
+        kind = 'note_on' if on else 'note_off'
+        track.append(mido.Message(kind, note=note, velocity=sound['velocity'] if on else 0, time=tick - now))
+        now = tick
+    midi = mido.MidiFile(ticks_per_beat=cs.RENDER_TICKS_PER_BEAT)
+    midi.tracks.append(track)
+    midi.save(path)
+
+
+def measure(fn):
+    """(seconds, peak traced bytes); timed on a separate run, since tracing slows everything down."""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp()
+    try:
+        check_renders(work)
+
+        engine = cs.SuggestionEngine('C', 'ionian', 'pop', False, rng=random.Random(0))
+        chords = cs.suggestion_walk(engine, 5000)
+        cs.render_progression(os.path.join(work, 'warm.mid'), chords[:64], 120, 'pop')
+        streamed = measure(lambda: cs.render_progression(os.path.join(work, 'long.mid'), chords, 120, 'pop'))
+        built = measure(lambda: in_memory_render(os.path.join(work, 'long_mido.mid'), chords, 120, 'pop'))
+        print(f"🧱 5,000 chords, mido track in memory: {built[0] * 1000:7.0f} ms  peak {built[1] / 1e6:6.2f} MB")
+        print(f"🌊 5,000 chords, streamed writer:      {streamed[0] * 1000:7.0f} ms  peak {streamed[1] / 1e6:6.2f} MB")
+
+        for workers in sorted(set(args.workers)):
+            out = os.path.join(work, f"batch{workers}")
+            start = time.perf_counter()
+            files, events = cs.render_progressions(out, 'C', 'ionian', 'jazz', 8, variations=args.files,
+                                                   workers=workers)
+            elapsed = time.perf_counter() - start
+            print(f"⚙️  {workers} worker(s): {files:,} files in {elapsed:5.2f} s  "
+                  f"({files / elapsed:8,.0f} files/s, {events / elapsed:10,.0f} events/s)")
+            shutil.rmtree(out)
+    finally:
+        shutil.rmtree(work)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# Benchmark: record a synthetic session to a log, then replay it through the live pipeline
+# in lockstep (repeatable, with latency histograms) and flat out (throughput).
+# Run from the repo root: python benchmarks/bench_replay.py [--events 20000]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+import mido
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import chord_suggester as cs
+
+
+def session(rng, events):
+    """(seconds, message): rolled chords from a few keys with sustain pedal and bends mixed in."""
+    scale = cs.mode_intervals['dorian']
+    messages, t = [], 0.0
+    while len(messages) < events:
+        degree = rng.randrange(7)
+        notes = [50 + scale[(degree + s) % 7] + 12 * ((degree + s) // 7) for s in (0, 2, 4, 6)[:rng.randint(3, 4)]]
+        for note in notes:
+            t += rng.uniform(0.0, 0.01)
+            messages.append((t, mido.Message('note_on', note=note, velocity=rng.randint(40, 110))))
+        if rng.random() < 0.3:
+            messages.append((t, mido.Message('control_change', control=64, value=127)))
+            messages.append((t, mido.Message('pitchwheel', pitch=rng.randint(-2000, 2000))))
+        t += rng.uniform(0.05, 0.25)
+        for note in notes:
+            messages.append((t, mido.Message('note_off', note=note)))
+    return messages[:events]
+
+
+def write_log(path, messages):
+    recorder = cs.MidiRecorder(path, ['Synthetic Keyboard'])
+    for t, msg in messages:
+        recorder.record(0, msg, recorder.start + int(t * 1e9))
+    recorder.record(0, mido.Message('sysex', data=[1, 2, 3]), recorder.start)  # not logged
+    recorder.close()
+    return recorder
+
+
+def replay(path, speed, seed=0, instrument=False, lockstep=True):
+    port_names, events = cs.read_midi_log(path)
+    updates = []
+    timings = cs.StageTimings() if instrument else None
+    out = cs.NullMidiOutput()
+    pipeline = cs.LivePipeline(out, 'D', 'dorian', 'jazz', False, render=updates.append, timings=timings)
+    messages, seconds = cs.replay_events(port_names, events, pipeline, speed, seed, lockstep)
+    return [(u.name, u.suggestion_names) for u in updates], messages, seconds, out, timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=20000)
+    args = parser.parse_args()
+
+    messages = session(random.Random(0), args.events)
+    path = os.path.join(tempfile.mkdtemp(), 'session.csml')
+    recorder = write_log(path, messages)
+    size = os.path.getsize(path)
+    print(f"⏺️  {recorder.recorded:,} messages ({messages[-1][0]:.0f} s of playing) in {size:,} bytes "
+          f"({(size - 24) / recorder.recorded:.1f} bytes/message), {recorder.skipped} sysex skipped")
+
+    port_names, events = cs.read_midi_log(path)
+    assert port_names == ['Synthetic Keyboard']
+    assert [msg for _, _, msg in events] == [msg for _, msg in messages]
+    assert all(abs(t - at) < 1e-9 for (t, _, _), (at, _) in zip(events, messages))
+    with open(path, 'rb') as f, open(path + '.cut', 'wb') as cut:
+        cut.write(f.read()[:-5])
+    assert len(cs.read_midi_log(path + '.cut')[1]) == len(events) - 1
+    print("✅ log reads back exactly; a torn last record is dropped")
+
+    # Lockstep, at the recorded pace squeezed 50x so it doesn't take minutes
+    note_events = sum(msg.type in ('note_on', 'note_off') for _, msg in messages)
+    first, n, seconds, out, timings = replay(path, speed=50, instrument=True)
+    assert out.writes == note_events, (out.writes, note_events)
+    assert first == replay(path, speed=0)[0], "same log and seed gave different updates"
+    other_seed = replay(path, speed=0, seed=1)[0]
+    assert [name for name, _ in first] == [name for name, _ in other_seed]
+    print(f"✅ lockstep: {len(first):,} chord updates, identical at 50x and flat out with the same seed "
+          f"(same chords, {'different' if first != other_seed else 'same'} suggestions with another seed)")
+    print(timings.report())
+
+    _, n, seconds, out, _ = replay(path, speed=0)
+    print(f"🚀 flat out, lockstep:     {n / seconds:>9,.0f} messages/s (every state named and drawn)")
+    updates, n, seconds, out, _ = replay(path, speed=0, lockstep=False)
+    assert out.writes == note_events
+    print(f"🚀 flat out, free-running: {n / seconds:>9,.0f} messages/s ({len(updates):,} of {len(first):,} "
+          f"updates drawn, the rest coalesced)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# Benchmark: loading dozens of rule packs, compiled from JSON vs from the binary cache
+# Run from the repo root: python benchmarks/bench_rule_packs.py
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+
+import chord_suggester as cs
+
+PACKS = 48
+
+
+def rotated_mode(mode, step, name):
+    """A pack mode built from one of the built-in modes, started on another degree."""
+    intervals = cs.mode_intervals[mode]
+    start = intervals[step]
+    return {
+        "intervals": sorted((i - start) % 12 for i in intervals),
+        "chords": cs.mode_chords[mode][step:] + cs.mode_chords[mode][:step],
+        "degrees": [f"{name}{d}" for d in range(1, 8)],
+        "rules": {f"{name}{d}": [f"{name}{d % 7 + 1}", f"{name}1"] for d in range(1, 8)},
+        "cadences": [[f"{name}5", f"{name}1"], [f"{name}4", f"{name}1"]],
+    }
+
+
+def write_packs(directory):
+    modes = list(cs.builtin_modes)
+    for i in range(PACKS):
+        pack = {
+            "name": f"pack {i}",
+            "qualities": {f"q{i}": "7"},
+            "modes": {f"m{i}_{k}": rotated_mode(modes[(i + k) % len(modes)], (i + k) % 7, f"d{i}_{k}_")
+                      for k in range(2)},
+            "styles": {f"s{i}": {"fallback": [0, 3, 4], "voiced": True,
+                                 "voicings": {"maj": ["maj7", "6/9"], "min": ["m7", "m9"], f"q{i}": ["9", "13"]},
+                                 "spice": {"maj": ["maj7♯11"]}, "altered": ["7♯9"], "altered_on": ["V"],
+                                 "resolutions": ["m7"]}},
+        }
+        with open(os.path.join(directory, f"pack{i:02}.json"), 'w', encoding='utf-8') as f:
+            json.dump(pack, f, ensure_ascii=False, indent=2)
+
+
+def best_ms(fn, repeat=20):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    work = tempfile.mkdtemp()
+    packs, cache = os.path.join(work, 'packs'), os.path.join(work, 'cache')
+    os.makedirs(packs)
+    try:
+        write_packs(packs)
+        files = cs.rule_pack_files([packs])
+
+        def compile_all():
+            texts = []
+            for path in files:
+                with open(path, encoding='utf-8') as f:
+                    texts.append((path, f.read()))
+            return cs.compile_rule_packs(texts)
+
+        def cold():
+            shutil.rmtree(cache, ignore_errors=True)
+            return cs.load_rule_packs([packs], cache)
+
+        compiled = compile_all()
+        assert cold() == compiled and cs.load_rule_packs([packs], cache) == compiled
+        print(f"✅ cached tables match a fresh compile ({PACKS} packs, {len(compiled['modes'])} modes, "
+              f"{len(compiled['styles'])} styles)")
+
+        with open(files[0], 'a', encoding='utf-8') as f:
+            f.write("\n")
+        before = set(os.listdir(cache))
+        cs.load_rule_packs([packs], cache)
+        assert set(os.listdir(cache)) != before, "an edited pack should miss the cache"
+        print("✅ editing a pack misses the cache")
+
+        compile_ms = best_ms(compile_all)
+        cold_ms = best_ms(cold, repeat=5)
+        cs.load_rule_packs([packs], cache)
+        warm_ms = best_ms(lambda: cs.load_rule_packs([packs], cache))
+        print(f"🐢 parse + validate + compile: {compile_ms:7.2f} ms")
+        print(f"🧊 first launch (+ cache write): {cold_ms:5.2f} ms")
+        print(f"🚀 cached:                     {warm_ms:7.2f} ms  ({compile_ms / warm_ms:.1f}x)")
+
+        cs.install_rule_packs(compiled)
+        for mode in compiled['modes']:
+            engine = cs.get_suggestion_engine('C', mode, f"s{mode[1:].split('_')[0]}", False)
+            chord = engine.plain_chords[0]
+            notes = {48 + chord.root + i for i in cs.chord_intervals(chord.quality, chord.extensions)}
+            assert cs.recognize_chord(notes, 0, mode) is chord
+            assert engine.suggest(chord) and cs.generate_progressions('C', mode, engine.style, 8, 16, 1)
+        print("✅ every installed mode names its chords, suggests and generates progressions")
+    finally:
+        shutil.rmtree(work)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# Load test: SessionServer with dozens of (port, channel) streams fed from in-memory ports,
+# one of them flooding. Checks that the quiet streams still get timely suggestions.
+# Run from the repo root: python benchmarks/bench_session_server.py [--ports 3] [--seconds 5]
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import mido
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import chord_suggester as cs
+
+# Triads that are all named differently in C major, so every change is a new chord
+PROGRESSION = [[48, 52, 55], [50, 53, 57], [52, 55, 59], [53, 57, 60], [55, 59, 62], [57, 60, 64]]
+
+
+class NullOutput:
+    def note_on(self, note, velocity, channel=0):
+        pass
+
+    def note_off(self, note, velocity, channel=0):
+        pass
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float('nan')
+
+
+def play_port(server, port, channels, seconds, hot_channel, rng, sent):
+    """One in-memory input port: its own thread, like a real backend callback thread."""
+    deadline = time.perf_counter() + seconds
+    next_change = {ch: time.perf_counter() + rng.uniform(0, 0.2) for ch in channels}
+    held = {ch: [] for ch in channels}
+    step = {ch: rng.randrange(len(PROGRESSION)) for ch in channels}
+
+    def change(ch):
+        for note in held[ch]:
+            server.on_message(port, mido.Message('note_off', note=note, channel=ch))
+        step[ch] = (step[ch] + 1) % len(PROGRESSION)
+        held[ch] = PROGRESSION[step[ch]]
+        for note in held[ch]:
+            server.on_message(port, mido.Message('note_on', note=note, velocity=80, channel=ch))
+        sent[(port, ch)] += 1
+
+    while time.perf_counter() < deadline:
+        now = time.perf_counter()
+        if hot_channel is not None:
+            change(hot_channel)  # flat out
+        for ch in channels:
+            if ch != hot_channel and now >= next_change[ch]:
+                change(ch)
+                next_change[ch] = now + rng.uniform(0.1, 0.3)
+        if hot_channel is None:
+            time.sleep(0.001)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ports', type=int, default=3)
+    parser.add_argument('--channels', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    latencies = defaultdict(list)
+
+    def render(stream, update):
+        latencies[stream.label].append(time.perf_counter() - update.received_at)
+
+    server = cs.SessionServer(NullOutput(), 'C', 'ionian', 'jazz', render=render)
+    ports = [f"virtual {i}" for i in range(args.ports)]
+    hot = f"{ports[0]} ch1"
+    sent = defaultdict(int)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        server.bind(loop)
+        done = loop.create_future()
+        threads = [threading.Thread(target=play_port, daemon=True,
+                                    args=(server, port, range(args.channels), args.seconds,
+                                          0 if i == 0 else None, random.Random(i), sent))
+                   for i, port in enumerate(ports)]
+
+        def wait_all():
+            for t in threads:
+                t.join()
+            time.sleep(0.3)
+            loop.call_soon_threadsafe(done.set_result, None)
+
+        for t in threads:
+            t.start()
+        threading.Thread(target=wait_all, daemon=True).start()
+        await server.run(done)
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - start
+
+    streams = len(server.streams)
+    cold = [label for label in latencies if label != hot]
+    cold_latency = [x for label in cold for x in latencies[label]]
+    cold_sent = sum(n for (port, ch), n in sent.items() if f"{port} ch{ch + 1}" != hot)
+    cold_rendered = sum(len(latencies[label]) for label in cold)
+    worst = max(percentile(latencies[label], 0.99) for label in cold)
+
+    print(f"🎛️  {streams} streams on {args.ports} ports, {server.messages:,} messages in {elapsed:.1f} s "
+          f"({server.messages / elapsed:,.0f} msg/s)")
+    print(f"🔥 hot stream ({hot}): {sent[(ports[0], 0)]:,} chord changes sent, "
+          f"{len(latencies[hot]):,} rendered (the rest coalesced)")
+    print(f"🧊 quiet streams: {cold_rendered:,} of {cold_sent:,} chord changes rendered")
+    print(f"   input -> suggestion  p50 {percentile(cold_latency, 0.5) * 1000:.2f} ms  "
+          f"p99 {percentile(cold_latency, 0.99) * 1000:.2f} ms  worst stream p99 {worst * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
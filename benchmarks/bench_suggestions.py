@@ -0,0 +1,67 @@
+# Benchmark: seeded SuggestionEngine calls vs rebuilding the tables on every call
+# Run from the repo root: python benchmarks/bench_suggestions.py
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import chord_suggester as cs
+
+STYLES = ['pop', 'jazz', 'classical']
+
+
+def recognized_chords(tonic_note, mode):
+    """A realistic input mix: whatever recognize_chord says for random 3-5 note sets."""
+    rng = random.Random(0)
+    chords = []
+    for _ in range(500):
+        notes = {60 + pc for pc in rng.sample(range(12), rng.randint(3, 5))}
+        chords.append(cs.recognize_chord(notes, tonic_note, mode))
+    return chords
+
+
+def check_reproducible(tonic, mode, style, chords):
+    runs = []
+    for _ in range(2):
+        engine = cs.SuggestionEngine(tonic, mode, style, False, rng=random.Random(42))
+        runs.append([engine.suggest_symbols(c) for c in chords])
+    assert runs[0] == runs[1], f"{tonic} {mode} {style}: seeded runs differ"
+
+
+def calls_per_second(fn, chords, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for chord in chords:
+            fn(chord)
+        best = min(best, time.perf_counter() - start)
+    return len(chords) / best
+
+
+def main():
+    for mode in cs.mode_intervals:
+        chords = recognized_chords(0, mode)
+        for style in STYLES:
+            check_reproducible('C', mode, style, chords)
+    print("✅ seeded engines give identical suggestions on every mode and style")
+
+    chords = recognized_chords(0, 'dorian')
+    for style in STYLES:
+        engine = cs.SuggestionEngine('C', 'dorian', style, False, rng=random.Random(1))
+        warm = calls_per_second(engine.suggest, chords)
+        cold = calls_per_second(
+            lambda c: cs.SuggestionEngine('C', 'dorian', style, False, rng=random.Random(1)).suggest(c),
+            chords)
+        print(f"🎧 {style:<9}  cached engine: {warm:>10,.0f} calls/s   rebuilt per call: {cold:>9,.0f} calls/s")
+
+    names = [cs.get_chord_name({60 + pc for pc in random.Random(i).sample(range(12), 4)}, False, 0, 'dorian')
+             for i in range(500)]
+    rate = calls_per_second(lambda c: cs.suggest_next_chords(c, 'C', 'dorian', 'jazz', False), names)
+    print(f"🧾 suggest_next_chords (string in, strings out): {rate:>10,.0f} calls/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+# Benchmark: thru to a slow MIDI device, one write per message on the input thread vs the
+# buffered ThruOutput stage, while rendering is slow too; then each full-buffer policy.
+# Run from the repo root: python benchmarks/bench_thru_output.py [--events 3000] [--write-us 300]
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import chord_suggester as cs
+from bench_live_latency import burst, percentiles
+
+
+def play(schedule, handler, arrivals):
+    """Deliver each message at its scheduled time, sleeping in between like a backend thread
+    blocked on the driver (a spin loop would hold the GIL and starve the writer thread)."""
+    start = time.perf_counter()
+    for offset, msg in schedule:
+        due = start + offset
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        arrivals.append(due)  # lateness from a blocked callback counts too
+        handler(msg)
+
+
+class SlowPort:
+    """pygame-style output whose write costs a fixed overhead per call, with an occasional long stall."""
+
+    def __init__(self, write_s, stall_every=200, stall_s=0.02):
+        self.write_s, self.stall_every, self.stall_s = write_s, stall_every, stall_s
+        self.calls = 0
+        self.events = []
+        self.sent = []
+
+    def write(self, events):
+        self.calls += 1
+        time.sleep(self.stall_s if self.calls % self.stall_every == 0 else self.write_s)
+        now = time.perf_counter()
+        self.events.extend(tuple(data) for data, _ in events)
+        self.sent.extend([now] * len(events))
+
+    def close(self):
+        pass
+
+
+class DirectOutput:
+    """The old way: one device write per message, on the thread that reads input."""
+
+    def __init__(self, port):
+        self.port = port
+
+    def note_on(self, note, velocity, channel=0):
+        self.port.write([[[0x90 | channel, note, velocity], 0]])
+
+    def note_off(self, note, velocity, channel=0):
+        self.port.write([[[0x80 | channel, note, velocity], 0]])
+
+    def close(self):
+        pass
+
+
+def run(schedule, out, render_s):
+    """Feed the schedule through a LivePipeline; returns (arrivals, time each callback held the input thread)."""
+    pipeline = cs.LivePipeline(out, 'C', 'ionian', 'jazz', False, render=lambda update: time.sleep(render_s))
+    arrivals, held = [], []
+
+    def on_message(msg):
+        start = time.perf_counter()
+        pipeline.on_message(msg)
+        held.append(time.perf_counter() - start)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        pipeline.bind(loop)
+        done = loop.create_future()
+
+        def feed():
+            play(schedule, on_message, arrivals)
+            time.sleep(0.3)
+            loop.call_soon_threadsafe(done.set_result, None)
+
+        threading.Thread(target=feed, daemon=True).start()
+        await pipeline.run(done)
+
+    asyncio.run(main())
+    out.close()
+    return arrivals, held
+
+
+def check_policy(when_full):
+    """Stall the device with a tiny buffer and see what each policy does with a flood of notes."""
+    port = SlowPort(0.0005, stall_every=2, stall_s=0.05)
+    out = cs.ThruOutput(port, capacity=16, when_full=when_full)
+    rng = random.Random(1)
+    sent = []
+    start = time.perf_counter()
+    for _ in range(300):
+        note = rng.randrange(36, 96)
+        out.note_on(note, 100)
+        out.note_off(note, 0)
+        sent += [(0x90, note, 100), (0x80, note, 0)]
+    queued_for = time.perf_counter() - start
+    out.close()
+
+    got = port.events
+    held = {}
+    for status, note, _ in got:
+        held[note] = held.get(note, 0) + (1 if status == 0x90 else -1)
+    stuck = sum(1 for count in held.values() if count > 0)
+    in_order = all(event in sent for event in got)
+    print(f"   {when_full:<12} {len(got):>4} of {len(sent)} sent, {out.dropped:>4} dropped, {stuck:>2} notes left hanging, "
+          f"input blocked {queued_for * 1000:6.1f} ms in total")
+    assert out.written + out.dropped == len(sent) or when_full == 'drop-on'
+    assert in_order
+    return got, sent, stuck
+
+
+class UnpluggedPort(SlowPort):
+    """SlowPort that raises on every write after the first few, like a device pulled out mid-session."""
+
+    def __init__(self, write_s, fail_after=3):
+        super().__init__(write_s, stall_every=2, stall_s=0.05)
+        self.fail_after = fail_after
+
+    def write(self, events):
+        if self.calls >= self.fail_after:
+            raise OSError("device unplugged")
+        super().write(events)
+
+
+def check_unplugged():
+    """A blocking thru whose device goes away: the writer records the error and input stops waiting on it."""
+    port = UnpluggedPort(0.0005)
+    out = cs.ThruOutput(port, capacity=16, when_full='block')
+    start = time.perf_counter()
+    for note in range(36, 96):
+        for _ in range(5):
+            out.note_on(note, 100)
+            out.note_off(note, 0)
+    queued_for = time.perf_counter() - start
+    out.close()
+    print(f"   unplugged    {out.written:>4} of 600 sent, {out.dropped:>4} dropped after {out.error!r}, "
+          f"input blocked {queued_for * 1000:6.1f} ms in total")
+    assert isinstance(out.error, OSError) and not out.writer.is_alive()
+    assert out.written + out.dropped == 600
+    assert queued_for < 1, "input stayed blocked on a dead writer"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=3000)
+    parser.add_argument('--write-us', type=float, default=300, help="device cost per write call")
+    parser.add_argument('--render-ms', type=float, default=10.0, help="simulated terminal time per update")
+    args = parser.parse_args()
+
+    schedule = burst(args.events, random.Random(0))
+    print(f"🎹 {len(schedule)} events over {schedule[-1][0]:.2f} s; device writes cost {args.write_us:.0f} µs "
+          f"(20 ms stall every 200); {args.render_ms} ms per rendered update")
+
+    for label, render_ms in (("fast terminal", 0.0), ("slow terminal", args.render_ms)):
+        print(f"\n🖥️  {label}")
+        expected = None
+        for name, make in (("🐢 write per message ", lambda port: DirectOutput(port)),
+                           ("🚀 buffered ThruOutput", lambda port: cs.ThruOutput(port))):
+            port = SlowPort(args.write_us / 1e6)
+            out = make(port)
+            arrivals, held = run(schedule, out, render_ms / 1000)
+            expected = expected or port.events
+            assert port.events == expected, "thru lost or reordered events"
+            print(f"   {name}  input thread held: {percentiles(held)}")
+            print(f"   {' ' * len(name)}  input -> device:    {percentiles([s - a for s, a in zip(port.sent, arrivals)])}"
+                  f"   {port.calls} writes")
+
+    print("\n🧯 full buffer (16 events, device stalled 50 ms every other write):")
+    check_policy('drop-oldest')
+    _, _, stuck = check_policy('drop-on')
+    assert stuck == 0, "drop-on left notes hanging"
+    got, sent, _ = check_policy('block')
+    assert got == sent, "block lost events"
+    check_unplugged()
+    print("✅ every policy keeps order; drop-on never strands a note; block delivers everything "
+          "and stops waiting once the device is gone")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# Benchmark: voice-leading ranking with cached voicing moves vs searching every event
+# Run from the repo root: python benchmarks/bench_voice_leading.py
+
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import chord_suggester as cs
+
+
+def brute_force_distance(a, b):
+    """Try every way of giving each note of the bigger voicing a voice from the smaller one."""
+    if len(a) > len(b):
+        a, b = b, a
+    best = None
+    for assignment in itertools.product(range(len(a)), repeat=len(b)):
+        if len(set(assignment)) < len(a):
+            continue  # every voice has to go somewhere
+        cost = sum(abs(a[voice] - note) for voice, note in zip(assignment, b))
+        best = cost if best is None else min(best, cost)
+    return best
+
+
+def naive_rank(current_chord, notes, suggestions):
+    """Per event: match the held notes against every voicing of every candidate, no caching."""
+    held = tuple(sorted(notes))
+    moves = [min((brute_force_distance(held, v), v) for v in cs.chord_voicings.__wrapped__(chord))
+             for chord in suggestions]
+    ranked = sorted(range(len(suggestions)), key=lambda i: moves[i][0])
+    return [(suggestions[i], moves[i][1], moves[i][0]) for i in ranked]
+
+
+def random_voicing(rng, size):
+    return tuple(sorted(rng.sample(range(40, 80), size)))
+
+
+def held_chords(rng, engine, count):
+    """Hand shapes a player might hold: voicings of diatonic chords, sometimes with a doubling."""
+    events = []
+    for _ in range(count):
+        chord = rng.choice(engine.plain_chords + [c for options in engine.jazz_voicings for c in options])
+        notes = set(rng.choice(cs.chord_voicings(chord)))
+        if rng.random() < 0.3:
+            notes.add(min(notes) - 12)
+        events.append((chord, frozenset(notes)))
+    return events
+
+
+def per_call_us(fn, events, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for event in events:
+            fn(*event)
+        best = min(best, time.perf_counter() - start)
+    return best / len(events) * 1e6
+
+
+def main():
+    rng = random.Random(0)
+    for _ in range(3000):
+        a, b = random_voicing(rng, rng.randint(3, 4)), random_voicing(rng, rng.randint(3, 5))
+        assert cs.voicing_distance(a, b) == brute_force_distance(a, b), (a, b)
+    print("✅ in-order pairing with doublings matches brute force on 3000 random voicing pairs")
+
+    for quality, extensions, tones, _, _ in cs.CHORD_PATTERNS:
+        for root in range(12):
+            chord = cs.Chord.of(root, quality, extensions)
+            for voicing in cs.chord_voicings(chord):
+                if voicing[0] % 12 != root:
+                    continue  # inversions can be another chord's root position (C6 = Am7/C)
+                named = cs.recognize_chord(voicing, 0, 'ionian')
+                assert (named.root, named.quality, named.extensions) == (root, quality, extensions), \
+                    (chord.symbol(), tones, voicing, named.symbol())
+    print(f"✅ every root-position voicing of all {len(cs.CHORD_PATTERNS)} dictionary shapes names its own chord")
+
+    engine = cs.SuggestionEngine('C', 'ionian', 'jazz', False, rng=random.Random(1))
+    events = [(chord, notes, engine.suggest(chord)) for chord, notes in held_chords(rng, engine, 2000)]
+    table = cs.VoicingTable()
+    exact = [event for event in events if tuple(sorted(event[1])) in cs.chord_voicings(event[0])][:300]
+    for chord, notes, suggestions in exact:
+        expected = [cost for _, _, cost in naive_rank(chord, notes, suggestions)]
+        got = [cost for _, _, cost in table.rank(chord, notes, suggestions)]
+        assert got == expected, (chord, notes, got, expected)
+    print(f"✅ cached moves match a full search for {len(exact)} held voicings")
+
+    table = cs.VoicingTable()
+    start = time.perf_counter()
+    table.warm(engine.plain_chords + [c for options in engine.jazz_voicings for c in options])
+    print(f"🔥 warm-up for the key's diatonic chords: {(time.perf_counter() - start) * 1000:.0f} ms, "
+          f"{table.moves.cache_info().currsize:,} moves cached")
+
+    naive = per_call_us(naive_rank, events[:200], repeat=1)
+    cold = per_call_us(cs.VoicingTable().rank, events, repeat=1)
+    warm = per_call_us(table.rank, events)
+    print(f"🐢 search every voicing per event:  {naive:>9.1f} µs/event")
+    print(f"🧊 cached table, cold:              {cold:>9.1f} µs/event")
+    print(f"🚀 cached table, warm:              {warm:>9.1f} µs/event")
+
+
+if __name__ == '__main__':
+    main()
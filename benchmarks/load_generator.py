@@ -0,0 +1,150 @@
+# Load generator for the NDJSON socket server (chord_suggester.py --serve)
+# Run from the repo root:
+#   python benchmarks/load_generator.py                          # starts its own server on a Unix socket
+#   python benchmarks/load_generator.py --address 127.0.0.1:7474 --clients 8 --batch 16
+#
+# Each client pipelines requests (up to --window lines in flight) and checks every answer.
+# Note that with a self-started server, clients and server share the machine's cores.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+
+import chord_suggester as cs
+
+
+def held_notes(rng, engine):
+    """Mostly voicings of the key's chords (sometimes with a doubled bass), now and then a random cluster."""
+    if rng.random() < 0.1:
+        return sorted(48 + pc + 12 * rng.randrange(2) for pc in rng.sample(range(12), rng.randint(3, 5)))
+    chord = rng.choice(engine.plain_chords + [c for options in engine.jazz_voicings for c in options])
+    notes = set(rng.choice(cs.chord_voicings(chord)))
+    if rng.random() < 0.3:
+        notes.add(min(notes) - 12)
+    return sorted(notes)
+
+
+def request_lines(rng, count, batch):
+    """NDJSON lines of requests: chords in the session's key, now and then a key change."""
+    lines = []
+    engine = cs.get_suggestion_engine('C', 'ionian', 'pop', False)
+    modes = list(cs.mode_intervals)
+    for i in range(0, count, batch):
+        requests = []
+        for j in range(i, min(i + batch, count)):
+            request = {"id": j, "notes": held_notes(rng, engine)}
+            if rng.random() < 0.01:
+                tonic, mode = rng.choice(cs.root_names), rng.choice(modes)
+                request.update(tonic=tonic, mode=mode)
+                engine = cs.get_suggestion_engine(tonic, mode, 'pop', False)
+            requests.append(request)
+        lines.append(json.dumps(requests if batch > 1 else requests[0]).encode() + b"\n")
+    return lines
+
+
+async def client(address, lines, window, latencies):
+    kind, where = cs.parse_address(address)
+    if kind == 'unix':
+        reader, writer = await asyncio.open_unix_connection(where, limit=1 << 22)
+    else:
+        reader, writer = await asyncio.open_connection(*where, limit=1 << 22)
+
+    sent_at = []
+    answered = 0
+
+    async def read_answers():
+        nonlocal answered
+        while answered < len(lines):
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - sent_at[answered])
+            for answer in response if isinstance(response, list) else [response]:
+                assert "error" not in answer, answer
+            answered += 1
+
+    reading = asyncio.ensure_future(read_answers())
+    for line in lines:
+        while len(sent_at) - answered >= window:
+            await asyncio.sleep(0)
+        sent_at.append(time.perf_counter())
+        writer.write(line)
+        await writer.drain()
+    await reading
+    writer.close()
+
+
+async def run_load(address, clients, requests, batch, window):
+    rng = random.Random(0)
+    work = [request_lines(rng, requests // clients, batch) for _ in range(clients)]
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(address, lines, window, latencies) for lines in work))
+    elapsed = time.perf_counter() - start
+    return (requests // clients) * clients / elapsed, sorted(latencies)
+
+
+def server_ready(kind, where):
+    if kind == 'unix':
+        return os.path.exists(where)
+    try:
+        socket.create_connection(where, timeout=0.1).close()
+        return True
+    except OSError:
+        return False
+
+
+def start_server(address):
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'chord_suggester.py'), '--serve', address],
+                              stderr=subprocess.DEVNULL)
+    kind, where = cs.parse_address(address)
+    for _ in range(200):
+        if server_ready(kind, where):
+            return server
+        time.sleep(0.05)
+    server.kill()
+    raise RuntimeError("server didn't start")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--address', help="existing server to hit (default: start one on a temp Unix socket)")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--batch', type=int, nargs='+', default=[1, 16])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--window', type=int, default=32, help="lines in flight per client")
+    parser.add_argument('--min-rate', type=float, default=1000, help="fail below this many requests/s")
+    args = parser.parse_args()
+
+    server = None
+    address = args.address
+    if address is None:
+        address = f"unix:{os.path.join(tempfile.mkdtemp(), 'chords.sock')}"
+        server = start_server(address)
+    try:
+        best = 0.0
+        for clients in args.clients:
+            for batch in args.batch:
+                rate, latencies = asyncio.run(run_load(address, clients, args.requests, batch, args.window))
+                pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+                print(f"🛰️ {clients} client(s), batch {batch:>3}: {rate:>9,.0f} requests/s   "
+                      f"line round trip p50 {pick(0.5):6.2f} ms  p99 {pick(0.99):6.2f} ms")
+                best = max(best, rate)
+        assert best >= args.min_rate, f"best {best:,.0f} requests/s is below {args.min_rate:,.0f}"
+        print(f"✅ sustained over {args.min_rate:,.0f} requests/s")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+# Reproducible benchmark suite with machine-readable output.
+#
+#   python benchmarks/run_benchmarks.py                       # print a table
+#   python benchmarks/run_benchmarks.py -o results.json       # also save JSON
+#   python benchmarks/run_benchmarks.py --only suggest        # benchmarks whose name contains 'suggest'
+#   python benchmarks/run_benchmarks.py --compare old.json new.json
+#
+# Every benchmark uses fixed inputs and seeded randomness, and reports the best of
+# --repeat runs, so numbers from two commits on the same machine can be compared.
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import chord_suggester as cs
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Register fn(): returns (ops, run) where run() does `ops` operations."""
+    def register(fn):
+        BENCHMARKS.append((name, fn))
+        return fn
+    return register
+
+
+def all_pitch_class_sets():
+    return [{60 + pc for pc in range(12) if mask >> pc & 1} for mask in range(4096)]
+
+
+# --- RECOGNITION ---
+for _mode in cs.mode_intervals:
+    def _recognize(mode=_mode):
+        sets = all_pitch_class_sets()
+        for tonic_note in range(12):
+            cs.chord_name_table(tonic_note, mode, False)
+
+        def run():
+            for tonic_note in range(12):
+                for notes in sets:
+                    cs.get_chord_name(notes, False, tonic_note, mode)
+        return len(sets) * 12, run
+    benchmark(f"recognize/all_4096_sets/{_mode}")(_recognize)
+
+    def _degrees(mode=_mode):
+        def run():
+            for _ in range(100):
+                for tonic_note in range(12):
+                    for root in range(12):
+                        cs.get_scale_degree_name(root, tonic_note, mode)
+        return 100 * 144, run
+    benchmark(f"scale_degree/{_mode}")(_degrees)
+
+
+@benchmark("recognize/table_build")
+def _table_build():
+    def run():
+        cs._compiled_chord_dictionary.cache_clear()
+        cs.chord_object_table.cache_clear()
+        cs.chord_name_table.cache_clear()
+        cs.chord_name_table(0, 'ionian', False)
+    return 1, run
+
+
+# --- SUGGESTION ---
+def recognized_chords(mode):
+    rng = random.Random(0)
+    return [cs.recognize_chord({60 + pc for pc in rng.sample(range(12), rng.randint(3, 5))}, 0, mode)
+            for _ in range(1000)]
+
+
+for _style in ('pop', 'jazz', 'classical'):
+    def _suggest(style=_style):
+        chords = {mode: recognized_chords(mode) for mode in cs.mode_intervals}
+
+        def run():
+            for mode, mode_chords in chords.items():
+                engine = cs.SuggestionEngine('C', mode, style, False, rng=random.Random(42))
+                for chord in mode_chords:
+                    engine.suggest(chord)
+        return sum(len(c) for c in chords.values()), run
+    benchmark(f"suggest/{_style}")(_suggest)
+
+
+# --- LOOKAHEAD ---
+for _length in (8, 16):
+    def _lookahead(length=_length):
+        engines = [cs.get_suggestion_engine('C', mode, 'jazz', False) for mode in cs.mode_intervals]
+
+        def run():
+            for engine in engines:
+                cs.ProgressionSearch(engine).search(length, 64, 5)
+        return len(engines), run
+    benchmark(f"lookahead/{_length}_chords_beam_64")(_lookahead)
+
+
+# --- VOICE LEADING ---
+@benchmark("voice_leading/rank_warm")
+def _voice_leading():
+    rng = random.Random(0)
+    engine = cs.SuggestionEngine('C', 'dorian', 'jazz', False, rng=random.Random(1))
+    chords = engine.plain_chords + [c for options in engine.jazz_voicings for c in options]
+    table = cs.VoicingTable()
+    table.warm(chords)
+    events = []
+    for _ in range(5000):
+        chord = rng.choice(chords)
+        events.append((chord, frozenset(rng.choice(cs.chord_voicings(chord))), rng.sample(chords, 3)))
+
+    def run():
+        for event in events:
+            table.rank(*event)
+    return len(events), run
+
+
+# --- KEY DETECTION ---
+@benchmark("key_detection/update")
+def _key_detection():
+    rng = random.Random(0)
+    events = [(rng.randrange(36, 84), i * 0.005) for i in range(20000)]
+
+    def run():
+        detector = cs.KeyDetector()
+        for note, now in events:
+            detector.update(note, now)
+    return len(events), run
+
+
+# --- PROGRESSION MODEL ---
+@benchmark("model/ranked_lookup")
+def _model_lookup():
+    import array
+    import tempfile
+
+    rng = random.Random(0)
+    rows = cs._model_layout(2)[1] * 7 * len(cs.model_modes)
+    path = os.path.join(tempfile.mkdtemp(), 'model.cspm')
+    cs.write_progression_model(path, 2, array.array('I', (rng.randrange(100) for _ in range(rows))))
+    model = cs.ProgressionModel(path)
+    states = [[rng.randrange(8) for _ in range(rng.randint(1, 3))] for _ in range(10000)]
+
+    def run():
+        for s in states:
+            model.ranked('dorian', s)
+    return len(states), run
+
+
+# --- END TO END ---
+class NullOutput:
+    def note_on(self, note, velocity, channel=0):
+        pass
+
+    def note_off(self, note, velocity, channel=0):
+        pass
+
+
+class FakeInputPort:
+    """Delivers a fixed message list to a callback from its own thread, like a mido backend."""
+
+    def __init__(self, messages, callback):
+        self.thread = threading.Thread(target=lambda: [callback(m) for m in messages], daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def join(self):
+        self.thread.join()
+
+
+def synthetic_stream(events, seed=0):
+    import mido
+
+    rng = random.Random(seed)
+    scale = cs.mode_intervals['ionian']
+    messages = []
+    while len(messages) < events:
+        degree = rng.randrange(7)
+        chord = [48 + scale[(degree + s) % 7] + 12 * ((degree + s) // 7) for s in (0, 2, 4, 6)[:rng.randint(3, 4)]]
+        messages += [mido.Message('note_on', note=n, velocity=80) for n in chord]
+        messages += [mido.Message('aftertouch', value=rng.randrange(128)) for _ in range(rng.randint(0, 4))]
+        messages += [mido.Message('note_off', note=n) for n in chord]
+    return messages[:events]
+
+
+@benchmark("end_to_end/live_pipeline_replay")
+def _replay():
+    messages = synthetic_stream(20000)
+
+    def run():
+        pipeline = cs.LivePipeline(NullOutput(), 'C', 'ionian', 'jazz', False, render=lambda update: None)
+        pipeline.stream.engine = cs.SuggestionEngine('C', 'ionian', 'jazz', False, rng=random.Random(0))
+
+        async def replay():
+            loop = asyncio.get_running_loop()
+            pipeline.bind(loop)
+            done = loop.create_future()
+            port = FakeInputPort(messages, pipeline.on_message)
+
+            def finish():
+                port.join()
+                loop.call_soon_threadsafe(done.set_result, None)
+
+            port.start()
+            threading.Thread(target=finish, daemon=True).start()
+            await pipeline.run(done)
+        asyncio.run(replay())
+    return len(messages), run
+
+
+@benchmark("end_to_end/offline_track_replay")
+def _offline():
+    messages = synthetic_stream(20000)
+
+    def run():
+        stream = cs.ChordStream('C', 'ionian', 'pop')
+        stream.engine = cs.SuggestionEngine('C', 'ionian', 'pop', False, rng=random.Random(0))
+        for msg in messages:
+            _, notes = stream.feed(msg)
+            if notes is not None:
+                stream.name(notes, 0.0)
+    return len(messages), run
+
+
+# --- HARNESS ---
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmarks(only=None, repeat=5):
+    results = []
+    for name, setup in BENCHMARKS:
+        if only and not any(o in name for o in only):
+            continue
+        ops, run = setup()
+        run()  # warm-up
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        best = min(times)
+        results.append({
+            "name": name,
+            "ops": ops,
+            "best_s": best,
+            "median_s": sorted(times)[len(times) // 2],
+            "ops_per_s": ops / best,
+        })
+        print(f"  {name:<44} {ops / best:>14,.0f} ops/s   best {best * 1000:9.2f} ms", file=sys.stderr)
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = {r["name"]: r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{'benchmark':<44} {'old ops/s':>14} {'new ops/s':>14}   change")
+    for r in new["results"]:
+        before = old.get(r["name"])
+        if before is None:
+            print(f"{r['name']:<44} {'-':>14} {r['ops_per_s']:>14,.0f}   new")
+            continue
+        change = r["ops_per_s"] / before["ops_per_s"] - 1
+        flag = "🔺" if change > 0.05 else "🔻" if change < -0.05 else "  "
+        print(f"{r['name']:<44} {before['ops_per_s']:>14,.0f} {r['ops_per_s']:>14,.0f}   {change:+7.1%} {flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-o', '--output', help="write results as JSON here")
+    parser.add_argument('--only', nargs='+', help="run benchmarks whose name contains any of these")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run_benchmarks(args.only, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,25 +4,16 @@
 # License: MIT
 
 
+import math
+import os
 import random
-import mido
-import pygame.midi
-pygame.midi.init()
-
-# 👇 Replace default with loopMIDI
-for i in range(pygame.midi.get_count()):
-    interf, name, input_, output_, opened = pygame.midi.get_device_info(i)
-    if output_ and b'loopMIDI' in name:
-        output_id = i
-        break
-else:
-    print("❌ loopMIDI not found! Is it running?")
-    exit()
-
-midi_out = pygame.midi.Output(output_id)
-
-
-active_notes = set()
+import signal
+import sys
+import time
+from bisect import bisect_left
+from collections import Counter, deque, namedtuple
+from functools import lru_cache
+from itertools import combinations, combinations_with_replacement, permutations
 
 root_names = ['C', 'C#', 'D', 'D#', 'E', 'F',
               'F#', 'G', 'G#', 'A', 'A#', 'B']
@@ -82,88 +73,89 @@ def get_scale_degree_name(root_note, tonic_note, mode):
                 return labels[i]
     return None
 
-def get_progression_rules(mode):
-    rules = {
-        'ionian': {
-            'I': ['IV', 'V', 'vi'],
-            'ii': ['V'],
-            'iii': ['vi'],
-            'IV': ['I', 'V'],
-            'V': ['I'],
-            'vi': ['ii', 'IV'],
-            'vii°': ['I']
-        },
-        'dorian': {
-            'i': ['IV', 'v', '♭VII'],
-            'ii': ['v'],
-            '♭III': ['vi°'],
-            'IV': ['i', '♭VII'],
-            'v': ['♭VII', 'i'],
-            'vi°': ['ii'],
-            '♭VII': ['i']
-        },
-        'phrygian': {
-            'i': ['♭II', '♭VI', '♭VII'],
-            '♭II': ['♭VII'],
-            '♭III': ['♭VI'],
-            '♭VI': ['♭VII', 'i'],
-            '♭VII': ['i']
-        },
-        'lydian': {
-            'I': ['II', 'V', 'vi'],
-            'II': ['V'],
-            'iii': ['vi'],
-            '#iv°': ['V'],
-            'V': ['I'],
-            'vi': ['II', 'iii']
-        },
-        'mixolydian': {
-            'I': ['IV', 'v', '♭VII'],
-            'ii': ['v'],
-            'iii°': ['vi'],
-            'IV': ['I', 'v'],
-            'v': ['I'],
-            'vi': ['ii'],
-            '♭VII': ['I']
-        },
-        'aeolian': {
-            'i': ['iv', '♭VI', '♭VII'],
-            'ii°': ['iv'],
-            '♭III': ['♭VI'],
-            'iv': ['♭VII', 'i'],
-            'v': ['♭VI', 'i'],
-            '♭VI': ['♭VII', 'i'],
-            '♭VII': ['i']
-        },
-        'aeolian_h': {
-            'i': ['iv', 'V', '♭VI'],
-            'ii°': ['V'],
-            '♭III+': ['VI'],
-            'iv': ['V'],
-            'V': ['i'],
-            'VI': ['ii°'],
-            'vii°': ['i']
-        },
-        'aeolian_m': {
-            'i': ['IV', 'V'],
-            'ii': ['V'],
-            '♭III+': ['VI'],
-            'IV': ['V'],
-            'V': ['i'],
-            'vi°': ['ii'],
-            'vii°': ['i']
-        },
-        'locrian': {
-            'i°': ['♭III', 'iv'],
-            '♭II': ['♭V'],
-            '♭III': ['♭VI'],
-            'iv': ['♭VII'],
-            '♭V': ['i°'],
-            '♭VI': ['♭VII'],
-            '♭VII': ['i°']
-        }
+progression_rules = {
+    'ionian': {
+        'I': ['IV', 'V', 'vi'],
+        'ii': ['V'],
+        'iii': ['vi'],
+        'IV': ['I', 'V'],
+        'V': ['I'],
+        'vi': ['ii', 'IV'],
+        'vii°': ['I']
+    },
+    'dorian': {
+        'i': ['IV', 'v', '♭VII'],
+        'ii': ['v'],
+        '♭III': ['vi°'],
+        'IV': ['i', '♭VII'],
+        'v': ['♭VII', 'i'],
+        'vi°': ['ii'],
+        '♭VII': ['i']
+    },
+    'phrygian': {
+        'i': ['♭II', '♭VI', '♭VII'],
+        '♭II': ['♭VII'],
+        '♭III': ['♭VI'],
+        '♭VI': ['♭VII', 'i'],
+        '♭VII': ['i']
+    },
+    'lydian': {
+        'I': ['II', 'V', 'vi'],
+        'II': ['V'],
+        'iii': ['vi'],
+        '#iv°': ['V'],
+        'V': ['I'],
+        'vi': ['II', 'iii']
+    },
+    'mixolydian': {
+        'I': ['IV', 'v', '♭VII'],
+        'ii': ['v'],
+        'iii°': ['vi'],
+        'IV': ['I', 'v'],
+        'v': ['I'],
+        'vi': ['ii'],
+        '♭VII': ['I']
+    },
+    'aeolian': {
+        'i': ['iv', '♭VI', '♭VII'],
+        'ii°': ['iv'],
+        '♭III': ['♭VI'],
+        'iv': ['♭VII', 'i'],
+        'v': ['♭VI', 'i'],
+        '♭VI': ['♭VII', 'i'],
+        '♭VII': ['i']
+    },
+    'aeolian_h': {
+        'i': ['iv', 'V', '♭VI'],
+        'ii°': ['V'],
+        '♭III+': ['VI'],
+        'iv': ['V'],
+        'V': ['i'],
+        'VI': ['ii°'],
+        'vii°': ['i']
+    },
+    'aeolian_m': {
+        'i': ['IV', 'V'],
+        'ii': ['V'],
+        '♭III+': ['VI'],
+        'IV': ['V'],
+        'V': ['i'],
+        'vi°': ['ii'],
+        'vii°': ['i']
+    },
+    'locrian': {
+        'i°': ['♭III', 'iv'],
+        '♭II': ['♭V'],
+        '♭III': ['♭VI'],
+        'iv': ['♭VII'],
+        '♭V': ['i°'],
+        '♭VI': ['♭VII'],
+        '♭VII': ['i°']
     }
-    return rules.get(mode.lower(), {})
+}
+
+def get_progression_rules(mode):
+    return progression_rules.get(mode.lower(), {})
 
 def get_mode_chord_suggestions(tonic_note, mode, prefer_flats):
     suggestions = []
@@ -190,56 +182,411 @@ def get_mode_chord_suggestions(tonic_note, mode, prefer_flats):
         suggestions.append(f"{name} ({label}) [{chord_type}]")
     return suggestions
 
+# --- CHORD OBJECTS ---
+# Chords travel through recognition and suggestion as interned Chord objects;
+# they only become strings when something is displayed.
+
+MAJOR, MINOR, DIMINISHED, AUGMENTED, DOMINANT7, MAJOR7, MINOR7, HALF_DIMINISHED7, DIMINISHED7, AUGMENTED7 = range(10)
+SUS2, SUS4, SEVEN_SUS4, SIXTH, MINOR6, MINOR_MAJOR7 = range(10, 16)
+
+quality_suffixes = ['', 'm', 'dim', 'aug', '7', 'maj7', 'm7', 'm7♭5', 'dim7', 'aug7',
+                    'sus2', 'sus4', '7sus4', '6', 'm6', 'mMaj7']
+triad_words = {MAJOR: 'major', MINOR: 'minor', DIMINISHED: 'diminished', AUGMENTED: 'augmented'}
+
+# Extension bits
+FLAT_9, NINTH, SHARP_9, ELEVENTH, SHARP_11, THIRTEENTH, SHARP_5, FLAT_5, FLAT_13 = (1 << i for i in range(9))
+
+extension_names = [(FLAT_5, '♭5'), (SHARP_5, '♯5'), (FLAT_9, '♭9'), (NINTH, '9'), (SHARP_9, '♯9'),
+                   (ELEVENTH, '11'), (SHARP_11, '♯11'), (FLAT_13, '♭13'), (THIRTEENTH, '13')]
+
+# Chord tones above the root, per quality and per extension bit
+quality_intervals = [(0, 4, 7), (0, 3, 7), (0, 3, 6), (0, 4, 8), (0, 4, 7, 10), (0, 4, 7, 11),
+                     (0, 3, 7, 10), (0, 3, 6, 10), (0, 3, 6, 9), (0, 4, 8, 10),
+                     (0, 2, 7), (0, 5, 7), (0, 5, 7, 10), (0, 4, 7, 9), (0, 3, 7, 9), (0, 3, 7, 11)]
+extension_intervals = {FLAT_9: 1, NINTH: 2, SHARP_9: 3, ELEVENTH: 5, SHARP_11: 6, FLAT_13: 8, THIRTEENTH: 9}
+
+# Names that replace the seventh instead of just stacking extensions after it
+extended_suffixes = {
+    (MINOR7, NINTH): 'm9',
+    (MINOR7, ELEVENTH): 'm11',
+    (MINOR7, THIRTEENTH): 'm13',
+    (MAJOR7, NINTH): 'maj9',
+    (MAJOR7, THIRTEENTH): 'maj13',
+    (DOMINANT7, NINTH): '9',
+    (DOMINANT7, NINTH | ELEVENTH): '11',
+    (DOMINANT7, THIRTEENTH): '13',
+    (DIMINISHED7, NINTH): 'dim9',
+    (AUGMENTED7, NINTH): 'aug9',
+    (SEVEN_SUS4, NINTH): '9sus4',
+    (MAJOR, NINTH): 'add9',
+    (MINOR, NINTH): 'madd9',
+    (SIXTH, NINTH): '6/9',
+    (MINOR6, NINTH): 'm6/9',
+}
+
+@lru_cache(maxsize=None)
+def chord_suffix(quality, extensions=0):
+    special = extended_suffixes.get((quality, extensions))
+    if special is not None:
+        return special
+    return quality_suffixes[quality] + ''.join(name for bit, name in extension_names if extensions & bit)
+
+@lru_cache(maxsize=None)
+def chord_intervals(quality, extensions=0):
+    """Semitones above the root, e.g. (0, 4, 7, 10, 1) for 7♭9."""
+    intervals = quality_intervals[quality]
+    if extensions & (SHARP_5 | FLAT_5):
+        fifth = 8 if extensions & SHARP_5 else 6
+        intervals = tuple(fifth if i == 7 else i for i in intervals)
+    return intervals + tuple(i for bit, i in extension_intervals.items() if extensions & bit)
+
+class Chord:
+    """
+    A chord as numbers: root pitch class, quality ID, extension bitmask and scale
+    degree index (-1 if the root isn't in the mode). Instances are interned, so
+    build them with Chord.of() and compare with `is`/`==` freely.
+    """
+    __slots__ = ('root', 'quality', 'extensions', 'degree')
+    _interned = {}
+
+    @classmethod
+    def of(cls, root, quality, extensions=0, degree=-1):
+        key = (root % 12, quality, extensions, degree)
+        chord = cls._interned.get(key)
+        if chord is None:
+            chord = object.__new__(cls)
+            chord.root, chord.quality, chord.extensions, chord.degree = key
+            cls._interned[key] = chord
+        return chord
+
+    def symbol(self, prefer_flats=False, bass=None):
+        """Lead-sheet symbol, e.g. 'Bbm7', or 'C/E' given a bass pitch class other than the root."""
+        slash = f"/{note_name(bass, prefer_flats)}" if bass is not None and bass != self.root else ''
+        return note_name(self.root, prefer_flats) + chord_suffix(self.quality, self.extensions) + slash
+
+    def pitch_classes(self):
+        return tuple((self.root + i) % 12 for i in chord_intervals(self.quality, self.extensions))
+
+    def describe(self, mode, prefer_flats=False, bass=None):
+        """get_chord_name's format: 'Gm7 (ii)', or 'G (V)' / 'G major' for triads; 'C/E (I)' inverted."""
+        labels = degree_names.get(mode.lower())
+        label = labels[self.degree] if labels and self.degree >= 0 else None
+        # Augmented triads keep their suffix next to a degree label, which may not say '+'
+        if self.quality in triad_words and not self.extensions and not (label and self.quality == AUGMENTED):
+            name = note_name(self.root, prefer_flats)
+            if bass is not None and bass != self.root:
+                name += f"/{note_name(bass, prefer_flats)}"
+            return f"{name} ({label})" if label else f"{name} {triad_words[self.quality]}"
+        symbol = self.symbol(prefer_flats, bass)
+        return f"{symbol} ({label})" if label else symbol
+
+    def __repr__(self):
+        return f"<Chord {self.symbol()} degree={self.degree}>"
+
+@lru_cache(maxsize=None)
+def scale_degree_indexes(tonic_note, mode):
+    """Degree index of each of the 12 pitch classes in a key, -1 if outside the mode."""
+    intervals = mode_intervals.get(mode.lower(), [])
+    return tuple(intervals.index((pc - tonic_note) % 12) if (pc - tonic_note) % 12 in intervals else -1
+                 for pc in range(12))
+
+def chord_in_key(root, quality, extensions, tonic_note, mode):
+    return Chord.of(root, quality, extensions, scale_degree_indexes(tonic_note, mode)[root % 12])
+
+@lru_cache(maxsize=None)
+def suffix_chords():
+    """Suffix text -> (quality, extensions), for reading chord symbols typed by people."""
+    combos = [(q, 0) for q in range(len(quality_suffixes))] + list(extended_suffixes)
+    combos += [(q, e) for q, e, _, _, _ in CHORD_PATTERNS]
+    table = {chord_suffix(q, e): (q, e) for q, e in combos}
+    table.update({'m7b5': (HALF_DIMINISHED7, 0), 'min': (MINOR, 0), 'maj': (MAJOR, 0), '+': (AUGMENTED, 0)})
+    return table
+
+# --- CHORD RECOGNITION TABLES ---
+# The chord dictionary: every shape get_chord_name knows, as (quality, extensions, tones,
+# priority, also with extra notes?). Tones are named from the root; a tone in parentheses
+# may be left out (fifths usually are). It's compiled once into a table over all 4096
+# pitch-class sets, so adding shapes costs table-build time, never lookup time.
+#
+# Picking between matches, best first:
+#   1. a shape matched exactly beats one only matched with extra notes on top
+#   2. the shape rooted on the bass note, if there is one (C6 vs Am7 goes by the bass)
+#   3. otherwise the lowest priority number, then the earliest entry, named over the
+#      bass as a slash chord (E G C -> C/E)
+CHORD_PATTERNS = [
+    # --- TRIADS ---
+    (MAJOR,            0,                   '1 3 5',                0, False),  # C
+    (MINOR,            0,                   '1 b3 5',               0, False),  # Cm
+    (DIMINISHED,       0,                   '1 b3 b5',              0, False),  # Cdim
+    (AUGMENTED,        0,                   '1 3 #5',               3, False),  # Caug
+    (SUS4,             0,                   '1 4 5',                2, False),  # Csus4
+    (SUS2,             0,                   '1 2 5',                3, False),  # Csus2
+    # --- SEVENTH CHORDS ---
+    (DOMINANT7,        0,                   '1 3 (5) b7',           1, False),  # C7
+    (MAJOR7,           0,                   '1 3 (5) 7',            1, False),  # Cmaj7
+    (MINOR7,           0,                   '1 b3 (5) b7',          1, False),  # Cm7
+    (HALF_DIMINISHED7, 0,                   '1 b3 b5 b7',           1, False),  # Cm7♭5
+    (DIMINISHED7,      0,                   '1 b3 b5 bb7',          1, False),  # Cdim7
+    (MINOR_MAJOR7,     0,                   '1 b3 5 7',             3, False),  # CmMaj7
+    (AUGMENTED7,       0,                   '1 3 #5 b7',            4, False),  # Caug7
+    (SEVEN_SUS4,       0,                   '1 4 5 b7',             3, False),  # C7sus4
+    (DOMINANT7,        FLAT_5,              '1 3 b5 b7',            4, False),  # C7♭5
+    (MAJOR7,           SHARP_5,             '1 3 #5 7',             4, False),  # Cmaj7♯5
+    # --- SIXTHS AND ADDED NOTES ---
+    (SIXTH,            0,                   '1 3 5 6',              2, False),  # C6
+    (MINOR6,           0,                   '1 b3 5 6',             2, False),  # Cm6
+    (MAJOR,            NINTH,               '1 3 5 9',              2, False),  # Cadd9
+    (MINOR,            NINTH,               '1 b3 5 9',             2, False),  # Cmadd9
+    (SIXTH,            NINTH,               '1 3 (5) 6 9',          3, False),  # C6/9
+    (MINOR6,           NINTH,               '1 b3 (5) 6 9',         3, False),  # Cm6/9
+    # --- EXTENDED CHORDS ---
+    (DOMINANT7,        NINTH,               '1 3 (5) b7 9',         2, False),  # C9
+    (MINOR7,           NINTH,               '1 b3 (5) b7 9',        2, True),   # Cm9
+    (MAJOR7,           NINTH,               '1 3 (5) 7 9',          2, True),   # Cmaj9
+    (MINOR7,           ELEVENTH,            '1 b3 (5) b7 (9) 11',   3, True),   # Cm11
+    (SEVEN_SUS4,       NINTH,               '1 4 (5) b7 9',         3, False),  # C9sus4
+    (DOMINANT7,        NINTH | ELEVENTH,    '1 (3) (5) b7 9 11',    3, False),  # C11
+    (DOMINANT7,        THIRTEENTH,          '1 3 (5) b7 (9) 13',    3, True),   # C13
+    (MINOR7,           THIRTEENTH,          '1 b3 (5) b7 (9) 13',   3, False),  # Cm13
+    (MAJOR7,           THIRTEENTH,          '1 3 (5) 7 (9) 13',     3, False),  # Cmaj13
+    (DIMINISHED7,      NINTH,               '1 b3 b5 bb7 9',        4, False),  # Cdim9
+    (AUGMENTED7,       NINTH,               '1 3 #5 b7 9',          4, False),  # Caug9
+    # --- ALTERED ---
+    (DOMINANT7,        FLAT_9,              '1 3 (5) b7 b9',        3, True),   # C7♭9
+    (DOMINANT7,        SHARP_9,             '1 3 (5) b7 #9',        3, True),   # C7♯9
+    (MAJOR7,           SHARP_11,            '1 3 (5) 7 (9) #11',    3, True),   # Cmaj7♯11
+    (DOMINANT7,        SHARP_11,            '1 3 (5) b7 (9) #11',   4, False),  # C7♯11
+    (DOMINANT7,        FLAT_13,             '1 3 (5) b7 b13',       4, False),  # C7♭13
+    (DOMINANT7,        SHARP_5 | FLAT_9,    '1 3 #5 b7 b9',         4, False),  # C7♯5♭9
+]
+
+TONE_SEMITONES = {'1': 0, 'b2': 1, '2': 2, '#2': 3, 'b3': 3, '3': 4, '4': 5, '#4': 6, 'b5': 6, '5': 7,
+                  '#5': 8, 'b6': 8, '6': 9, 'bb7': 9, 'b7': 10, '7': 11,
+                  'b9': 1, '9': 2, '#9': 3, '11': 5, '#11': 6, 'b13': 8, '13': 9}
+
+def parse_tones(tones):
+    """'1 3 (5) b7' -> (required semitones, optional semitones)."""
+    required, optional = [], []
+    for tone in tones.split():
+        if tone.startswith('('):
+            optional.append(TONE_SEMITONES[tone.strip('()')])
+        else:
+            required.append(TONE_SEMITONES[tone])
+    return tuple(required), tuple(optional)
+
+def pitch_class_mask(notes):
+    mask = 0
+    for n in notes:
+        mask |= 1 << (n % 12)
+    return mask
+
+def _rotate_mask(mask, semitones):
+    semitones %= 12
+    return ((mask << semitones) | (mask >> (12 - semitones))) & 0xFFF
+
+def _submasks(mask):
+    sub = mask
+    while True:
+        yield sub
+        if sub == 0:
+            break
+        sub = (sub - 1) & mask
+
+@lru_cache(maxsize=None)
+def _compiled_chord_dictionary():
+    """
+    (candidates, choices) over all 4096 pitch-class masks. candidates[mask] is the best
+    (root, pattern index) per matching root, best first; choices[mask][bass] is the pick
+    for that bass pitch class (None where the bass isn't in the mask or nothing matches).
+    """
+    ranks = [{} for _ in range(4096)]  # root -> (extra notes?, priority, pattern index)
+    for pattern_index, (_, _, tones, priority, superset) in enumerate(CHORD_PATTERNS):
+        required, optional = parse_tones(tones)
+        base = pitch_class_mask(required)
+        shapes = [(base | sub, 0) for sub in _submasks(pitch_class_mask(optional))]
+        if superset:
+            shapes += [(base | extra, 1) for extra in _submasks(0xFFF & ~base)]
+        for shape, extra in shapes:
+            if bin(shape).count('1') < 3:
+                continue  # nothing to name below three pitch classes
+            rank = (extra, priority, pattern_index)
+            for root in range(12):
+                by_root = ranks[_rotate_mask(shape, root)]
+                if rank < by_root.get(root, (2,)):
+                    by_root[root] = rank
+
+    candidates, choices = [], []
+    for mask, by_root in enumerate(ranks):
+        ranked = sorted(by_root.items(), key=lambda item: item[1])
+        candidates.append(tuple((root, rank[2]) for root, rank in ranked))
+        if not ranked:
+            choices.append(None)
+            continue
+        best_root, best = ranked[0]
+        picks = []
+        for bass in range(12):
+            if not mask >> bass & 1:
+                picks.append(None)
+            elif bass in by_root and by_root[bass][0] == best[0]:
+                picks.append((bass, by_root[bass][2]))
+            else:
+                picks.append((best_root, best[2]))
+        choices.append(tuple(picks))
+    return tuple(candidates), tuple(choices)
+
+def chord_quality_table():
+    """For all 4096 pitch-class masks: the (root, pattern index) pairs that match, best first."""
+    return _compiled_chord_dictionary()[0]
+
+def chord_choice_table():
+    """For all 4096 pitch-class masks: the (root, pattern index) picked for each bass pitch class."""
+    return _compiled_chord_dictionary()[1]
+
+def pattern_chord(root, pattern_index, tonic_note, mode):
+    quality, extensions, _, _, _ = CHORD_PATTERNS[pattern_index]
+    return chord_in_key(root, quality, extensions, tonic_note, mode)
+
+def format_chord_name(root, pattern_index, tonic_note, mode, prefer_flats, bass=None):
+    return pattern_chord(root, pattern_index, tonic_note, mode).describe(mode, prefer_flats, bass)
+
+@lru_cache(maxsize=None)
+def chord_object_table(tonic_note, mode):
+    """Chord objects for every pitch-class mask in one key: None, or one per bass pitch class."""
+    return tuple(
+        tuple(pattern_chord(*pick, tonic_note, mode) if pick else None for pick in picks) if picks else None
+        for picks in chord_choice_table()
+    )
+
+@lru_cache(maxsize=None)
+def chord_name_table(tonic_note, mode, prefer_flats):
+    """Fully formatted chord names (slash chords included) for every pitch-class mask and bass in one key."""
+    return tuple(
+        tuple(chord.describe(mode, prefer_flats, bass) if chord else None for bass, chord in enumerate(chords))
+        if chords else None
+        for chords in chord_object_table(tonic_note, mode)
+    )
+
+def recognize_chord(notes, tonic_note, mode):
+    """Like get_chord_name, but returns the Chord object (None if unrecognized or < 3 notes)."""
+    if len(notes) < 3:
+        return None
+    chords = chord_object_table(tonic_note, mode)[pitch_class_mask(notes)]
+    return chords[min(notes) % 12] if chords else None
+
+def slash_bass(chord, notes):
+    """The bass pitch class when it isn't the chord's root (E for C/E), else None."""
+    if chord is None or not notes:
+        return None
+    bass = min(notes) % 12
+    return bass if bass != chord.root else None
+
+# "No chord yet" marker for change tracking (None already means "unrecognized")
+NO_CHORD = object()
+
 def get_chord_name(notes, prefer_flats, tonic_note, mode):
     if len(notes) < 3:
         return None
 
-    sorted_notes = sorted(notes)
-    best_match = None
-
-    for try_root in sorted_notes:
-        intervals = sorted([(n - try_root) % 12 for n in sorted_notes])
-        chord_name = note_name(try_root, prefer_flats)
-        degree = get_scale_degree_name(try_root, tonic_note, mode)
-
-        # --- EXTENDED CHORDS ---
-        if set(intervals) >= {0, 3, 7, 10, 2}:  # m9
-            best_match = f"{chord_name}m9 ({degree})" if degree else f"{chord_name}m9"
-        elif set(intervals) >= {0, 3, 7, 10, 5}:  # m11
-            best_match = f"{chord_name}m11 ({degree})" if degree else f"{chord_name}m11"
-        elif set(intervals) >= {0, 4, 7, 11, 2}:  # maj9
-            best_match = f"{chord_name}maj9 ({degree})" if degree else f"{chord_name}maj9"
-        elif set(intervals) >= {0, 4, 7, 10, 1}:  # 7♭9
-            best_match = f"{chord_name}7♭9 ({degree})" if degree else f"{chord_name}7♭9"
-        elif set(intervals) >= {0, 4, 7, 10, 3}:  # 7♯9
-            best_match = f"{chord_name}7♯9 ({degree})" if degree else f"{chord_name}7♯9"
-        elif set(intervals) >= {0, 4, 7, 11, 6}:  # maj7♯11
-            best_match = f"{chord_name}maj7♯11 ({degree})" if degree else f"{chord_name}maj7♯11"
-        elif set(intervals) >= {0, 4, 7, 10, 9}:  # 13
-            best_match = f"{chord_name}13 ({degree})" if degree else f"{chord_name}13"
-
-        # --- SEVENTH CHORDS ---
-        elif intervals == [0, 4, 7, 10]:
-            best_match = f"{chord_name}7 ({degree})" if degree else f"{chord_name}7"
-        elif intervals == [0, 4, 7, 11]:
-            best_match = f"{chord_name}maj7 ({degree})" if degree else f"{chord_name}maj7"
-        elif intervals == [0, 3, 7, 10]:
-            best_match = f"{chord_name}m7 ({degree})" if degree else f"{chord_name}m7"
-        elif intervals == [0, 3, 6, 10]:
-            best_match = f"{chord_name}m7♭5 ({degree})" if degree else f"{chord_name}m7♭5"
-
-        # --- TRIADS ---
-        elif intervals == [0, 4, 7]:
-            best_match = f"{chord_name} ({degree})" if degree else f"{chord_name} major"
-        elif intervals == [0, 3, 7]:
-            best_match = f"{chord_name} ({degree})" if degree else f"{chord_name} minor"
-        elif intervals == [0, 3, 6]:
-            best_match = f"{chord_name} ({degree})" if degree else f"{chord_name} diminished"
-
-        if best_match:
-            break
- 
-    return best_match or "Unrecognized chord"
+    names = chord_name_table(tonic_note, mode, prefer_flats)[pitch_class_mask(notes)]
+    if not names:
+        return "Unrecognized chord"
+    return names[min(notes) % 12]
+
+# --- BATCH ANALYSIS (NumPy) ---
+# Same tables as get_chord_name, laid out as arrays so a whole matrix of voicings
+# can be named in one pass. NumPy is only needed if you call these.
+
+@lru_cache(maxsize=None)
+def _quality_arrays():
+    import numpy as np
+    # choice_root / choice_id[mask, bass] = the pick for that bass pitch class, -1 if none
+    choice_root = np.full((4096, 12), -1, dtype=np.int8)
+    choice_id = np.full((4096, 12), -1, dtype=np.int16)
+    for mask, picks in enumerate(chord_choice_table()):
+        for bass, pick in enumerate(picks or ()):
+            if pick:
+                choice_root[mask, bass], choice_id[mask, bass] = pick
+    # lowest_class[mask] = lowest pitch class in the mask (the bass when only masks are given)
+    lowest_class = np.array([(m & -m).bit_length() - 1 if m else 0 for m in range(4096)], dtype=np.int8)
+    popcount = np.array([bin(m).count('1') for m in range(4096)], dtype=np.int8)
+    return choice_root, choice_id, lowest_class, popcount
+
+@lru_cache(maxsize=None)
+def _degree_labels(tonic_note, mode):
+    import numpy as np
+    return np.array([get_scale_degree_name(root, tonic_note, mode) for root in range(12)], dtype=object)
+
+def _as_note_words(note_matrix):
+    import numpy as np
+    held = np.asarray(note_matrix, dtype=bool)
+    if held.shape[1] != 128:
+        padded = np.zeros((held.shape[0], 128), dtype=bool)
+        padded[:, :held.shape[1]] = held
+        held = padded
+    # 128 notes -> two little-endian 64-bit words per row
+    words = np.packbits(held, axis=1, bitorder='little').view('<u8')
+    return held, words[:, 0], words[:, 1]
+
+def _fold_words(lo, hi):
+    import numpy as np
+    masks = np.zeros(len(lo), dtype=np.uint64)
+    for start in range(0, 128, 12):
+        if start + 12 <= 64:
+            octave = lo >> np.uint64(start)
+        elif start >= 64:
+            octave = hi >> np.uint64(start - 64)
+        else:
+            octave = (lo >> np.uint64(start)) | (hi << np.uint64(64 - start))
+        masks |= octave & np.uint64(0xFFF)
+    return masks.astype(np.uint16)
+
+def pack_pitch_classes(note_matrix):
+    """(N x 128) boolean note matrix -> (N,) uint16 pitch-class masks."""
+    _, lo, hi = _as_note_words(note_matrix)
+    return _fold_words(lo, hi)
+
+def analyze_chords_batch(notes, tonic_note, mode, chunk_size=65536):
+    """
+    Vectorized get_chord_name. `notes` is either an (N x 128) boolean note matrix
+    or an (N,) array of packed uint16 pitch-class masks.
+
+    Returns (chord_ids, roots, degrees):
+      chord_ids  int16 index into CHORD_PATTERNS, -1 if unrecognized (or < 3 notes)
+      roots      int8 root pitch class, -1 if unrecognized
+      degrees    object array of degree labels, None if outside the mode
+
+    The bass is the lowest held note for a note matrix, the lowest pitch class for
+    masks. format_chord_name(root, chord_id, ..., bass) turns a row back into the
+    display string (pass the bass pitch class when it isn't the root for C/E).
+    """
+    import numpy as np
+    notes = np.asarray(notes)
+    choice_root, choice_id, lowest_class, popcount = _quality_arrays()
+    degree_labels = _degree_labels(tonic_note, mode)
+
+    n = notes.shape[0]
+    chord_ids = np.full(n, -1, dtype=np.int16)
+    roots = np.full(n, -1, dtype=np.int8)
+
+    for start in range(0, n, chunk_size):
+        block = notes[start:start + chunk_size]
+        if block.ndim == 2:
+            held, lo, hi = _as_note_words(block)
+            masks = _fold_words(lo, hi)
+            count = np.count_nonzero(held, axis=1)
+            bass = held.argmax(axis=1) % 12
+        else:
+            masks = block.astype(np.uint16) & 0xFFF
+            count = popcount[masks]
+            bass = lowest_class[masks]
+
+        root = choice_root[masks, bass]
+        hit = (root >= 0) & (count >= 3)
+        chord_ids[start:start + len(masks)] = np.where(hit, choice_id[masks, bass], -1)
+        roots[start:start + len(masks)] = np.where(hit, root, -1)
+
+    degrees = np.where(roots >= 0, degree_labels[roots], None)
+    return chord_ids, roots, degrees
 
 modal_cadences = {
     'dorian': [['i', 'IV'], ['IV', 'v'], ['v', 'i']],
@@ -252,235 +599,2658 @@ modal_cadences = {
     'locrian': [['i°', '♭II'], ['♭II', '♭VII'], ['♭VII', 'i°']]
 }
 
-def suggest_next_chords(current_chord, tonic, mode, style, prefer_flats):
-    tonic_index = root_names.index(tonic)
-    scale = [(tonic_index + i) % 12 for i in mode_intervals[mode]]
-    note_names = [note_name(n, prefer_flats) for n in scale]
-
-    qualities = mode_chords[mode]
-    degree_labels = degree_names[mode]
-    chords = []
-
-    for i, root in enumerate(note_names):
-        qual = qualities[i]
-   
-        if style == "jazz":
-            suffix = {
-                'maj': random.choice(['maj7', 'maj9']),
-                'min': random.choice(['m7', 'm9']),
-                'dim': random.choice(['m7b5', 'dim7']),
-                'aug': 'aug7'  # optional jazzy version if you like
-            }.get(qual, '')
-
-            # Optional spicy extensions
-            if qual == 'maj' and random.random() < 0.2:
-                suffix = random.choice(['maj7♯11', 'maj13'])
-            elif qual == 'min' and random.random() < 0.2:
-                suffix = 'm11'
-            elif qual == 'dim' and random.random() < 0.2:
-                suffix = 'dim9'
-            elif qual == 'aug' and random.random() < 0.2:
-                suffix = 'aug9'  # optional spice for augmented
-            if degree_labels[i] in ['V', '♭VII'] and random.random() < 0.5:
-                suffix = random.choice(['7♭9', '7♯9', '13', '7♯5♭9'])
-   
+# --- SUGGESTION ENGINE ---
+# Pitch class for any root spelling get_chord_name / note_name can produce
+pitch_classes = {name: i for i, name in enumerate(root_names)}
+pitch_classes.update({'Db': 1, 'Eb': 3, 'Gb': 6, 'Ab': 8, 'Bb': 10, 'Cb': 11, 'Fb': 4})
+
+plain_qualities = {
+    'maj': MAJOR,
+    'min': MINOR,
+    'dim': DIMINISHED,
+    'aug': AUGMENTED  # 💅 yes ma'am
+}
+
+# Jazz voicings per triad quality: the usual sevenths/ninths, then the spicy extensions
+jazz_voicings = {
+    'maj': [(MAJOR7, 0), (MAJOR7, NINTH)],
+    'min': [(MINOR7, 0), (MINOR7, NINTH)],
+    'dim': [(HALF_DIMINISHED7, 0), (DIMINISHED7, 0)],
+    'aug': [(AUGMENTED7, 0)],  # optional jazzy version if you like
+}
+jazz_spice = {
+    'maj': [(MAJOR7, SHARP_11), (MAJOR7, THIRTEENTH)],
+    'min': [(MINOR7, ELEVENTH)],
+    'dim': [(DIMINISHED7, NINTH)],
+    'aug': [(AUGMENTED7, NINTH)],  # optional spice for augmented
+}
+altered_dominants = [(DOMINANT7, FLAT_9), (DOMINANT7, SHARP_9), (DOMINANT7, THIRTEENTH), (DOMINANT7, SHARP_5 | FLAT_9)]
+jazz_resolutions = [(MINOR7, 0), (MINOR7, NINTH), (MINOR7, ELEVENTH)]
+
+# What makes a style; anything a style leaves out comes from style_defaults.
+#   fallback           degrees to offer when the cadence and rule tables have nothing
+#   voiced             draw each degree's chord from voicings/spice/altered, not the plain triad
+#   cadence_dominants  half the time, put a cadence target's secondary dominant ahead of it
+#   voicings, spice    per triad quality, the (quality, extensions) to draw from
+#   altered            altered dominants, drawn on the degrees labeled in altered_on
+#   resolutions        what a major/dominant chord that tonicizes a degree resolves to
+style_defaults = {
+    'fallback': (0, 1, 2, 3, 4, 5, 6),
+    'voiced': False,
+    'cadence_dominants': False,
+    'voicings': jazz_voicings,
+    'spice': jazz_spice,
+    'altered': altered_dominants,
+    'altered_on': ('V', '♭VII'),
+    'resolutions': [(MINOR, 0)],
+}
+style_rules = {
+    'pop':       {'fallback': (0, 5, 3, 4)},
+    'jazz':      {'fallback': (1, 4, 0, 2, 5), 'voiced': True, 'cadence_dominants': True,
+                  'resolutions': jazz_resolutions},
+    'classical': {'fallback': (0, 4, 0, 3, 1)},
+}
+
+def split_chord_name(chord):
+    """'Bbm7/F (ii)' -> ('Bb', 'm7'). Returns (None, None) if there's no root to read."""
+    symbol = chord.split()[0] if chord else ''
+    head, _, bass = symbol.rpartition('/')
+    if head and bass[:1] in root_names:
+        symbol = head  # slash chord: the bass note doesn't change the chord (6/9 stays)
+    root = symbol[:2] if symbol[1:2] in ('#', 'b') else symbol[:1]
+    if root not in pitch_classes:
+        return None, None
+    return root, symbol[len(root):]
+
+@lru_cache(maxsize=None)
+def _recognized_names(tonic_note, mode, prefer_flats):
+    """
+    Name -> Chord for every name get_chord_name gives in one key. Next to a degree label a
+    triad's name leaves out its quality ('D (ii)' is D, Dm or Ddim), so such a name goes to
+    the mode's own chord on that degree.
+    """
+    diatonic = [plain_qualities.get(quality) for quality in mode_chords.get(mode, ())]
+    recognized = {}
+    for chords, names in zip(chord_object_table(tonic_note, mode), chord_name_table(tonic_note, mode, prefer_flats)):
+        for chord, name in zip(chords or (), names or ()):
+            if chord is None:
+                continue
+            if name not in recognized or (0 <= chord.degree < len(diatonic) and not chord.extensions
+                                          and chord.quality == diatonic[chord.degree]):
+                recognized[name] = chord
+    return recognized
+
+def parse_chord(text, tonic_note, mode, prefer_flats=False):
+    """
+    Chord object for a get_chord_name string ('Gm7 (ii)', 'D major') or a plain
+    symbol ('Bbm7', 'F#7♭9'). None if it can't be read.
+    """
+    chord = _recognized_names(tonic_note, mode, prefer_flats).get(text)
+    if chord is not None:
+        return chord
+    root, suffix = split_chord_name(text)
+    table = suffix_chords()
+    quality = table.get(suffix, table.get(suffix.replace('b', '♭').replace('#', '♯'))) if root else None
+    if quality is None:
+        return None
+    return chord_in_key(pitch_classes[root], *quality, tonic_note, mode)
+
+class SuggestionEngine:
+    """
+    Everything suggest_next_chords needs for one (tonic, mode, style, prefer_flats),
+    worked out once. suggest() then only does the random draws.
+
+    Takes and returns Chord objects; format them with Chord.symbol(prefer_flats).
+    Pass rng=random.Random(seed) for repeatable output; by default the global
+    `random` module is used, same as before. With a trained ProgressionModel the
+    learned transitions replace the cadence/rule tables wherever they have data.
+    """
+
+    def __init__(self, tonic, mode, style, prefer_flats, rng=None, cache_size=256, model=None):
+        self.tonic_index = pitch_classes[tonic]
+        self.mode = mode
+        self.style = style
+        self.prefer_flats = prefer_flats
+        self.rng = rng or random
+        # Optional ProgressionModel; how many earlier chords suggest() can use as context
+        self.model = model
+        self.history_length = model.order if model is not None else 0
+
+        key = lambda root, quality, extensions=0: chord_in_key(root, quality, extensions, self.tonic_index, mode)
+
+        rules = {**style_defaults, **style_rules.get(style, {})}
+        self.voiced = rules['voiced']
+        self.cadence_dominants = rules['cadence_dominants']
+
+        self.scale = [(self.tonic_index + i) % 12 for i in mode_intervals[mode]]
+        self.qualities = mode_chords[mode]
+        self.degree_labels = degree_names[mode]
+        self.plain_chords = [key(root, plain_qualities[qual]) for root, qual in zip(self.scale, self.qualities)]
+        # A quality the style has no voicings for (say, from a rule pack) keeps its plain chord
+        self.jazz_voicings = [[key(root, *v) for v in rules['voicings'].get(qual, ())] or [plain]
+                              for root, qual, plain in zip(self.scale, self.qualities, self.plain_chords)]
+        self.jazz_spice = [[key(root, *v) for v in rules['spice'].get(qual, ())]
+                           for root, qual in zip(self.scale, self.qualities)]
+        self.altered = [[key(root, *v) for v in rules['altered']] if label in rules['altered_on'] else []
+                        for root, label in zip(self.scale, self.degree_labels)]
+
+        # degree -> candidate degrees, from modal_cadences and the progression rules
+        labels = self.degree_labels
+        progressions = get_progression_rules(mode)
+        self.cadence_graph = [
+            [labels.index(to_deg) for from_deg, to_deg in modal_cadences.get(mode, [])
+             if from_deg == label and to_deg in labels]
+            for label in labels
+        ]
+        self.rule_graph = [
+            [labels.index(d) for d in progressions.get(label, []) if d in labels]
+            for label in labels
+        ]
+        self.fallback_degrees = list(rules['fallback'])
+
+        # Secondary dominant spice: V7 of ii, V and vi
+        self.secondary_targets = [1, 4, 5]
+        self.dominants = [key(pc + 7, DOMINANT7) for pc in self.scale]
+
+        # 🎲 Wildcard chaos mode: ♭VII, ♭III, ♭VI
+        self.wildcards = [key(self.tonic_index + i, MAJOR) for i in (10, 3, 8)]
+
+        self.resolutions = [[key(pc, *v) for v in rules['resolutions']] for pc in range(12)]
+
+        self.analyze = lru_cache(maxsize=cache_size)(self._analyze)
+
+    def _analyze(self, current_chord):
+        """The deterministic part of a suggestion: which degrees to offer for this chord."""
+        root_pc = current_chord.root if current_chord is not None else None
+        degree = self.scale.index(root_pc) if root_pc in self.scale else None
+
+        cadences = self.cadence_graph[degree] if degree is not None else []
+        rules = self.rule_graph[degree] if degree is not None else []
+        fallback = [i for i in self.fallback_degrees if self.scale[i] != root_pc]
+
+        # 🌐 A major/dominant chord that tonicizes something other than the tonic
+        resolutions = []
+        if current_chord is not None and current_chord.quality in (MAJOR, DOMINANT7):
+            tonicized = (root_pc + 5) % 12
+            if tonicized != self.tonic_index:
+                resolutions = self.resolutions[tonicized]
+
+        return cadences, rules, fallback, resolutions
+
+    def _chord(self, i, drawn):
+        """Chord for scale degree i; voiced styles draw theirs once per suggest() call."""
+        if not self.voiced:
+            return self.plain_chords[i]
+        if i in drawn:
+            return drawn[i]
+
+        rng = self.rng
+        voicings = self.jazz_voicings[i]
+        chord = rng.choice(voicings) if len(voicings) > 1 else voicings[0]
+
+        # Optional spicy extensions
+        if rng.random() < 0.2 and self.jazz_spice[i]:
+            chord = rng.choice(self.jazz_spice[i])
+        if self.altered[i] and rng.random() < 0.5:
+            chord = rng.choice(self.altered[i])
+
+        drawn[i] = chord
+        return chord
+
+    def suggest(self, current_chord, history=()):
+        """
+        current_chord: a Chord (or None if unrecognized); history: the chords before
+        it, oldest first (only used with a model). Returns up to three Chords.
+        """
+        cadences, rules, fallback, resolutions = self.analyze(current_chord)
+        rng = self.rng
+        drawn = {}
+
+        ranked = None
+        if self.model is not None:
+            states = progression_states([*history, current_chord])
+            ranked = self.model.ranked(self.mode, states, exclude=chord_state(current_chord))
+
+        if ranked:
+            # 📈 Learned progressions, most likely first
+            suggestions = [self._chord(i, drawn) for i in ranked[:3]]
+        else:
+            # 💫 Favor modal cadences and add secondary dominants when spicy
+            cadence_suggestions = []
+            for target in cadences:
+                cadence_suggestions.append(self._chord(target, drawn))
+                if self.cadence_dominants and rng.random() < 0.5:
+                    cadence_suggestions.insert(0, self.dominants[target])
+
+            # 🧪 Prioritize cadences, add some rules if needed
+            suggestions = cadence_suggestions[:2] + [self._chord(i, drawn) for i in rules[:2]]
+        if not suggestions:
+            suggestions = [self._chord(i, drawn) for i in fallback]
+
+        # 🌶️ Add secondary dominant for spice
+        if rng.random() < 0.3:
+            suggestions.insert(0, self.dominants[rng.choice(self.secondary_targets)])
+
+        # 🎯 If it's a secondary dominant, resolve to its minor
+        if resolutions:
+            resolution = rng.choice(resolutions) if len(resolutions) > 1 else resolutions[0]
+            if resolution not in suggestions:
+                suggestions.insert(0, resolution)
+
+        # 🎲 Wildcard chaos mode
+        if rng.random() < 0.2:
+            suggestions.insert(0, rng.choice(self.wildcards))
+
+        return suggestions[:3] if suggestions else [self._chord(i, drawn) for i in range(3)]
+
+    def suggest_symbols(self, current_chord, history=()):
+        return [chord.symbol(self.prefer_flats) for chord in self.suggest(current_chord, history)]
+
+@lru_cache(maxsize=None)
+def get_suggestion_engine(tonic, mode, style, prefer_flats, model=None):
+    return SuggestionEngine(tonic, mode, style, prefer_flats, model=model)
+
+def suggest_next_chords(current_chord, tonic, mode, style, prefer_flats, model=None, history=(), notes=None):
+    """
+    current_chord is a get_chord_name string (or a symbol like 'Bbm7'); returns chord symbols.
+    With a ProgressionModel, candidates are ranked by how often they followed `history`
+    (earlier chord names, oldest first) plus the current chord in the training files.
+    Given the held MIDI `notes`, they're re-ranked by voice-leading cost (see VoicingTable).
+    """
+    engine = get_suggestion_engine(tonic, mode, style, prefer_flats, model)
+    parse = lambda name: parse_chord(name, engine.tonic_index, mode, prefer_flats)
+    chord = parse(current_chord)
+    suggestions = engine.suggest(chord, [parse(name) for name in history])
+    if notes:
+        suggestions = [c for c, _, _ in voicing_table.rank(chord, frozenset(notes), suggestions)]
+    return [c.symbol(prefer_flats) for c in suggestions]
+
+
+# --- RULE PACKS ---
+# Extra modes, chord qualities and styles from JSON files, so new scales or a blues style
+# don't need code changes. A pack looks like:
+#
+#   {"qualities": {"dom": "7"},
+#    "modes": {"blues": {"intervals": [0, 2, 4, 5, 7, 9, 10],
+#                        "chords": ["dom", "min", "dim", "dom", "dom", "min", "maj"],
+#                        "degrees": ["I7", "ii", "iii°", "IV7", "V7", "vi", "♭VII"],
+#                        "rules": {"I7": ["IV7", "V7"], "IV7": ["I7", "V7"], "V7": ["IV7", "I7"]},
+#                        "cadences": [["V7", "IV7"], ["IV7", "I7"]]}},
+#    "styles": {"blues": {"fallback": [0, 3, 4], "voiced": true, "voicings": {"dom": ["7", "9", "13"]},
+#                         "altered": ["7♯9"], "altered_on": ["V7"]}}}
+#
+# Modes need 7 degrees (the engine, lookahead and model files are built on that), chord
+# words are plain_qualities' or the pack's own, chords are symbol suffixes, and style keys
+# are style_defaults'. Packs can only add names, never redefine built-in or earlier ones.
+# Validating and compiling every pack on each launch adds up with dozens of them, so the
+# compiled tables are cached in one binary file keyed by a hash of the packs' contents.
+
+RULE_CACHE_MAGIC = b'CSRP'
+RULE_CACHE_VERSION = 1
+RULE_CACHE_HEADER = '<4sI32s'  # magic, version, SHA-256 of the packs; then the marshalled tables
+
+builtin_modes = tuple(mode_intervals)
+builtin_styles = tuple(style_rules)
+rule_pack_modes = []  # installed pack modes, in load order
+
+def _pack_error(path, where, message):
+    return ValueError(f"{path}: {where}: {message}")
+
+def _pack_name(path, where, name):
+    if not isinstance(name, str) or not name or not all(c.islower() or c.isdigit() or c == '_' for c in name):
+        raise _pack_error(path, where, f"name {name!r} should be lowercase letters, digits and _")
+    return name
+
+def _pack_list(path, where, value, length=None):
+    if not isinstance(value, list) or (length is not None and len(value) != length):
+        raise _pack_error(path, where, f"expected a list of {length}" if length else "expected a list")
+    return value
+
+def _pack_chord(path, where, suffix):
+    table = suffix_chords()
+    chord = table.get(suffix, table.get(suffix.replace('b', '♭').replace('#', '♯'))) \
+        if isinstance(suffix, str) else None
+    if chord is None:
+        raise _pack_error(path, where, f"unknown chord suffix {suffix!r}")
+    return chord
+
+def _compile_mode(path, where, spec, qualities):
+    if not isinstance(spec, dict) or set(spec) - {'intervals', 'chords', 'degrees', 'rules', 'cadences'}:
+        raise _pack_error(path, where, "expected intervals, chords, degrees and optional rules, cadences")
+    intervals = _pack_list(path, f"{where}.intervals", spec.get('intervals'), 7)
+    if intervals[0] != 0 or any(type(i) is not int for i in intervals) \
+            or any(not a < b < 12 for a, b in zip(intervals, intervals[1:])):
+        raise _pack_error(path, f"{where}.intervals", "expected 7 rising semitones from 0 to 11, starting at 0")
+    chords = _pack_list(path, f"{where}.chords", spec.get('chords'), 7)
+    for i, word in enumerate(chords):
+        if word not in qualities:
+            raise _pack_error(path, f"{where}.chords[{i}]", f"unknown chord quality {word!r}")
+    degrees = _pack_list(path, f"{where}.degrees", spec.get('degrees'), 7)
+    if not all(isinstance(d, str) and d for d in degrees) or len(set(degrees)) != 7:
+        raise _pack_error(path, f"{where}.degrees", "expected 7 different labels")
+
+    rules = spec.get('rules', {})
+    if not isinstance(rules, dict):
+        raise _pack_error(path, f"{where}.rules", "expected {degree: [degrees]}")
+    for label, targets in rules.items():
+        for target in [label] + _pack_list(path, f"{where}.rules.{label}", targets):
+            if target not in degrees:
+                raise _pack_error(path, f"{where}.rules.{label}", f"{target!r} isn't one of the degrees")
+    cadences = _pack_list(path, f"{where}.cadences", spec.get('cadences', []))
+    for i, pair in enumerate(cadences):
+        if not (isinstance(pair, list) and len(pair) == 2 and all(d in degrees for d in pair)):
+            raise _pack_error(path, f"{where}.cadences[{i}]", "expected a [from, to] pair of degrees")
+    return (tuple(intervals), tuple(chords), tuple(degrees),
+            {label: tuple(targets) for label, targets in rules.items()}, tuple(map(tuple, cadences)))
+
+def _compile_style(path, where, spec, qualities):
+    if not isinstance(spec, dict):
+        raise _pack_error(path, where, "expected an object")
+    style = {}
+    for field, value in spec.items():
+        at = f"{where}.{field}"
+        if field not in style_defaults:
+            raise _pack_error(path, at, f"unknown style field (known: {', '.join(style_defaults)})")
+        if field in ('voiced', 'cadence_dominants'):
+            if not isinstance(value, bool):
+                raise _pack_error(path, at, "expected true or false")
+        elif field == 'fallback':
+            if not _pack_list(path, at, value) or any(type(d) is not int or not 0 <= d < 7 for d in value):
+                raise _pack_error(path, at, "expected degree numbers 0-6")
+            value = tuple(value)
+        elif field in ('voicings', 'spice'):
+            if not isinstance(value, dict):
+                raise _pack_error(path, at, "expected {quality: [chord suffixes]}")
+            for word, suffixes in value.items():
+                if word not in qualities:
+                    raise _pack_error(path, at, f"unknown chord quality {word!r}")
+            value = {word: tuple(_pack_chord(path, f"{at}.{word}[{i}]", suffix)
+                                 for i, suffix in enumerate(_pack_list(path, f"{at}.{word}", suffixes)))
+                     for word, suffixes in value.items()}
+        elif field == 'altered_on':
+            if not all(isinstance(d, str) for d in _pack_list(path, at, value)):
+                raise _pack_error(path, at, "expected degree labels")
+            value = tuple(value)
+        else:
+            value = tuple(_pack_chord(path, f"{at}[{i}]", suffix)
+                          for i, suffix in enumerate(_pack_list(path, at, value)))
+        style[field] = value
+    return style
+
+def compile_rule_packs(packs):
+    """
+    [(path, JSON text)] -> the tables they add: {'qualities': ..., 'modes': ..., 'styles': ...}.
+    Raises ValueError naming the file and field of the first problem.
+    """
+    import json
+
+    compiled = {'qualities': {}, 'modes': {}, 'styles': {}}
+    for path, text in packs:
+        try:
+            pack = json.loads(text)
+        except ValueError as e:
+            raise ValueError(f"{path}: not JSON ({e})") from None
+        if not isinstance(pack, dict) or set(pack) - {'name', 'qualities', 'modes', 'styles'}:
+            raise _pack_error(path, "top level", "expected an object with name, qualities, modes, styles")
+
+        qualities = {**plain_qualities, **compiled['qualities']}
+        if not isinstance(pack.get('qualities', {}), dict):
+            raise _pack_error(path, "qualities", "expected {word: chord suffix}")
+        for word, suffix in pack.get('qualities', {}).items():
+            chord = _pack_chord(path, f"qualities.{word}", suffix)
+            if chord[1]:
+                raise _pack_error(path, f"qualities.{word}", f"{suffix!r} has extensions; use a plain quality")
+            if word in qualities and qualities[word] != chord[0]:
+                raise _pack_error(path, f"qualities.{word}", "already defined")
+            qualities[word] = compiled['qualities'][word] = chord[0]
+
+        for kind, known, compile_spec in (('modes', builtin_modes, _compile_mode),
+                                          ('styles', builtin_styles, _compile_style)):
+            specs = pack.get(kind, {})
+            if not isinstance(specs, dict):
+                raise _pack_error(path, kind, "expected {name: definition}")
+            for name, spec in specs.items():
+                where = f"{kind}.{_pack_name(path, kind, name)}"
+                if name in known or name in compiled[kind]:
+                    raise _pack_error(path, where, "already defined")
+                compiled[kind][name] = compile_spec(path, where, spec, qualities)
+    return compiled
+
+def rule_pack_files(paths):
+    """Pack files for each path: the file itself, or a directory's .json files in name order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.lower().endswith('.json')]
         else:
-            suffix_map = {
-                'maj': '',
-                'min': 'm',
-                'dim': 'dim',
-                'aug': 'aug'  # 💅 yes ma'am
-            }
-            suffix = suffix_map.get(qual, '')
-
-
-        chords.append(f"{root}{suffix}")
-
-    # Fallback degrees by style
-    if style == "pop":
-        degrees = [0, 5, 3, 4]
-    elif style == "jazz":
-        degrees = [1, 4, 0, 2, 5]
-    elif style == "classical":
-        degrees = [0, 4, 0, 3, 1]
+            files.append(path)
+    return files
+
+def default_rule_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'chord_suggester')
+
+def load_rule_packs(paths, cache_dir=None):
+    """
+    Compiled tables for the packs at `paths` (files or directories). Only the raw bytes
+    are read and hashed on a cache hit; the cache is rebuilt whenever any pack changes.
+    """
+    import hashlib
+    import marshal
+    import struct
+
+    packs = []
+    for path in rule_pack_files(paths):
+        with open(path, 'rb') as f:
+            packs.append((path, f.read()))
+    digest = hashlib.sha256(f"{RULE_CACHE_VERSION}:{marshal.version}:{len(packs)}".encode())
+    for _, data in packs:
+        digest.update(struct.pack('<Q', len(data)))
+        digest.update(data)
+    digest = digest.digest()
+
+    cache_dir = cache_dir or default_rule_cache_dir()
+    cache_path = os.path.join(cache_dir, f"rules-{digest.hex()[:32]}.bin")
+    header = struct.calcsize(RULE_CACHE_HEADER)
+    try:
+        with open(cache_path, 'rb') as f:
+            blob = f.read()
+        if struct.unpack_from(RULE_CACHE_HEADER, blob) == (RULE_CACHE_MAGIC, RULE_CACHE_VERSION, digest):
+            return marshal.loads(blob[header:])
+    except (OSError, struct.error, EOFError, ValueError, TypeError):
+        pass  # missing, torn or stale: compile again
+
+    compiled = compile_rule_packs([(path, data.decode('utf-8')) for path, data in packs])
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(struct.pack(RULE_CACHE_HEADER, RULE_CACHE_MAGIC, RULE_CACHE_VERSION, digest))
+            f.write(marshal.dumps(compiled))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"⚠️ Couldn't cache rule packs in {cache_dir}: {e}", file=sys.stderr)
+    return compiled
+
+def install_rule_packs(compiled):
+    """Add compiled pack tables to the built-in ones and drop anything cached from before."""
+    plain_qualities.update(compiled['qualities'])
+    for name, (intervals, chords, degrees, rules, cadences) in compiled['modes'].items():
+        mode_intervals[name] = list(intervals)
+        mode_chords[name] = list(chords)
+        degree_names[name] = list(degrees)
+        progression_rules[name] = {label: list(targets) for label, targets in rules.items()}
+        modal_cadences[name] = [list(pair) for pair in cadences]
+        if name not in rule_pack_modes:
+            rule_pack_modes.append(name)
+    style_rules.update(compiled['styles'])
+
+    for cached in (get_suggestion_engine, progression_search, generate_progressions, _key_profiles):
+        cached.cache_clear()
+
+def use_rule_packs(paths, cache_dir=None):
+    """load_rule_packs + install_rule_packs: what --rules does at startup."""
+    if paths:
+        install_rule_packs(load_rule_packs(paths, cache_dir))
+
+
+# --- LOOKAHEAD (beam search) ---
+# Whole progressions instead of one next chord. Every degree-to-degree step gets a score
+# (cadence/rule tables, the trained model if there is one, voice-leading distance) once
+# per engine. A backward pass then gives the best score still reachable from each degree
+# with r steps left, so the beam is ranked by score so far plus that bound and never
+# keeps a path that can't finish on a cadence.
+
+Progression = namedtuple('Progression', ['score', 'chords'])
+
+lookahead_weights = {
+    'cadence': 2.0,         # step is one of the mode's cadences
+    'rule': 1.0,            # step is in get_progression_rules
+    'model': 2.0,           # times P(step) from a trained ProgressionModel
+    'voice_leading': 0.25,  # per semitone of movement
+    'back_and_forth': 1.0,  # penalty for going straight back (I -> IV -> I)
+    'repeat': 0.5,          # penalty each time a step that's already in the progression comes again
+}
+
+def pc_distance(a, b):
+    d = (a - b) % 12
+    return min(d, 12 - d)
+
+@lru_cache(maxsize=None)
+def voice_leading_distance(a, b):
+    """
+    Fewest total semitones to move pitch-class set a onto b, each voice going to its own
+    target tone. When the sizes differ, leftover tones are reached by doubling a voice.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    best = None
+    for targets in permutations(b, len(a)):
+        cost = sum(pc_distance(x, y) for x, y in zip(a, targets))
+        cost += sum(min(pc_distance(x, y) for x in a) for y in b if y not in targets)
+        if best is None or cost < best:
+            best = cost
+    return best
+
+class ProgressionSearch:
+    """Beam search over the scale degrees of one SuggestionEngine's key, style and model."""
+
+    def __init__(self, engine):
+        weights = lookahead_weights
+        self.engine = engine
+        # One fixed chord per degree: triads, or in voiced styles (jazz) the first voicing,
+        # with the degrees that take altered dominants as plain dominant sevenths
+        self.chords = list(engine.plain_chords)
+        if engine.voiced:
+            for i, root in enumerate(engine.scale):
+                self.chords[i] = (chord_in_key(root, DOMINANT7, 0, engine.tonic_index, engine.mode)
+                                  if engine.altered[i] else engine.jazz_voicings[i][0])
+
+        # Progressions end with a cadence home: the mode's cadence into the tonic, or for
+        # modes without one listed (ionian) any rule that lands on the tonic
+        self.cadence_pairs = {(a, 0) for a in range(7) if 0 in engine.cadence_graph[a]}
+        if not self.cadence_pairs:
+            self.cadence_pairs = {(a, 0) for a in range(7) if 0 in engine.rule_graph[a]}
+
+        self.step = [[float('-inf')] * 7 for _ in range(7)]
+        for a in range(7):
+            probabilities = engine.model.probabilities(engine.mode, [a]) if engine.model is not None else None
+            for b in range(7):
+                if a == b:
+                    continue
+                if b in engine.cadence_graph[a]:
+                    score = weights['cadence']
+                elif b in engine.rule_graph[a]:
+                    score = weights['rule']
+                else:
+                    score = 0.0
+                if probabilities:
+                    score += weights['model'] * probabilities[b]
+                score -= weights['voice_leading'] * voice_leading_distance(
+                    self.chords[a].pitch_classes(), self.chords[b].pitch_classes())
+                self.step[a][b] = score
+
+        # bounds[r][d]: best score of the last r steps starting from degree d
+        self.bounds = [[0.0] * 7]
+
+    def bound(self, steps):
+        while len(self.bounds) <= steps:
+            if len(self.bounds) == 1:
+                row = [max((self.step[a][b] for b in range(7) if (a, b) in self.cadence_pairs),
+                           default=float('-inf')) for a in range(7)]
+            else:
+                after = self.bounds[-1]
+                row = [max(self.step[a][b] + after[b] for b in range(7)) for a in range(7)]
+            self.bounds.append(row)
+        return self.bounds[steps]
+
+    def search(self, length, beam_width=16, top_k=5, start=0):
+        """Top-K (score, degrees) of `length` chords from degree `start`, ending on a cadence."""
+        import heapq
+
+        back_and_forth = lookahead_weights['back_and_forth']
+        repeat = lookahead_weights['repeat']
+        # (score so far, degrees, bitmask of the a -> b steps taken)
+        beam = [(0.0, (start,), 0)]
+        for position in range(1, length):
+            remaining = length - position - 1
+            future = self.bound(remaining)
+            candidates = []
+            for score, degrees, used in beam:
+                a = degrees[-1]
+                row = self.step[a]
+                for b in range(7):
+                    step = row[b]
+                    if step + future[b] == float('-inf') or (not remaining and (a, b) not in self.cadence_pairs):
+                        continue
+                    if len(degrees) > 1 and degrees[-2] == b:
+                        step -= back_and_forth
+                    bit = 1 << (a * 7 + b)
+                    if used & bit:
+                        step -= repeat
+                    candidates.append((score + step + future[b], score + step, degrees + (b,), used | bit))
+            beam = [entry[1:] for entry in heapq.nlargest(beam_width, candidates)]
+        return [(score, degrees) for score, degrees, _ in heapq.nlargest(top_k, beam)]
+
+@lru_cache(maxsize=None)
+def progression_search(tonic, mode, style, prefer_flats, model=None):
+    return ProgressionSearch(get_suggestion_engine(tonic, mode, style, prefer_flats, model))
+
+@lru_cache(maxsize=1024)
+def generate_progressions(tonic, mode, style='pop', length=8, beam_width=16, top_k=5, start=None, model=None):
+    """
+    The top_k best progressions of `length` chords in a key, ending on one of the mode's
+    cadences. They start from `start` (a Chord in the key, e.g. from recognize_chord) or
+    the tonic. Returns Progression(score, chords) tuples, best first.
+    """
+    search = progression_search(tonic, mode, style, tonic in flat_keys, model)
+    in_key = start is not None and start.degree >= 0
+    results = []
+    for score, degrees in search.search(length, beam_width, top_k, start.degree if in_key else 0):
+        chords = tuple(search.chords[d] for d in degrees)
+        if in_key:
+            chords = (start,) + chords[1:]
+        results.append(Progression(round(score, 3), chords))
+    return tuple(results)
+
+def print_progressions(progressions, prefer_flats):
+    for rank, progression in enumerate(progressions, 1):
+        symbols = ' → '.join(chord.symbol(prefer_flats) for chord in progression.chords)
+        print(f"{rank:>2}. {symbols}   (score {progression.score})")
+
+# --- VOICE LEADING ---
+# Suggestions ranked by how little the hands have to move. Every chord gets a fixed set of
+# close-position voicings (each inversion, bass anywhere from E2 to B4). The held notes are
+# snapped to the nearest voicing of the current chord once per distinct hand shape, and the
+# cheapest move from that voicing to each target chord is worked out once and kept, so
+# ranking on a note event is a few dict lookups.
+
+VOICING_BASS_RANGE = range(40, 72)
+
+def voicing_distance(a, b):
+    """
+    Semitones moved going from voicing a to voicing b (sorted MIDI notes). Voices move in
+    order (the cheapest pairing on a line); the smaller voicing doubles notes to cover the larger.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    if len(a) == len(b):
+        return sum(abs(x - y) for x, y in zip(a, b))
+    return min(sum(abs(x - y) for x, y in zip(sorted(a + extra), b))
+               for extra in combinations_with_replacement(a, len(b) - len(a)))
+
+@lru_cache(maxsize=None)
+def voicing_intervals(quality, extensions=0):
+    """
+    The chord tones a voicing plays, as semitones above the root: every tone its dictionary
+    shape requires, plus as few optional tones as it takes to fill four voices and still be
+    named as this chord in root position (the fifth is the first to go). C7♯11 keeps its 9,
+    or it would read as C7♭5; C7♯5♭9 has five required tones and keeps all five.
+    """
+    shapes = {(q, e): tones for q, e, tones, _, _ in CHORD_PATTERNS}
+    if (quality, extensions) not in shapes:
+        intervals = chord_intervals(quality, extensions)
+        return tuple(i for i in intervals if i != 7) if len(intervals) > 4 and 7 in intervals else intervals
+    required, optional = parse_tones(shapes[quality, extensions])
+    optional = sorted(optional, key=lambda i: i == 7)
+    voices = min(4, len(required) + len(optional))
+    for count in range(len(optional) + 1):
+        for extra in combinations(optional, count):
+            intervals = required + extra
+            if len(intervals) < voices:
+                continue
+            pick = chord_choice_table()[pitch_class_mask(intervals)]
+            if pick and pick[0] and pick[0][0] == 0 and CHORD_PATTERNS[pick[0][1]][:2] == (quality, extensions):
+                return intervals
+    return required + tuple(optional)
+
+@lru_cache(maxsize=None)
+def chord_voicings(chord):
+    """Close-position voicings of a chord, usually four voices (see voicing_intervals)."""
+    tones = [(chord.root + i) % 12 for i in voicing_intervals(chord.quality, chord.extensions)]
+
+    voicings = []
+    for bass_tone in tones:
+        # Every other tone stacked inside the octave above the bass
+        shape = sorted((tone - bass_tone) % 12 for tone in tones)
+        for bass in VOICING_BASS_RANGE:
+            if bass % 12 == bass_tone:
+                voicings.append(tuple(bass + step for step in shape))
+    return tuple(sorted(voicings))
+
+def nearest_voicing(notes, chord):
+    """
+    (cost, voicing) of the chord's voicing closest to `notes`. Voicings are sorted by bass and
+    the basses always pair up, so we walk outwards from the held bass and stop once the bass
+    move alone costs more than the best so far.
+    """
+    voicings = chord_voicings(chord)
+    bass = notes[0]
+    above = bisect_left(voicings, (bass,))
+    below = above - 1
+    best = None
+    while below >= 0 or above < len(voicings):
+        if above < len(voicings) and (below < 0 or voicings[above][0] - bass <= bass - voicings[below][0]):
+            voicing = voicings[above]
+            above += 1
+        else:
+            voicing = voicings[below]
+            below -= 1
+        if best is not None and abs(voicing[0] - bass) > best[0]:
+            break
+        candidate = (voicing_distance(notes, voicing), voicing)
+        if best is None or candidate < best:
+            best = candidate
+    return best
+
+class VoicingTable:
+    """Anchor voicings for held notes, and cached cheapest moves between voicings."""
+
+    def __init__(self, cache_size=4096, moves_size=1 << 16):
+        # (anchor voicing, target root, quality, extensions) -> (cost, voicing). Keyed by the
+        # chord's notes rather than the Chord (which carries its degree), so every key a long
+        # session or a server passes through shares the same moves, and it's an LRU besides.
+        self.moves = lru_cache(maxsize=moves_size)(self._move)
+        self.anchor = lru_cache(maxsize=cache_size)(self._anchor)
+        self.nearest = lru_cache(maxsize=cache_size)(nearest_voicing)
+
+    def _anchor(self, chord, notes):
+        return nearest_voicing(tuple(sorted(notes)), chord)[1]
+
+    @staticmethod
+    def _move(voicing, root, quality, extensions):
+        return nearest_voicing(voicing, Chord.of(root, quality, extensions))
+
+    def move(self, voicing, chord):
+        return self.moves(voicing, chord.root, chord.quality, chord.extensions)
+
+    def warm(self, chords):
+        """Work out every move between the given chords' voicings up front."""
+        for chord in chords:
+            for voicing in chord_voicings(chord):
+                for target in chords:
+                    self.move(voicing, target)
+
+    def rank(self, current_chord, notes, suggestions):
+        """
+        Suggestions sorted by voice-leading cost from the held notes (ties keep their
+        order), as (chord, voicing, cost).
+        """
+        if current_chord is not None:
+            anchor = self.anchor(current_chord, notes)
+            moves = [self.move(anchor, chord) for chord in suggestions]
+        else:
+            held = tuple(sorted(notes))
+            moves = [self.nearest(held, chord) for chord in suggestions]
+        ranked = sorted(range(len(suggestions)), key=lambda i: moves[i][0])
+        return [(suggestions[i], moves[i][1], moves[i][0]) for i in ranked]
+
+voicing_table = VoicingTable()
+
+# ✅ Flat keys get flat spellings
+flat_keys = ['F', 'Bb', 'Eb', 'Ab', 'Db', 'Gb', 'Cb']
+
+# --- NOTE TRACKING (shared by live input and MIDI files) ---
+class ChordState:
+    """
+    Held notes plus a running 12-bit pitch-class mask with per-class reference
+    counts, so every note event is O(1) and we can tell cheaply whether the
+    chord could possibly have changed.
+    """
+
+    def __init__(self):
+        self.notes = set()
+        self.counts = [0] * 12
+        self.mask = 0
+
+    def apply(self, msg):
+        """Update from one MIDI message. Returns 'on', 'off' or None (not a note event)."""
+        if msg.type == 'note_on' and msg.velocity > 0:
+            if msg.note not in self.notes:
+                self.notes.add(msg.note)
+                pc = msg.note % 12
+                self.counts[pc] += 1
+                self.mask |= 1 << pc
+            return 'on'
+        elif msg.type == 'note_off' or (msg.type == 'note_on' and msg.velocity == 0):
+            if msg.note in self.notes:
+                self.notes.remove(msg.note)
+                pc = msg.note % 12
+                self.counts[pc] -= 1
+                if not self.counts[pc]:
+                    self.mask &= ~(1 << pc)
+            return 'off'
+        return None
+
+    def signature(self):
+        """
+        Everything get_chord_name's answer depends on: None below 3 notes, else the
+        pitch-class mask, plus the bass pitch class when the set is recognized (it picks
+        C6 vs Am7, and C vs C/E). Re-strikes, doublings above the bass, sustain and
+        aftertouch don't change it.
+        """
+        if len(self.notes) < 3:
+            return None
+        if chord_choice_table()[self.mask] is None:
+            return self.mask
+        return self.mask, min(self.notes) % 12
+
+# --- OFFLINE FILE ANALYSIS ---
+def track_chord_changes(track, tonic_note, mode):
+    """Yield (tick, sorted notes, Chord or None) for every chord change (inversions too) in one MIDI track."""
+    state = ChordState()
+    last_signature = None
+    last_shown = (NO_CHORD, None)
+    tick = 0
+    for msg in track:
+        tick += msg.time
+        if state.apply(msg) is None:
+            continue
+
+        signature = state.signature()
+        if signature is not None and signature != last_signature:
+            last_signature = signature
+            chord = recognize_chord(state.notes, tonic_note, mode)
+            shown = (chord, slash_bass(chord, state.notes))
+            if shown != last_shown:
+                yield tick, sorted(state.notes), chord
+                last_shown = shown
+
+def read_midi_file(path):
+    """mido.MidiFile, or the exception that made it unreadable."""
+    import mido
+
+    try:
+        return mido.MidiFile(path, clip=True)
+    except (OSError, EOFError, ValueError, KeyError, IndexError) as e:
+        return e
+
+def analyze_midi_file(path, tonic, mode, style, seed=0, model=None):
+    """
+    Stream every track of a .mid file through the live loop's note logic.
+    Returns a list of JSON-ready dicts: one per chord change, or one error record.
+    """
+    tonic_note = pitch_classes[tonic]
+    prefer_flats = tonic in flat_keys
+    engine = SuggestionEngine(tonic, mode, style, prefer_flats, rng=random.Random(seed), model=model)
+
+    midi_file = read_midi_file(path)
+    if isinstance(midi_file, Exception):
+        return [{"file": path, "error": f"{type(midi_file).__name__}: {midi_file}"}]
+
+    records = []
+    for track_index, track in enumerate(midi_file.tracks):
+        history = deque(maxlen=engine.history_length)
+        for tick, notes, chord in track_chord_changes(track, tonic_note, mode):
+            ranked = voicing_table.rank(chord, frozenset(notes), engine.suggest(chord, history))
+            records.append({
+                "file": path,
+                "track": track_index,
+                "tick": tick,
+                "notes": notes,
+                "chord": chord.describe(mode, prefer_flats, slash_bass(chord, notes)) if chord else
+                         "Unrecognized chord",
+                "suggestions": [c.symbol(prefer_flats) for c, _, _ in ranked],
+                "voicings": [list(voicing) for _, voicing, _ in ranked],
+            })
+            if not history or history[-1] is not chord:  # C -> C/E is still one chord
+                history.append(chord)
+    return records
+
+def _analyze_file_to_jsonl(job):
+    import json
+
+    path, tonic, mode, style, seed, model_path = job
+    model = load_progression_model(model_path) if model_path else None
+    records = analyze_midi_file(path, tonic, mode, style, seed, model)
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+
+def find_midi_files(directory):
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in sorted(filenames):
+            if filename.lower().endswith(('.mid', '.midi')):
+                yield os.path.join(dirpath, filename)
+
+def analyze_directory(directory, tonic='C', mode='ionian', style='pop', workers=None,
+                      seed=0, out=None, chunksize=8, model_path=None, rules=()):
+    """
+    Fan a directory of MIDI files out over a process pool, writing JSONL as results come in.
+    `rules` are the rule-pack paths the key/style come from (each worker installs them).
+    """
+    out = out or sys.stdout
+    jobs = ((path, tonic, mode, style, seed, model_path) for path in find_midi_files(directory))
+    files = 0
+
+    if workers == 1:
+        results = map(_analyze_file_to_jsonl, jobs)
+        for block in results:
+            out.write(block)
+            files += 1
+        return files
+
+    from multiprocessing import Pool
+    with Pool(workers, initializer=use_rule_packs, initargs=(list(rules),)) as pool:
+        for block in pool.imap_unordered(_analyze_file_to_jsonl, jobs, chunksize=chunksize):
+            out.write(block)
+            files += 1
+    return files
+
+# --- PROGRESSION MODEL ---
+# Degree-to-degree n-gram counts learned from MIDI files, one block per mode, stored as a
+# flat little-endian uint32 file that's mmapped on load: nothing is parsed, and pages are
+# only read in when a lookup touches them.
+#
+# A chord's state is its scale degree (0-6), or OUTSIDE if it's unrecognized or not in
+# the mode (tracks also start from OUTSIDE). For each context length 0..order there's a
+# block of 8**k rows, one row per context, one count per next degree, so a lookup is a
+# little arithmetic and a 7-int read.
+
+MODEL_MAGIC = b'CSPM'
+MODEL_VERSION = 1
+MODEL_HEADER = '<4sIIII'  # magic, version, order, modes, degrees
+OUTSIDE = 7
+model_modes = tuple(mode_intervals)
+
+def _model_layout(order):
+    """(first row of each context length, rows per mode)."""
+    level_offsets, rows = [], 0
+    for k in range(order + 1):
+        level_offsets.append(rows)
+        rows += 8 ** k
+    return level_offsets, rows
+
+def chord_state(chord):
+    return chord.degree if chord is not None and chord.degree >= 0 else OUTSIDE
+
+def progression_states(chords):
+    """Chords -> model states, with repeats of the same degree (G -> G7) collapsed."""
+    states = []
+    for chord in chords:
+        state = chord_state(chord)
+        if not states or states[-1] != state:
+            states.append(state)
+    return states
+
+class ProgressionModel:
+    """A trained model file, read through mmap. Use load_progression_model() to share one per path."""
+
+    def __init__(self, path):
+        import mmap
+        import struct
+
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = struct.calcsize(MODEL_HEADER)
+        magic, version, order, modes, degrees = (struct.unpack_from(MODEL_HEADER, self.map)
+                                                 if len(self.map) >= header else (None,) * 5)
+        if (magic, version, modes, degrees) != (MODEL_MAGIC, MODEL_VERSION, len(model_modes), 7) \
+                or len(self.map) != header + len(model_modes) * _model_layout(order)[1] * 7 * 4:
+            self.map.close()
+            raise ValueError(f"{path}: not a chord progression model (or from another version)")
+        self.level_offsets, self.rows_per_mode = _model_layout(order)
+
+        self.path = path
+        self.order = order
+        self.mode_offsets = {mode: i * self.rows_per_mode for i, mode in enumerate(model_modes)}
+        self.view = memoryview(self.map)[header:]
+        if sys.byteorder == 'little':
+            self.counts = self.view.cast('I')
+        else:
+            import array
+            self.counts = array.array('I', self.view)
+            self.counts.byteswap()
+
+    def close(self):
+        if isinstance(self.counts, memoryview):
+            self.counts.release()
+        self.view.release()
+        self.map.close()
+
+    def row(self, mode, states):
+        """
+        Counts of each next degree after `states` (oldest first). Backs off to shorter
+        contexts until one has been seen; None if the mode has no data at all.
+        """
+        states = states[len(states) - self.order:] if self.order else ()
+        base = self.mode_offsets.get(mode)
+        if base is None:
+            return None  # a rule-pack mode: model files only cover the built-in ones
+        contexts = [0]
+        for k, state in enumerate(reversed(states)):
+            contexts.append(contexts[-1] + state * 8 ** k)
+        for k in range(len(states), -1, -1):
+            start = (base + self.level_offsets[k] + contexts[k]) * 7
+            row = self.counts[start:start + 7]
+            if any(row):
+                return row
+        return None
+
+    def probabilities(self, mode, states):
+        """P(next degree) for degrees 0-6 after `states`."""
+        row = self.row(mode, states)
+        total = sum(row) if row is not None else 0
+        return [count / total for count in row] if total else [0.0] * 7
+
+    def ranked(self, mode, states, exclude=None):
+        """Next degrees seen after `states`, most likely first."""
+        row = self.row(mode, states)
+        if row is None:
+            return []
+        return sorted((d for d in range(7) if row[d] and d != exclude), key=lambda d: -row[d])
+
+@lru_cache(maxsize=None)
+def load_progression_model(path):
+    return ProgressionModel(path)
+
+def count_progressions(path, tonic, mode, order=2):
+    """
+    n-gram counts for one MIDI file, as {index into one mode's block of a model file: count}.
+    Only the n-grams the file has are kept, so a result stays small to send back from a
+    worker whatever the order. Returns (counts, None), or (None, error message) if the file
+    can't be read.
+    """
+    midi_file = read_midi_file(path)
+    if isinstance(midi_file, Exception):
+        return None, f"{type(midi_file).__name__}: {midi_file}"
+
+    tonic_note = pitch_classes[tonic]
+    level_offsets, _ = _model_layout(order)
+    counts = Counter()
+    for track in midi_file.tracks:
+        context = [OUTSIDE] * order
+        previous = OUTSIDE
+        for _, _, chord in track_chord_changes(track, tonic_note, mode):
+            state = chord_state(chord)
+            if state == previous:
+                continue
+            previous = state
+            if state != OUTSIDE:
+                index = 0
+                for k in range(order + 1):
+                    if k:
+                        index += context[-k] * 8 ** (k - 1)
+                    counts[(level_offsets[k] + index) * 7 + state] += 1
+            if order:
+                context.append(state)
+                del context[0]
+    return counts, None
+
+def _count_file(job):
+    path, tonic, mode, order = job
+    return path, count_progressions(path, tonic, mode, order)
+
+def write_progression_model(path, order, counts):
+    """Write a flat counts array (all modes) as a model file. Replaces the old file atomically."""
+    import array
+    import struct
+
+    counts = array.array('I', counts)
+    if sys.byteorder != 'little':
+        counts.byteswap()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(struct.pack(MODEL_HEADER, MODEL_MAGIC, MODEL_VERSION, order, len(model_modes), 7))
+        f.write(counts.tobytes())
+    os.replace(tmp_path, path)
+
+def train_progression_model(directory, model_path, tonic='C', mode='ionian', order=2,
+                            workers=None, chunksize=8):
+    """
+    Count the progressions in every MIDI file under `directory` (all taken to be in
+    tonic/mode) and add them to the model at model_path, creating it if needed.
+    Files are streamed one at a time, so only the counts are ever held in memory.
+    Returns the number of files counted.
+    """
+    import array
+
+    if mode not in model_modes:
+        raise ValueError(f"models only cover the built-in modes, not {mode!r}")
+    level_offsets, rows = _model_layout(order)
+    block = rows * 7
+    if os.path.exists(model_path):
+        model = ProgressionModel(model_path)
+        if model.order != order:
+            model.close()
+            raise ValueError(f"{model_path} is an order-{model.order} model, not order {order}")
+        totals = array.array('I', model.counts)
+        model.close()
     else:
-        degrees = list(range(7))
+        totals = array.array('I', bytes(4 * block * len(model_modes)))
+    offset = model_modes.index(mode) * block
+
+    jobs = ((path, tonic, mode, order) for path in find_midi_files(directory))
+    files = 0
+
+    def merge(results):
+        nonlocal files
+        for path, (counts, error) in results:
+            if error:
+                print(f"⚠️ Skipped {path}: {error}", file=sys.stderr)
+                continue
+            for i, count in counts.items():
+                totals[offset + i] += count
+            files += 1
+
+    if workers == 1:
+        merge(map(_count_file, jobs))
+    else:
+        from multiprocessing import Pool
+        with Pool(workers) as pool:
+            merge(pool.imap_unordered(_count_file, jobs, chunksize=chunksize))
+
+    write_progression_model(model_path, order, totals)
+    load_progression_model.cache_clear()
+    return files
+
+# --- RENDERING (MIDI files) ---
+# Progressions out as played MIDI files: one bar per chord, a rhythm pattern per bar,
+# voice-led voicings from the VOICE LEADING tables and a bass line on channel 2. Files
+# are written as events come, with one bar buffered at a time, and batches fan out over
+# a process pool like --analyze, so thousands of variations for a dataset stay cheap.
+
+RENDER_TICKS_PER_BEAT = 480
+RENDER_START_VOICING = (55, 60, 64, 67)  # the first chord takes its voicing nearest this
+
+# One 4/4 bar each: (onset beat, length in beats, voice or None for the whole chord,
+# velocity scale). Voice i is the i-th lowest note of the voicing, wrapping around.
+rhythm_patterns = {
+    'block':      [(0, 4, None, 1.0)],
+    'halves':     [(0, 2, None, 1.0), (2, 2, None, 0.85)],
+    'pulse':      [(beat, 1, None, 1.0 if beat % 2 == 0 else 0.8) for beat in range(4)],
+    'charleston': [(0, 1.5, None, 1.0), (1.5, 2.5, None, 0.9)],
+    'arpeggio':   [(i / 2, 0.5, i, 0.85) for i in range(8)],
+    'alberti':    [(i / 2, 0.5, (0, 2, 1, 2)[i % 4], 0.9 if i % 2 == 0 else 0.8) for i in range(8)],
+}
 
-    # Clean chord root for matching
-    cleaned_chord = current_chord.split()[0].replace('maj7', '').replace('maj9', '').replace('m7b5', '').replace('m7', '').replace('m9', '').replace('7', '').replace('dim7', '').replace('dim9', '').replace('m11', '')
-    current_root = cleaned_chord
+# How each style is played: rhythm, voicing ('close'; 'rootless' leaves the root to the bass
+# when there are four voices; 'spread' drops the second voice from the top an octave),
+# General MIDI programs for the chords and the bass, and velocity. Styles that aren't
+# listed (rule packs) use render_defaults.
+render_defaults = {'rhythm': 'block', 'voicing': 'close', 'program': 0, 'bass_program': 32, 'velocity': 76}
+render_styles = {
+    'pop':       {'rhythm': 'pulse', 'bass_program': 33, 'velocity': 80},
+    'jazz':      {'rhythm': 'charleston', 'voicing': 'rootless', 'program': 4, 'velocity': 72},
+    'classical': {'rhythm': 'alberti', 'voicing': 'spread', 'program': 48, 'bass_program': 42, 'velocity': 70},
+}
 
-    enharmonic_map = {
-        'Bb': 'A#', 'Eb': 'D#', 'Ab': 'G#', 'Db': 'C#',
-        'Gb': 'F#', 'Cb': 'B', 'Fb': 'E'
-    }
-    if current_root in enharmonic_map:
-        current_root = enharmonic_map[current_root]
-
-    progression_rules = get_progression_rules(mode)
-    cadences = modal_cadences.get(mode, [])
-    degree = None
-    if current_root in note_names:
-        degree_index = note_names.index(current_root)
-        degree = degree_labels[degree_index]
-
-    # 💫 Favor modal cadences and add secondary dominants when spicy
-    cadence_suggestions = []
-    if degree:
-        for cadence in cadences:
-            from_deg, to_deg = cadence
-            if from_deg == degree and to_deg in degree_labels:
-                target_idx = degree_labels.index(to_deg)
-                cadence_suggestions.append(chords[target_idx])
-
-                # 🔥 Optional secondary dominant
-                if style == "jazz" and random.random() < 0.5:
-                    # Find the root note of the *target* chord
-                    target_root = note_names[target_idx]
-                    if target_root in root_names:
-                        v7_index = (root_names.index(target_root) + 7) % 12
-                        v7_root = note_name(v7_index, prefer_flats)
-                        sec_dom_chord = f"{v7_root}7"
-                        cadence_suggestions.insert(0, sec_dom_chord)
-
-
-    # 🌈 Blend cadences and progression rules
-    rule_suggestions = []
-    if degree and degree in progression_rules:
-        rule_degrees = progression_rules[degree]
-        rule_suggestions = [chords[degree_labels.index(d)] for d in rule_degrees if d in degree_labels]
-
-    # 🧪 Prioritize cadences, add some rules if needed
-    suggestions = cadence_suggestions[:2] + rule_suggestions[:2]
-    if not suggestions:
-        suggestions = [chords[i] for i in degrees if current_root not in chords[i]]
-
-    # 🌶️ Add secondary dominant for spice
-    if random.random() < 0.3:
-        sec_dom_map = {1: 4, 4: 0, 5: 2}
-        possible_targets = [i for i in sec_dom_map if i < len(chords)]
-        if possible_targets:
-            target_degree = random.choice(possible_targets)
-            target_root = note_names[target_degree]
-            if target_root in root_names:
-                sec_dom_root_index = (root_names.index(target_root) + 7) % 12
-                sec_dom_root = note_name(sec_dom_root_index, prefer_flats)
-                sec_dom_chord = f"{sec_dom_root}7"
-                suggestions.insert(0, sec_dom_chord)
-
-    # 🌐 Detect if current chord is a secondary dominant
-    secondary_dominants = {
-        "D": "G", "A": "D", "E": "A", "B": "E", "F#": "B", "C#": "F#", "G#": "C#",
-        "Db": "Gb", "Ab": "Db", "Eb": "Ab", "Bb": "Eb", "F": "Bb", "C": "F", "G": "C"
-    }
+def _varlen(value):
+    """MIDI variable-length quantity: 7 bits per byte, high bit set on all but the last."""
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append(0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(reversed(out))
+
+class MidiFileWriter:
+    """
+    A format-0 Standard MIDI File written event by event. The track length goes out as a
+    placeholder and is patched in by close(), so nothing but the open file is held.
+    Events are given at absolute ticks and have to come in time order.
+    """
+
+    def __init__(self, path, ticks_per_beat=RENDER_TICKS_PER_BEAT):
+        import struct
+
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(b'MThd' + struct.pack('>IHHH', 6, 0, 1, ticks_per_beat))
+        self.file.write(b'MTrk\0\0\0\0')
+        self.tick = 0
+        self.events = 0
+
+    def write(self, tick, data):
+        """One event's bytes (status first) at an absolute tick."""
+        if tick < self.tick:
+            raise ValueError(f"{self.path}: event at tick {tick} written after tick {self.tick}")
+        self.file.write(_varlen(tick - self.tick) + bytes(data))
+        self.tick = tick
+        self.events += 1
+
+    def message(self, tick, msg):
+        """A mido message or meta message."""
+        self.write(tick, msg.bytes())
+
+    def close(self):
+        import struct
+
+        if self.file.closed:
+            return
+        self.write(self.tick, b'\xff\x2f\x00')  # end of track
+        track_length = self.file.tell() - 22
+        self.file.seek(18)
+        self.file.write(struct.pack('>I', track_length))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def styled_voicing(voicing, chord, voicing_style):
+    """Apply a render style's voicing to a close voicing from the voice-leading tables."""
+    if voicing_style == 'rootless' and len(voicing) >= 4:
+        return tuple(n for n in voicing if n % 12 != chord.root) or voicing
+    if voicing_style == 'spread' and len(voicing) >= 3:
+        return tuple(sorted(voicing[:-2] + (voicing[-2] - 12, voicing[-1])))
+    return voicing
+
+def render_progression(path, chords, tempo=100, style='pop', rhythm=None, prefer_flats=False):
+    """Write Chords as a MIDI file, one bar each. Returns the number of events written."""
+    import mido
+
+    sound = {**render_defaults, **render_styles.get(style, {})}
+    pattern = rhythm_patterns[rhythm or sound['rhythm']]
+    bar = 4 * RENDER_TICKS_PER_BEAT
+    name = ' '.join(c.symbol(prefer_flats) for c in chords).replace('♭', 'b').replace('♯', '#')
+
+    with MidiFileWriter(path) as out:
+        out.message(0, mido.MetaMessage('track_name', name=name))
+        out.message(0, mido.MetaMessage('time_signature', numerator=4, denominator=4))
+        out.message(0, mido.MetaMessage('set_tempo', tempo=mido.bpm2tempo(tempo)))
+        out.write(0, (0xC0, sound['program']))
+        out.write(0, (0xC1, sound['bass_program']))
+
+        voicing = RENDER_START_VOICING
+        for i, chord in enumerate(chords):
+            voicing = voicing_table.move(voicing, chord)[1]
+            notes = styled_voicing(voicing, chord, sound['voicing'])
+            start = i * bar
+            # (tick, note-off first, status, note, velocity) for this bar only
+            events = [(start, 1, 0x91, 36 + chord.root % 12, sound['velocity']),
+                      (start + bar, 0, 0x81, 36 + chord.root % 12, 0)]
+            for onset, length, voice, accent in pattern:
+                on = start + round(onset * RENDER_TICKS_PER_BEAT)
+                off = on + round(length * RENDER_TICKS_PER_BEAT)
+                velocity = min(127, round(sound['velocity'] * accent))
+                for note in notes if voice is None else (notes[voice % len(notes)],):
+                    events += [(on, 1, 0x90, note, velocity), (off, 0, 0x80, note, 0)]
+            for tick, _, status, note, velocity in sorted(events):
+                out.write(tick, (status, note, velocity))
+        return out.events
+
+def suggestion_walk(engine, length):
+    """A progression that follows the engine's own suggestions from the tonic chord (draws from engine.rng)."""
+    chords = [engine.plain_chords[0]]
+    while len(chords) < length:
+        history = chords[max(0, len(chords) - 1 - engine.history_length):-1]
+        chords.append(engine.rng.choice(engine.suggest(chords[-1], history)))
+    return chords
+
+def _render_file(job):
+    path, tonic, mode, style, length, seed, chords, tempo, rhythm, model_path = job
+    prefer_flats = tonic in flat_keys
+    model = load_progression_model(model_path) if model_path else None
+    engine = SuggestionEngine(tonic, mode, style, prefer_flats, rng=random.Random(seed), model=model)
+    if chords is None:
+        chords = suggestion_walk(engine, length)
+    else:
+        chords = [chord_in_key(root, quality, extensions, engine.tonic_index, mode)
+                  for root, quality, extensions in chords]
+    return path, render_progression(path, chords, tempo, style, rhythm, prefer_flats)
+
+def render_progressions(directory, tonic='C', mode='ionian', style='pop', length=8, top_k=5, beam_width=16,
+                        variations=0, tempo=100, rhythms=(), seed=0, workers=None, chunksize=16,
+                        model_path=None, rules=()):
+    """
+    Render the top_k generated progressions, then `variations` seeded walks through the
+    suggestions (seed, seed + 1, ...), as MIDI files in `directory`. Rhythms, if given,
+    are taken in turn per file. Returns (files, events) written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rhythms = list(rhythms) or [None]
+    model = load_progression_model(model_path) if model_path else None
+    top = generate_progressions(tonic, mode, style, length, beam_width, top_k, model=model)
+    stem = os.path.join(directory, f"{tonic}_{mode}_{style}")
+
+    def jobs():
+        for i, progression in enumerate(top):
+            chords = tuple((c.root, c.quality, c.extensions) for c in progression.chords)
+            yield (f"{stem}_top{i + 1:02}.mid", tonic, mode, style, length, seed, chords, tempo,
+                   rhythms[i % len(rhythms)], model_path)
+        for i in range(variations):
+            yield (f"{stem}_{seed + i:05}.mid", tonic, mode, style, length, seed + i, None, tempo,
+                   rhythms[(len(top) + i) % len(rhythms)], model_path)
+
+    files = events = 0
+    if workers == 1:
+        results = map(_render_file, jobs())
+        for _, count in results:
+            files, events = files + 1, events + count
+        return files, events
+
+    from multiprocessing import Pool
+    with Pool(workers, initializer=use_rule_packs, initargs=(list(rules),)) as pool:
+        for _, count in pool.imap_unordered(_render_file, jobs(), chunksize=chunksize):
+            files, events = files + 1, events + count
+    return files, events
+
+# --- LATENCY INSTRUMENTATION ---
+class LatencyHistogram:
+    """
+    HDR-style log-linear histogram of nanosecond latencies: exact below 32 ns, then
+    16 buckets per power of two (~6% resolution). Recording is one index computation
+    and one list increment, so it's cheap enough for the MIDI callback.
+    """
+    SUB_BITS = 5
+    HALF = 1 << (SUB_BITS - 1)
+
+    def __init__(self):
+        self.counts = [0] * 1024
+        self.total = 0
+        self.max = 0
+
+    def record(self, ns):
+        shift = ns.bit_length() - self.SUB_BITS
+        self.counts[ns if shift <= 0 else shift * self.HALF + (ns >> shift)] += 1
+        self.total += 1
+        if ns > self.max:
+            self.max = ns
+
+    def add(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def bucket_value(self, index):
+        """Midpoint of a bucket, in ns."""
+        if index < (1 << self.SUB_BITS):
+            return index
+        shift = index // self.HALF - 1
+        sub = index - shift * self.HALF
+        return (sub << shift) + ((1 << shift) >> 1)
+
+    def percentile(self, q):
+        if not self.total:
+            return 0
+        rank = max(1, int(q / 100 * self.total + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.bucket_value(index), self.max)
+        return self.max
+
+class StageTimings:
+    """
+    Latency from message receipt to the end of each live stage. Each stage is
+    written from one thread only (callback, event loop, or terminal), so no locks.
+    Where several callback threads time the same stage (one per input port), each
+    records into its own branch() and the report adds them up.
+    """
+    STAGES = ('notes', 'thru', 'chord', 'suggest', 'output')
+
+    def __init__(self):
+        self.histograms = {stage: LatencyHistogram() for stage in self.STAGES}
+        self.branches = []
+
+    def record(self, stage, received_at):
+        self.histograms[stage].record(int((time.perf_counter() - received_at) * 1e9))
+
+    def branch(self):
+        """StageTimings for one more writer thread, included in this one's report."""
+        timings = StageTimings()
+        self.branches.append(timings)
+        return timings
+
+    def combined(self, stage):
+        h = LatencyHistogram()
+        for timings in [self] + self.branches:
+            h.add(timings.histograms[stage])
+        return h
+
+    def report(self):
+        lines = ["⏱️  Latency since message receipt (p50 / p99 / max):"]
+        for stage in self.STAGES:
+            h = self.combined(stage)
+            lines.append(f"  {stage:<8} {h.percentile(50) / 1e3:>9.1f} / {h.percentile(99) / 1e3:>9.1f} / "
+                         f"{h.max / 1e3:>9.1f} µs   (n={h.total})")
+        return "\n".join(lines)
+
+    def dump(self, file=None):
+        print(self.report(), file=file or sys.stderr, flush=True)
+
+def stage_timings(instrument):
+    """StageTimings (dumped on SIGUSR1 too, where there is one) if instrument, else None."""
+    if not instrument:
+        return None
+    timings = StageTimings()
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: timings.dump())
+    return timings
+
+# --- KEY DETECTION ---
+# Guess the key from what's being played instead of asking. Note-ons go into a 12-bin
+# pitch-class histogram that fades with a half-life; each update correlates it with every
+# mode in mode_intervals on every tonic (one 108 x 12 matrix product, NumPy) and the key
+# only switches once a new one has clearly led for a few updates in a row.
+
+def key_name(tonic_note):
+    """Spell a detected tonic the way a user would type it (flats for the flat keys)."""
+    flat = note_name(tonic_note, True)
+    return flat if flat in flat_keys else note_name(tonic_note)
+
+@lru_cache(maxsize=None)
+def _key_profiles():
+    """(12 * modes, 12) rows: each mode's profile on each tonic, centered and unit length."""
+    import numpy as np
+
+    modes = list(mode_intervals)
+    profiles = np.zeros((12, len(modes), 12))
+    for m, mode in enumerate(modes):
+        intervals = mode_intervals[mode]
+        template = np.zeros(12)
+        template[intervals] = 1.0
+        template[0] += 1.0             # tonic
+        template[intervals[2]] += 0.5  # third
+        template[intervals[4]] += 0.5  # fifth
+        for tonic_note in range(12):
+            profiles[tonic_note, m] = np.roll(template, tonic_note)
+    profiles = profiles.reshape(-1, 12)
+    profiles -= profiles.mean(axis=1, keepdims=True)
+    profiles /= np.linalg.norm(profiles, axis=1, keepdims=True)
+    return modes, profiles
+
+class KeyDetector:
+    """
+    Streaming (tonic_note, mode) estimate. update() returns the new key when it switches,
+    else None. margin is how much better (in correlation) a new key has to score, hold how
+    many updates in a row it has to stay best, min_weight how much (decayed) input is needed
+    before switching at all.
+    """
+
+    def __init__(self, tonic_note=0, mode='ionian', half_life=4.0, margin=0.02, hold=4, min_weight=6.0):
+        import numpy as np
+
+        self.modes, self.profiles = _key_profiles()
+        self.histogram = np.zeros(12)
+        self.decay = math.log(2) / half_life
+        self.margin = margin
+        self.hold = hold
+        self.min_weight = min_weight
+        self.current = tonic_note * len(self.modes) + self.modes.index(mode)
+        self.candidate = None
+        self.streak = 0
+        self.last_time = None
+
+    @property
+    def key(self):
+        tonic_note, mode = divmod(self.current, len(self.modes))
+        return tonic_note, self.modes[mode]
+
+    def scores(self):
+        """Correlation of the histogram with every key, shaped (12 tonics, modes)."""
+        histogram = self.histogram - self.histogram.mean()
+        norm = math.sqrt(histogram @ histogram) or 1.0
+        return (self.profiles @ histogram / norm).reshape(12, -1)
+
+    def update(self, note, now, weight=1.0):
+        if self.last_time is not None and now > self.last_time:
+            self.histogram *= math.exp(-self.decay * (now - self.last_time))
+        self.last_time = now
+        self.histogram[note % 12] += weight
+        if self.histogram.sum() < self.min_weight:
+            return None
+
+        scores = self.scores().ravel()
+        best = int(scores.argmax())
+        if best == self.current or scores[best] - scores[self.current] < self.margin:
+            self.candidate, self.streak = None, 0
+            return None
+        if best != self.candidate:
+            self.candidate, self.streak = best, 0
+        self.streak += 1
+        if self.streak < self.hold:
+            return None
+        self.current, self.candidate, self.streak = best, None, 0
+        return self.key
+
+# --- LIVE PIPELINE (asyncio) ---
+# MIDI thru happens right in the input callback, so nothing downstream can delay it.
+# Analysis and rendering are separate asyncio consumers that only ever look at the
+# newest state: if notes arrive faster than we can name them, stale states are skipped.
+
+class ChordUpdate(namedtuple('ChordUpdate', ['chord', 'suggestions', 'notes', 'received_at', 'mode', 'prefer_flats',
+                                              'voicings', 'key_changed'], defaults=((), None))):
+    """
+    A chord change: Chord objects (chord is None if unrecognized), formatted only when
+    shown. voicings[i] is the MIDI notes for suggestions[i] closest to what's held;
+    key_changed names the new key if auto key detection just switched to it.
+    """
+    __slots__ = ()
+
+    @property
+    def name(self):
+        if not self.chord:
+            return "Unrecognized chord"
+        return self.chord.describe(self.mode, self.prefer_flats, slash_bass(self.chord, self.notes))
+
+    @property
+    def suggestion_names(self):
+        return [chord.symbol(self.prefer_flats) for chord in self.suggestions]
+
+def format_voicings(update):
+    return ', '.join(f"{name} {list(notes)}" for name, notes in zip(update.suggestion_names, update.voicings))
+
+def print_chord_update(update):
+    if update.key_changed:
+        print(f"\n🧭 Key: {update.key_changed}")
+    print(f"\n🎶 Chord: {update.name}")
+    print(f"👉 Suggested next chords: {', '.join(update.suggestion_names)}")
+    print(f"🎹 Closest voicings: {format_voicings(update)}\n")
+
+class ChordStream:
+    """Chord state, key and suggestions for one stream of notes (the whole input, or one port/channel)."""
+
+    def __init__(self, tonic, mode, style, prefer_flats=None, label='', model=None, auto_key=False):
+        self.label = label
+        self.style = style
+        self.model = model
+        self.state = ChordState()
+        self.last_signature = None
+        self.analyses = 0
+        self.set_key(tonic, mode, prefer_flats)
+
+        # 🧭 Follow the key from the notes; switches are handed over to name() via pending_key
+        self.key_detector = KeyDetector(self.tonic_note, mode) if auto_key else None
+        self.pending_key = None
+        self.key_changed = None
+
+    def set_key(self, tonic, mode, prefer_flats=None):
+        if prefer_flats is None:
+            prefer_flats = tonic in flat_keys
+        self.tonic = tonic
+        self.tonic_note = pitch_classes[tonic]
+        self.mode = mode
+        self.prefer_flats = prefer_flats
+        self.engine = get_suggestion_engine(tonic, mode, self.style, prefer_flats, self.model)
+        self.last_chord = NO_CHORD
+        self.last_bass = None
+        self.history = deque(maxlen=self.engine.history_length)
+
+    def track_key(self, msg, now):
+        """
+        Feed a note-on to the key detector (if auto_key). Returns a snapshot of the held
+        notes when the key just switched, so the caller can have the chord re-named.
+        """
+        if self.key_detector is None or msg.type != 'note_on' or not msg.velocity:
+            return None
+        # The bass says more about the key than the inner voices
+        weight = 2.0 if msg.note == min(self.state.notes, default=msg.note) else 1.0
+        key = self.key_detector.update(msg.note, now, weight)
+        if key is None:
+            return None
+        self.pending_key = key
+        return frozenset(self.state.notes)
+
+    def feed(self, msg):
+        """
+        Apply one message. Returns (change, notes): change is 'on'/'off'/None as in
+        ChordState.apply, notes is a snapshot to name if the chord may have changed.
+        """
+        change = self.state.apply(msg)
+        if change is None:
+            return None, None
+        signature = self.state.signature()
+        if signature is None or signature == self.last_signature:
+            return change, None
+        self.last_signature = signature
+        return change, frozenset(self.state.notes)
+
+    def name(self, notes, received_at, timings=None):
+        """Name a snapshot from feed(). Returns a ChordUpdate if the chord changed, else None."""
+        self.analyses += 1
+        if self.pending_key is not None:
+            (tonic_note, mode), self.pending_key = self.pending_key, None
+            self.set_key(key_name(tonic_note), mode)
+            self.key_changed = f"{self.tonic} {mode.replace('_', ' ').capitalize()}"
+        chord = recognize_chord(notes, self.tonic_note, self.mode) if len(notes) >= 3 else NO_CHORD
+        if timings is not None:
+            timings.record('chord', received_at)
+        if chord is NO_CHORD:
+            return None
+        # An inversion (C -> C/E) is shown, but it's the same chord as far as the history goes
+        bass = slash_bass(chord, notes)
+        if chord is self.last_chord and bass == self.last_bass:
+            return None
+        moved = chord is not self.last_chord
+        self.last_chord, self.last_bass = chord, bass
+        ranked = voicing_table.rank(chord, notes, self.engine.suggest(chord, self.history))
+        if moved:
+            self.history.append(chord)
+        if timings is not None:
+            timings.record('suggest', received_at)
+        key_changed, self.key_changed = self.key_changed, None
+        return ChordUpdate(chord, [c for c, _, _ in ranked], notes, received_at, self.mode, self.prefer_flats,
+                           [voicing for _, voicing, _ in ranked], key_changed)
+
+# A state that keeps changing (a trill, a fast arpeggio) is named anyway once it has been
+# settling for this many debounce windows
+DEBOUNCE_LIMIT = 4
+
+class LivePipeline:
+    def __init__(self, midi_out, tonic, mode, style, prefer_flats, render=print_chord_update, timings=None,
+                 debounce=0.0, model=None, auto_key=False, dashboard=None):
+        self.midi_out = midi_out
+        self.stream = ChordStream(tonic, mode, style, prefer_flats, model=model, auto_key=auto_key)
+        self.render = render
+        # A TerminalDashboard draws on its own clock instead of render() per chord change
+        self.dashboard = dashboard
+        self.timings = timings  # StageTimings, or None for no instrumentation
+        # Seconds to wait for a rolled/strummed chord to settle before naming it
+        self.debounce = debounce
+
+        self.messages = 0
+        self.latest = None
+        self.loop = None
+        self.settling = False
+        self.drawing = False
+
+    def bind(self, loop):
+        """Attach to the running event loop. Must happen before the input port opens."""
+        import asyncio
+
+        self.loop = loop
+        self.pending = asyncio.Queue()
+        self.updated = asyncio.Event()
+
+    def on_message(self, msg):
+        """mido input callback (runs on the backend's thread): thru first, then hand off."""
+        received_at = time.perf_counter()
+        timings = self.timings
+        self.messages += 1
+        change, notes = self.stream.feed(msg)
+        if timings is not None:
+            timings.record('notes', received_at)
+        if change == 'on':
+            self.midi_out.note_on(msg.note, msg.velocity)
+        elif change == 'off':
+            self.midi_out.note_off(msg.note, 0)
+        else:
+            return
+        if timings is not None:
+            timings.record('thru', received_at)
+        notes = self.stream.track_key(msg, received_at) or notes
+
+        # Only wake the analyzer if the answer could be different
+        if notes is not None:
+            self.loop.call_soon_threadsafe(self.pending.put_nowait, (notes, received_at))
+
+    async def analyze(self):
+        import asyncio
+
+        while True:
+            notes, received_at = await self.pending.get()
+            # Let a rolled chord land: keep taking newer states until it's quiet for `debounce`,
+            # but no longer than DEBOUNCE_LIMIT windows in all
+            self.settling = bool(self.debounce)
+            deadline = self.loop.time() + self.debounce * DEBOUNCE_LIMIT
+            while self.debounce:
+                wait = min(self.debounce, deadline - self.loop.time())
+                if wait <= 0:
+                    break
+                try:
+                    notes, received_at = await asyncio.wait_for(self.pending.get(), wait)
+                except asyncio.TimeoutError:
+                    break
+            self.settling = False
+            # Coalesce: only the newest held-note state is worth naming
+            while not self.pending.empty():
+                notes, received_at = self.pending.get_nowait()
+
+            update = self.stream.name(notes, received_at, self.timings)
+            if update:
+                self.latest = update
+                self.updated.set()
+
+    async def draw(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        # A slow terminal blocks this thread, not the event loop
+        with ThreadPoolExecutor(max_workers=1) as terminal:
+            while True:
+                await self.updated.wait()
+                self.updated.clear()
+                self.drawing = True
+                await self.loop.run_in_executor(terminal, self._render, self.latest)
+                self.drawing = False
+
+    def _render(self, update):
+        self.render(update)
+        if self.timings is not None:
+            self.timings.record('output', update.received_at)
+
+    def idle(self):
+        """Nothing waiting to be named or drawn (checked from the event loop)."""
+        return not (self.settling or self.drawing or self.updated.is_set()) and self.pending.empty()
+
+    async def run(self, stop=None):
+        """Run the consumers until `stop` (an awaitable) finishes, or forever."""
+        import asyncio
+
+        draw = self.dashboard.run(self) if self.dashboard is not None else self.draw()
+        tasks = [asyncio.create_task(self.analyze()), asyncio.create_task(draw)]
+        try:
+            await (stop if stop is not None else asyncio.Future())
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+# --- TERMINAL DASHBOARD ---
+# A live view in place of scrolling prints: key, held notes, chord and degree, suggestions
+# and their voicings, latency and counters. It redraws on its own clock (at most --fps
+# frames a second) from a snapshot of the pipeline taken in the event loop, never from the
+# input callback, and only rewrites the rows whose text changed. Fast playing costs a few
+# short writes per frame; a frame where nothing changed costs no write at all.
+
+class TerminalDashboard:
+    SLOW_ROWS_EVERY = 0.25  # seconds between refreshes of the latency and counter rows
+
+    def __init__(self, fps=30, out=None):
+        self.fps = fps
+        self.out = out or sys.stdout
+        self.width = 100
+        self.drawn = []  # each row's text as last written
+        self.frames = 0  # frames that wrote something
+        self.rows_written = 0
+        self.slow_rows = []
+        self.slow_at = 0.0
+
+    def open(self):
+        import shutil
+
+        self.width = shutil.get_terminal_size().columns - 1
+        # Alternate screen, cursor hidden: the shell's scrollback comes back untouched on exit
+        self.out.write("\x1b[?1049h\x1b[?25l\x1b[2J")
+        self.out.flush()
+
+    def close(self):
+        self.out.write("\x1b[?25h\x1b[?1049l")
+        self.out.flush()
+
+    def snapshot(self, pipeline, update):
+        """The view as row strings, from copies of the live state (runs in the event loop)."""
+        stream = pipeline.stream
+        # frozenset() copies the set in one go, so the callback thread can't change it mid-read
+        held = sorted(frozenset(stream.state.notes))
+        flats = stream.prefer_flats
+        key = f"{key_name(stream.tonic_note)} {stream.mode.replace('_', ' ').capitalize()}"
+        rows = [
+            f"🎼 Key       {key}{' (detected)' if stream.key_detector is not None else ''}, {stream.style}",
+            f"🎹 Held      {' '.join(note_name(n, flats) + str(n // 12 - 1) for n in held) or '-'}",
+            f"🎶 Chord     {update.name if update else '-'}",
+            f"👉 Next      {', '.join(update.suggestion_names) if update else '-'}",
+            f"🎹 Voicings  {format_voicings(update) if update else '-'}",
+        ]
+
+        now = time.perf_counter()
+        if now - self.slow_at >= self.SLOW_ROWS_EVERY or not self.slow_rows:
+            self.slow_at = now
+            timings = pipeline.timings
+            if timings is not None:
+                h = timings.histograms
+                latency = (f"thru p99 {h['thru'].percentile(99) / 1e3:.0f} µs, "
+                           f"suggestion p50 {h['suggest'].percentile(50) / 1e6:.2f} ms "
+                           f"p99 {h['suggest'].percentile(99) / 1e6:.2f} ms, "
+                           f"drawn p99 {h['output'].percentile(99) / 1e6:.1f} ms")
+            else:
+                latency = "run with --instrument to see it"
+            dropped = getattr(pipeline.midi_out, 'dropped', 0)
+            counts = (f"{pipeline.messages:,} messages, {stream.analyses:,} analyzed, "
+                      f"{self.frames:,} frames ({self.rows_written:,} rows)")
+            if dropped:
+                counts += f", {dropped:,} thru dropped"
+            self.slow_rows = [f"⏱️  Latency   {latency}", f"📊 Counts    {counts}"]
+        return [row[:self.width] for row in rows + self.slow_rows + ["", "Ctrl+C to stop"]]
+
+    def write(self, rows):
+        """Rewrite the rows that changed since the last frame (runs on the terminal thread)."""
+        parts = [f"\x1b[{i + 1};1H{text}\x1b[K" for i, text in enumerate(rows)
+                 if i >= len(self.drawn) or self.drawn[i] != text]
+        self.out.write(''.join(parts))
+        self.out.flush()
+        self.drawn = rows
+        self.frames += 1
+        self.rows_written += len(parts)
+
+    async def run(self, pipeline):
+        """Draw `pipeline` until cancelled (takes the place of LivePipeline.draw)."""
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+
+        loop = asyncio.get_running_loop()
+        update = None
+        try:
+            # A slow terminal blocks this thread, not the event loop
+            with ThreadPoolExecutor(max_workers=1) as terminal:
+                await loop.run_in_executor(terminal, self.open)
+                while True:
+                    started = time.perf_counter()
+                    fresh = pipeline.updated.is_set()
+                    if fresh:
+                        pipeline.updated.clear()
+                        update = pipeline.latest
+                    rows = self.snapshot(pipeline, update)
+                    if rows != self.drawn:
+                        pipeline.drawing = True
+                        await loop.run_in_executor(terminal, self.write, rows)
+                        pipeline.drawing = False
+                    if fresh and pipeline.timings is not None:
+                        pipeline.timings.record('output', update.received_at)
+                    await asyncio.sleep(max(0.0, 1 / self.fps - (time.perf_counter() - started)))
+        finally:
+            pipeline.drawing = False
+            self.close()
+
+# --- MULTI-PORT / MULTI-CHANNEL SESSIONS ---
+class FairQueue:
+    """
+    Newest value per key, handed out round-robin. A key that's offered again
+    before it's taken just has its value replaced, so one busy stream can't
+    push the others back in line.
+    """
+
+    def __init__(self):
+        import asyncio
+
+        self.latest = {}
+        self.ready = deque()
+        self.available = asyncio.Event()
+
+    def offer(self, key, value):
+        if key not in self.latest:
+            self.ready.append(key)
+        self.latest[key] = value
+        self.available.set()
+
+    async def take(self):
+        while not self.ready:
+            self.available.clear()
+            await self.available.wait()
+        key = self.ready.popleft()
+        return key, self.latest.pop(key)
+
+def print_stream_update(stream, update):
+    if update.key_changed:
+        print(f"\n🎛️ {stream.label}  🧭 Key: {update.key_changed}")
+    print(f"\n🎛️ {stream.label}  🎶 Chord: {update.name}")
+    print(f"👉 Suggested next chords: {', '.join(update.suggestion_names)}")
+    print(f"🎹 Closest voicings: {format_voicings(update)}\n")
+
+class SessionServer:
+    """
+    Many input ports and channels at once. Every (port, channel) gets its own
+    ChordStream with its own key; thru keeps the channel, and chord updates are
+    rendered per stream.
+    """
+
+    def __init__(self, midi_out, tonic='C', mode='ionian', style='pop', stream_keys=None,
+                 render=print_stream_update, timings=None, model=None, auto_key=False):
+        self.midi_out = midi_out
+        self.default_key = (tonic, mode, style)
+        self.model = model
+        self.auto_key = auto_key
+        # (port, channel) -> (tonic, mode, style) for streams that don't use the default
+        self.stream_keys = dict(stream_keys or {})
+        self.render = render
+        self.timings = timings
+        # Each port's callback thread times notes and thru into its own branch of timings
+        self.port_timings = {}
+        self.streams = {}
+        self.messages = 0
+        self.loop = None
+        self.drawing = False
+
+    def bind(self, loop):
+        self.loop = loop
+        self.pending = FairQueue()
+        self.updates = FairQueue()
+
+    def stream_for(self, port, channel):
+        stream = self.streams.get((port, channel))
+        if stream is None:
+            tonic, mode, style = self.stream_keys.get((port, channel), self.default_key)
+            stream = ChordStream(tonic, mode, style, label=f"{port} ch{channel + 1}", model=self.model,
+                                 auto_key=self.auto_key and (port, channel) not in self.stream_keys)
+            self.streams[(port, channel)] = stream
+        return stream
+
+    def callback_for(self, port):
+        return lambda msg: self.on_message(port, msg)
+
+    def on_message(self, port, msg):
+        """mido input callback for one port: thru on the same channel, then hand off."""
+        received_at = time.perf_counter()
+        timings = self.timings
+        if timings is not None:
+            timings = self.port_timings.get(port) or self.port_timings.setdefault(port, timings.branch())
+        self.messages += 1
+        if not hasattr(msg, 'channel'):
+            return
+        stream = self.stream_for(port, msg.channel)
+        change, notes = stream.feed(msg)
+        if timings is not None:
+            timings.record('notes', received_at)
+        if change == 'on':
+            self.midi_out.note_on(msg.note, msg.velocity, msg.channel)
+        elif change == 'off':
+            self.midi_out.note_off(msg.note, 0, msg.channel)
+        else:
+            return
+        if timings is not None:
+            timings.record('thru', received_at)
+        notes = stream.track_key(msg, received_at) or notes
+        if notes is not None:
+            self.loop.call_soon_threadsafe(self.pending.offer, stream, (notes, received_at))
+
+    async def analyze(self):
+        import asyncio
+
+        while True:
+            stream, (notes, received_at) = await self.pending.take()
+            update = stream.name(notes, received_at, self.timings)
+            if update:
+                self.updates.offer(stream, update)
+            # Let queued input callbacks in between streams
+            await asyncio.sleep(0)
+
+    async def draw(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=1) as terminal:
+            while True:
+                stream, update = await self.updates.take()
+                self.drawing = True
+                await self.loop.run_in_executor(terminal, self._render, stream, update)
+                self.drawing = False
+
+    def _render(self, stream, update):
+        self.render(stream, update)
+        if self.timings is not None:
+            self.timings.record('output', update.received_at)
+
+    def idle(self):
+        return not (self.drawing or self.pending.ready or self.updates.ready)
+
+    async def run(self, stop=None):
+        import asyncio
+
+        tasks = [asyncio.create_task(self.analyze()), asyncio.create_task(self.draw())]
+        try:
+            await (stop if stop is not None else asyncio.Future())
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+async def listen_multi_async(port_names, server, recorder=None):
+    import asyncio
+    import mido
+    from contextlib import ExitStack
+
+    server.bind(asyncio.get_running_loop())
+    with ExitStack() as ports:
+        for i, port_name in enumerate(port_names):
+            callback = server.callback_for(port_name)
+            if recorder is not None:
+                callback = recorder.wrap(i, callback)
+            ports.enter_context(mido.open_input(port_name, callback=callback))
+        await server.run()
+
+async def listen_async(port_name, pipeline, recorder=None):
+    import asyncio
+    import mido
+
+    pipeline.bind(asyncio.get_running_loop())
+    callback = pipeline.on_message if recorder is None else recorder.wrap(0, pipeline.on_message)
+    with mido.open_input(port_name, callback=callback):
+        await pipeline.run()
+
+# --- RECORD / REPLAY ---
+# Live input can be captured to a session log and fed back later through the same pipeline,
+# so latency and throughput can be measured on real playing without a keyboard attached.
+# A log is a short header (magic, version, input port names) and then fixed-size records:
+# nanoseconds since recording started, port index, and the raw MIDI bytes. Channel messages
+# are at most 3 bytes, so sysex is left out. Records are only ever appended, so a log cut
+# short by a crash still reads back up to its last whole record.
+
+MIDI_LOG_MAGIC = b'CSML'
+MIDI_LOG_VERSION = 1
+MIDI_LOG_HEADER = '<4sHH'   # magic, version, port count; then per port a uint16 length + UTF-8 name
+MIDI_LOG_RECORD = '<QBB3s'  # ns since start, port index, byte count, bytes (zero padded)
+MIDI_LOG_FLUSH_EVERY = 0.1  # seconds: a crash loses at most this much of the log
+
+class MidiRecorder:
+    """Appends every message handed to it to a session log."""
+
+    def __init__(self, path, port_names):
+        import struct
+        import threading
+
+        self.file = open(path, 'wb')
+        header = struct.pack(MIDI_LOG_HEADER, MIDI_LOG_MAGIC, MIDI_LOG_VERSION, len(port_names))
+        for name in port_names:
+            encoded = name.encode()
+            header += struct.pack('<H', len(encoded)) + encoded
+        self.file.write(header)
+        self.pack = struct.Struct(MIDI_LOG_RECORD).pack
+        self.start = time.perf_counter_ns()
+        self.recorded = 0
+        self.skipped = 0
+        # Buffered writes stay cheap on the input thread; this thread pushes them to the OS
+        self.closed = threading.Event()
+        self.flusher = threading.Thread(target=self._flush, name='midi-log', daemon=True)
+        self.flusher.start()
+
+    def _flush(self):
+        while not self.closed.wait(MIDI_LOG_FLUSH_EVERY):
+            self.file.flush()
+
+    def record(self, port_index, msg, received_ns):
+        data = msg.bytes()
+        if len(data) > 3:
+            self.skipped += 1
+            return
+        # BufferedWriter.write is locked, so several port threads can share the file
+        self.file.write(self.pack(received_ns - self.start, port_index, len(data), bytes(data)))
+        self.recorded += 1
+
+    def wrap(self, port_index, callback):
+        """A mido callback that hands the message on first (thru stays first) and logs it after."""
+        def recording_callback(msg):
+            received_ns = time.perf_counter_ns()
+            callback(msg)
+            self.record(port_index, msg, received_ns)
+        return recording_callback
+
+    def close(self):
+        self.closed.set()
+        self.flusher.join()
+        self.file.close()
+
+def read_midi_log(path):
+    """(port names, [(seconds since start, port index, mido message), ...]) from a session log."""
+    import mido
+    import struct
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    header = struct.calcsize(MIDI_LOG_HEADER)
+    if len(data) < header:
+        raise ValueError(f"{path} is too short to be a session log")
+    magic, version, ports = struct.unpack_from(MIDI_LOG_HEADER, data)
+    if magic != MIDI_LOG_MAGIC or version != MIDI_LOG_VERSION:
+        raise ValueError(f"{path} is not a version {MIDI_LOG_VERSION} session log")
+    offset, port_names = header, []
+    for _ in range(ports):
+        if offset + 2 > len(data):
+            raise ValueError(f"{path}: the header is cut short in its port names")
+        (length,) = struct.unpack_from('<H', data, offset)
+        if offset + 2 + length > len(data):
+            raise ValueError(f"{path}: the header is cut short in its port names")
+        port_names.append(data[offset + 2:offset + 2 + length].decode())
+        offset += 2 + length
+
+    record = struct.Struct(MIDI_LOG_RECORD)
+    end = len(data) - (len(data) - offset) % record.size  # drop a half-written last record
+    events = []
+    for ns, port, length, raw in record.iter_unpack(memoryview(data)[offset:end]):
+        if port >= ports:
+            raise ValueError(f"{path}: a record at {ns / 1e9:.3f} s names port {port}, "
+                             f"but the header lists {ports}")
+        events.append((ns / 1e9, port, mido.Message.from_bytes(raw[:length])))
+    return port_names, events
+
+class NullMidiOutput:
+    """Thru sink for replays with no synth attached; just counts writes."""
+
+    def __init__(self):
+        self.writes = 0
+
+    def note_on(self, note, velocity, channel=0):
+        self.writes += 1
+
+    def note_off(self, note, velocity, channel=0):
+        self.writes += 1
+
+    def close(self):
+        pass
+
+def _feed_events(events, callbacks, speed, settle=None):
+    """
+    Deliver logged messages from this thread like a MIDI backend would (speed=0: flat out).
+    With `settle`, wait for it after every message before moving on to the next.
+    """
+    start = time.perf_counter()
+    for at, port, msg in events:
+        if speed:
+            delay = start + at / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        callbacks[port](msg)
+        if settle is not None:
+            settle()
+    return len(events), time.perf_counter() - start
+
+def replay_events(port_names, events, pipeline, speed=1.0, seed=0, lockstep=True):
+    """
+    Run logged events through a LivePipeline (one port) or SessionServer until they've all
+    been named and drawn. Returns (messages, seconds spent feeding).
+
+    In lockstep, each message is named and drawn before the next one goes in (late if it
+    has to be), so with the same seed the updates come out the same on every run and
+    machine. Without it, messages arrive on their own schedule and the analyzer skips
+    states it can't keep up with, as it would live.
+    """
+    import asyncio
+
+    random.seed(seed)
+    if isinstance(pipeline, SessionServer):
+        callbacks = [pipeline.callback_for(name) for name in port_names]
+    else:
+        callbacks = [pipeline.on_message] * len(port_names)
+
+    async def idle():
+        # Let the hand-off and the analyzer run, then wait out the terminal thread
+        for _ in range(3):
+            await asyncio.sleep(0)
+        while not pipeline.idle():
+            await asyncio.sleep(0.0001)
+
+    async def replay():
+        loop = asyncio.get_running_loop()
+        pipeline.bind(loop)
+        settle = (lambda: asyncio.run_coroutine_threadsafe(idle(), loop).result()) if lockstep else None
+        feeding = loop.run_in_executor(None, _feed_events, events, callbacks, speed, settle)
+
+        async def finished():
+            await feeding
+            await idle()
+
+        await pipeline.run(finished())
+        return feeding.result()
+
+    return asyncio.run(replay())
+
+def run_replay(path, tonic='C', mode='ionian', style='pop', speed=1.0, seed=0, instrument=False, debounce=0.0,
+               model=None, auto_key=False, lockstep=True, dashboard=None):
+    """Replay a session log through the live pipeline (into a null thru output) and report the pace."""
+    port_names, events = read_midi_log(path)
+    timings = stage_timings(instrument)
+    midi_out = NullMidiOutput()
+    if len(port_names) > 1:
+        pipeline = SessionServer(midi_out, tonic, mode, style, timings=timings, model=model, auto_key=auto_key)
+    else:
+        pipeline = LivePipeline(midi_out, tonic, mode, style, tonic in flat_keys, timings=timings,
+                                debounce=debounce, model=model, auto_key=auto_key,
+                                dashboard=TerminalDashboard(dashboard) if dashboard else None)
 
-    # Strip suffix to get clean root
-    raw_root = current_chord.split()[0]
+    pace = (f"{speed:g}x" if speed else "flat out") + ("" if lockstep else ", free-running")
+    print(f"⏯️  Replaying {len(events):,} messages from {', '.join(port_names) or path} ({pace})", file=sys.stderr)
+    try:
+        messages, seconds = replay_events(port_names, events, pipeline, speed, seed, lockstep)
+    except KeyboardInterrupt:
+        print("\n⏹️  Replay stopped.", file=sys.stderr)
+        return
+    finally:
+        if timings is not None:
+            timings.dump()
+    print(f"⏯️  {messages:,} messages in {seconds:.3f} s ({messages / max(seconds, 1e-9):,.0f} messages/s), "
+          f"{midi_out.writes:,} thru writes", file=sys.stderr)
+
+# --- SOCKET SERVER (NDJSON) ---
+# For DAW plugins, web UIs and scripts: one JSON request per line in, one JSON line out.
+# A line can also be a JSON array of requests (answered with an array, in order). Each
+# connection keeps its own session: default key/style, chord history and random seed.
+#
+#   {"id": 1, "notes": [62, 65, 69, 72]}                        -> chord + suggestions
+#   {"op": "session", "tonic": "Bb", "mode": "dorian", "style": "jazz", "seed": 7}
+#   {"op": "generate", "length": 8, "beam": 16, "top": 3}
+#   {"op": "reset"}                                             -> forget chord history
+
+# Bounds on a generate request: the search runs on the event loop, so one request must not
+# hold up every other client for long (64 chords at beam 64 takes tens of milliseconds)
+SERVER_GENERATE_LIMITS = {'length': (3, 64), 'beam': (1, 64), 'top': (1, 32)}
+
+class ClientSession:
+    """Per-connection state for the socket server."""
+
+    def __init__(self, tonic='C', mode='ionian', style='pop', model=None, seed=None):
+        self.model = model
+        self.engines = {}
+        self.tonic = self.mode = self.style = None
+        self.configure({'tonic': tonic, 'mode': mode, 'style': style, 'seed': seed})
+
+    def configure(self, request):
+        """Switch key/style (and reseed) from a request's fields; history resets on a new key."""
+        tonic = request.get('tonic', self.tonic)
+        mode = request.get('mode', self.mode)
+        style = request.get('style', self.style)
+        if tonic not in pitch_classes:
+            raise ValueError(f"unknown tonic {tonic!r}")
+        if mode not in mode_intervals:
+            raise ValueError(f"unknown mode {mode!r}")
+        if style not in style_rules:
+            raise ValueError(f"unknown style {style!r}")
+        if 'seed' in request:
+            self.rng = random.Random(request['seed'])
+            self.engines.clear()
+        if (tonic, mode, style) != (self.tonic, self.mode, self.style):
+            self.tonic, self.mode, self.style = tonic, mode, style
+            self.reset()
+
+    def reset(self):
+        self.history = deque(maxlen=self.engine().history_length)
+        self.last_chord = NO_CHORD
+
+    def engine(self):
+        key = (self.tonic, self.mode, self.style)
+        engine = self.engines.get(key)
+        if engine is None:
+            engine = self.engines[key] = SuggestionEngine(self.tonic, self.mode, self.style, self.tonic in flat_keys,
+                                                          rng=self.rng, model=self.model)
+        return engine
+
+    def state(self):
+        return {"tonic": self.tonic, "mode": self.mode, "style": self.style}
+
+    def handle(self, request):
+        """Answer one request dict. Errors come back as {"error": ...}, never raised."""
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("a request must be a JSON object")
+            op = request.get('op', 'analyze')
+            if op == 'analyze':
+                response = self.analyze(request)
+            elif op == 'session':
+                self.configure(request)
+                response = self.state()
+            elif op == 'generate':
+                response = self.generate(request)
+            elif op == 'reset':
+                self.reset()
+                response = self.state()
+            else:
+                raise ValueError(f"unknown op {op!r}")
+        except (ValueError, TypeError, KeyError, OverflowError, RecursionError) as e:
+            response = {"error": f"{type(e).__name__}: {e}"}
+        if isinstance(request, dict) and 'id' in request:
+            response["id"] = request['id']
+        return response
+
+    def analyze(self, request):
+        """Name the held notes and suggest what's next (same pipeline as a live stream)."""
+        if any(k in request for k in ('tonic', 'mode', 'style')):
+            self.configure(request)
+        notes = request['notes']
+        # bool is an int too, but true isn't a note
+        if not isinstance(notes, list) or not all(type(n) is int and 0 <= n <= 127 for n in notes):
+            raise ValueError("notes must be a list of MIDI note numbers, 0-127")
+        notes = frozenset(notes)
+        engine = self.engine()
+        prefer_flats = engine.prefer_flats
+        chord = recognize_chord(notes, engine.tonic_index, self.mode) if len(notes) >= 3 else None
+        ranked = voicing_table.rank(chord, notes, engine.suggest(chord, self.history)) if notes else []
+        if len(notes) >= 3 and chord is not self.last_chord:
+            self.history.append(chord)
+            self.last_chord = chord
+        return {
+            "chord": chord.describe(self.mode, prefer_flats, slash_bass(chord, notes)) if chord else
+                     ("Unrecognized chord" if len(notes) >= 3 else None),
+            "symbol": chord.symbol(prefer_flats) if chord else None,
+            "suggestions": [c.symbol(prefer_flats) for c, _, _ in ranked],
+            "voicings": [list(voicing) for _, voicing, _ in ranked],
+        }
 
-    # Normalize to match keys in secondary_dominants
-    enharmonic_reverse = {
-        'A#': 'Bb', 'D#': 'Eb', 'G#': 'Ab', 'C#': 'Db', 'F#': 'Gb', 'B': 'Cb', 'E': 'Fb'
-    }
-    if raw_root in enharmonic_reverse:
-        raw_root = enharmonic_reverse[raw_root]
+    def generate(self, request):
+        if any(k in request for k in ('tonic', 'mode', 'style')):
+            self.configure(request)
+        sizes = {'length': 8, 'beam': 16, 'top': 5}
+        for field, (low, high) in SERVER_GENERATE_LIMITS.items():
+            sizes[field] = int(request.get(field, sizes[field]))
+            if not low <= sizes[field] <= high:
+                raise ValueError(f"{field} must be between {low} and {high}")
+        progressions = generate_progressions(self.tonic, self.mode, self.style, sizes['length'], sizes['beam'],
+                                             sizes['top'], model=self.model)
+        prefer_flats = self.tonic in flat_keys
+        return {"progressions": [{"score": p.score, "chords": [c.symbol(prefer_flats) for c in p.chords]}
+                                 for p in progressions]}
+
+def handle_line(session, line):
+    """One NDJSON line in, one out: a request object or a batch (array) of them."""
+    import json
 
-    is_secondary = False
-    tonicized = None
+    try:
+        request = json.loads(line)
+    except (ValueError, RecursionError) as e:
+        response = {"error": f"bad JSON: {e}"}
+    else:
+        if isinstance(request, list):
+            response = [session.handle(r) for r in request]
+        else:
+            response = session.handle(request)
+    return json.dumps(response, ensure_ascii=False).encode() + b"\n"
+
+def parse_address(address):
+    """'unix:/tmp/chords.sock' -> ('unix', path); 'host:port' or 'port' -> ('tcp', (host, port))."""
+    if address.startswith('unix:'):
+        return 'unix', address[len('unix:'):]
+    host, _, port = address.rpartition(':')
+    if not port.isdigit() or int(port) > 65535:
+        raise ValueError(f"bad address {address!r}: expected unix:/path/to.sock, host:port or port")
+    return 'tcp', (host or '127.0.0.1', int(port))
+
+async def serve_client(reader, writer, tonic, mode, style, model):
+    import asyncio
+
+    session = ClientSession(tonic, mode, style, model)
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except (asyncio.LimitOverrunError, ValueError):
+                writer.write(b'{"error": "request line too long"}\n')
+                break
+            if not line:
+                break
+            if line.strip():
+                writer.write(handle_line(session, line))
+            # Only wait for the client to read when it's falling behind
+            if writer.transport.get_write_buffer_size() > 1 << 16:
+                await writer.drain()
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
 
-    if "m" not in current_chord.lower() and raw_root in secondary_dominants:
-        tonicized = secondary_dominants[raw_root]
-        if tonicized != tonic:
-            is_secondary = True
+async def serve_async(address, tonic='C', mode='ionian', style='pop', model=None, ready=None):
+    import asyncio
 
-    # 🌐 Detect if current chord is a secondary dominant
-    secondary_dominants = {
-        "D": "G", "A": "D", "E": "A", "B": "E", "F#": "B", "C#": "F#", "G#": "C#",
-        "Db": "Gb", "Ab": "Db", "Eb": "Ab", "Bb": "Eb", "F": "Bb", "C": "F", "G": "C"
-    }
+    kind, where = parse_address(address)
+    handler = lambda r, w: serve_client(r, w, tonic, mode, style, model)
+    if kind == 'unix':
+        if os.path.exists(where):
+            os.unlink(where)
+        server = await asyncio.start_unix_server(handler, where, limit=1 << 22)
+    else:
+        server = await asyncio.start_server(handler, *where, limit=1 << 22)
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
 
-    # Strip suffix to get clean root
-    raw_root = current_chord.split()[0]
+def run_server(address, tonic='C', mode='ionian', style='pop', model=None):
+    import asyncio
 
-    # Normalize raw_root enharmonically to match secondary_dominants keys
-    enharmonic_map = {
-        'A#': 'Bb', 'D#': 'Eb', 'G#': 'Ab', 'C#': 'Db',
-        'F#': 'Gb', 'B': 'Cb', 'E': 'Fb'
-    }
-    if raw_root in enharmonic_map:
-        raw_root = enharmonic_map[raw_root]
+    print(f"🛰️ Serving NDJSON on {address} (default key {tonic} {mode}, style {style}); Ctrl+C to stop",
+          file=sys.stderr)
+    try:
+        asyncio.run(serve_async(address, tonic, mode, style, model))
+    except KeyboardInterrupt:
+        print("\n⏹️  Server stopped.", file=sys.stderr)
+
+# --- LIVE MIDI OUTPUT ---
+# Thru never writes to the device from the input callback: note events go into a bounded
+# buffer and a writer thread sends whatever has piled up in one bulk write. A slow device,
+# a busy analyzer or a blocked terminal can't hold up reading input, and when the buffer
+# fills the `when_full` policy decides what gives:
+#   'drop-on'      drop new note-ons, still queue note-offs (nothing gets stuck; default)
+#   'drop-oldest'  overwrite the oldest queued event, like a ring buffer
+#   'block'        make the input callback wait for room (backpressure, nothing lost)
+
+THRU_POLICIES = ('drop-on', 'drop-oldest', 'block')
+
+class ThruOutput:
+    """
+    note_on/note_off front end (same calls as pygame.midi.Output) over any port with a
+    pygame-style write([[[status, data1, data2], timestamp], ...]) and close().
+    """
+    MAX_WRITE = 1024  # pygame takes at most 1024 events per write
+
+    def __init__(self, port, capacity=1024, when_full='drop-on'):
+        import threading
+
+        if when_full not in THRU_POLICIES:
+            raise ValueError(f"unknown thru policy {when_full!r}")
+        self.port = port
+        self.capacity = capacity
+        self.when_full = when_full
+        self.buffer = deque()  # (status, data1, data2, queued at)
+        self.ready = threading.Condition()
+        self.closed = False
+        self.error = None  # what the port raised if a write failed; the writer stops there
+        self.written = self.writes = self.dropped = self.deepest = 0
+        self.latency = LatencyHistogram()  # queued -> handed to the port, written by the writer thread only
+        self.writer = threading.Thread(target=self._drain, name='midi-thru', daemon=True)
+        self.writer.start()
+
+    def note_on(self, note, velocity, channel=0):
+        self._queue(0x90 | channel, note, velocity)
+
+    def note_off(self, note, velocity, channel=0):
+        self._queue(0x80 | channel, note, velocity)
+
+    def _queue(self, status, note, velocity):
+        event = (status, note, velocity, time.perf_counter())
+        with self.ready:
+            if self.error is not None:
+                self.dropped += 1  # nothing is writing any more
+                return
+            if len(self.buffer) >= self.capacity:
+                if self.when_full == 'block':
+                    while len(self.buffer) >= self.capacity and not self.closed and self.error is None:
+                        self.ready.wait()
+                    if self.error is not None:
+                        self.dropped += 1
+                        return
+                elif self.when_full == 'drop-oldest':
+                    self.buffer.popleft()
+                    self.dropped += 1
+                elif status & 0xF0 == 0x90:
+                    self.dropped += 1
+                    return
+            self.buffer.append(event)
+            self.deepest = max(self.deepest, len(self.buffer))
+            self.ready.notify_all()
+
+    def _drain(self):
+        while True:
+            with self.ready:
+                while not self.buffer and not self.closed:
+                    self.ready.wait()
+                if not self.buffer:
+                    return
+                batch = list(self.buffer)
+                self.buffer.clear()
+                self.ready.notify_all()  # room again for a blocked callback
+            for i in range(0, len(batch), self.MAX_WRITE):
+                chunk = batch[i:i + self.MAX_WRITE]
+                try:
+                    self.port.write([[[status, data1, data2], 0] for status, data1, data2, _ in chunk])
+                except Exception as e:  # unplugged device, closed port, ...
+                    self._fail(e, len(batch) - i)
+                    return
+                self.writes += 1
+            sent = time.perf_counter()
+            for event in batch:
+                self.latency.record(int((sent - event[3]) * 1e9))
+            self.written += len(batch)
+
+    def _fail(self, error, unsent):
+        """Stop the writer after a failed write: drop what's queued and wake a blocked callback."""
+        print(f"⚠️  MIDI thru stopped, writing to the output failed: {error!r}", file=sys.stderr)
+        with self.ready:
+            self.error = error
+            self.dropped += unsent + len(self.buffer)
+            self.buffer.clear()
+            self.ready.notify_all()
+
+    def report(self):
+        h = self.latency
+        failed = f", stopped after a failed write ({self.error!r})" if self.error is not None else ""
+        return (f"🔌 Thru: {self.written:,} events in {self.writes:,} writes, deepest queue {self.deepest}, "
+                f"{self.dropped:,} dropped ({self.when_full}){failed}; "
+                f"queued -> sent p50 {h.percentile(50) / 1e3:.1f} µs, "
+                f"p99 {h.percentile(99) / 1e3:.1f} µs, max {h.max / 1e3:.1f} µs")
+
+    def close(self):
+        """Send what's still queued, stop the writer and close the port."""
+        with self.ready:
+            self.closed = True
+            self.ready.notify_all()
+        self.writer.join()
+        self.port.close()
+
+class PygameOutputPort:
+    """A pygame.midi output device; quits pygame.midi when closed."""
+
+    def __init__(self, device_id):
+        import pygame.midi
+
+        self.output = pygame.midi.Output(device_id)
+        self.write = self.output.write
+
+    def close(self):
+        import pygame.midi
+
+        self.output.close()
+        pygame.midi.quit()
 
-    is_secondary = False
-    tonicized = None
+class MidoOutputPort:
+    """A mido output port (any mido backend) behind the pygame-style write()."""
 
-    if "m" not in current_chord.lower() and raw_root in secondary_dominants:
-        tonicized = secondary_dominants[raw_root]
-        if tonicized != tonic:
-            is_secondary = True
+    def __init__(self, name):
+        import mido
 
-        # 🎯 If it's a secondary dominant, resolve to its minor
-    if is_secondary:
-        if style == "jazz":
-            resolution = f"{tonicized}{random.choice(['m7', 'm9', 'm11'])}"
-        else:
-            resolution = f"{tonicized}m"
+        self.port = mido.open_output(name)
+        self.message = mido.Message.from_bytes
 
-        if resolution not in suggestions:
-            #print(f"🔍 Secondary dominant detected: {current_chord} → inserting resolution {resolution}")
-            suggestions.insert(0, resolution)
+    def write(self, events):
+        send, message = self.port.send, self.message
+        for data, _ in events:
+            send(message(data))
 
+    def close(self):
+        self.port.close()
 
-        # Normalize tonicized resolution
-        resolution_root = tonicized
-        if resolution_root not in root_names:
-            enharmonic_reverse = {
-                'A#': 'Bb', 'D#': 'Eb', 'G#': 'Ab',
-                'C#': 'Db', 'F#': 'Gb', 'B': 'Cb', 'E': 'Fb'
-            }
-            resolution_root = enharmonic_reverse.get(tonicized, tonicized)
+def open_midi_output(port_name='loopMIDI', api='pygame', capacity=1024, when_full='drop-on'):
+    """
+    ThruOutput to the first output port whose name contains port_name, through pygame.midi
+    or mido (whichever backend mido is set up with: rtmidi, portmidi, ...).
+    """
+    if api == 'mido':
+        import mido
+        names = [name for name in mido.get_output_names() if port_name in name]
+        port = MidoOutputPort(names[0]) if names else None
+    else:
+        import pygame.midi
+        pygame.midi.init()
+        port = None
+        for i in range(pygame.midi.get_count()):
+            interf, name, input_, output_, opened = pygame.midi.get_device_info(i)
+            if output_ and port_name.encode() in name:
+                port = PygameOutputPort(i)
+                break
+        if port is None:
+            pygame.midi.quit()
+
+    if port is None:
+        print(f"❌ {port_name} not found! Is it running?")
+        exit()
+    return ThruOutput(port, capacity, when_full)
+
+def run_live(instrument=False, debounce=0.0, model=None, auto_key=False, record=None, output=None, dashboard=None):
+    # MIDI backends load only here, so importing this module stays cheap
+    import mido
+
+    # output: open_midi_output() keyword arguments (port name, api, buffer size, policy)
+    midi_out = open_midi_output(**(output or {}))
+
+    # ⏱️ Optional per-stage latency histograms, dumped on exit (and on SIGUSR1 where available)
+    timings = stage_timings(instrument)
+
+    # --- MIDI PORT SELECTION ---
+    ports = mido.get_input_names()
+    print("🎛️ Available MIDI ports:")
+    for i, name in enumerate(ports):
+        print(f"  {i}: {name}")
+    selected = input("🎚️ Enter the number of the port you want to use: ").strip()
 
-        # Pick resolution quality
-        if style == "jazz":
-            resolution_suffix = random.choice(["m7", "m9", "m11"])
-        else:
-            resolution_suffix = "m"
-
-        resolution_chord = f"{resolution_root}{resolution_suffix}"
-
-    # 🎲 Wildcard chaos mode
-    if random.random() < 0.2:
-        flat_7 = (tonic_index + 10) % 12
-        flat_3 = (tonic_index + 3) % 12
-        flat_6 = (tonic_index + 8) % 12
-        wildcards = [note_name(n, prefer_flats) for n in [flat_7, flat_3, flat_6]]
-        suggestions.insert(0, random.choice(wildcards))
-
-    return suggestions[:3] if suggestions else chords[:3]
-
-# --- MIDI PORT SELECTION ---
-ports = mido.get_input_names()
-print("🎛️ Available MIDI ports:")
-for i, name in enumerate(ports):
-    print(f"  {i}: {name}")
-selected = input("🎚️ Enter the number of the port you want to use: ").strip()
-
-try:
-    port_name = ports[int(selected)]
-except (IndexError, ValueError):
-    print("❌ Invalid selection. Exiting.")
-    exit(1)
-
-# --- LOOP FOR NEW SESSIONS ---
-while True:
+    try:
+        port_name = ports[int(selected)]
+    except (IndexError, ValueError):
+        print("❌ Invalid selection. Exiting.")
+        exit(1)
+
+    # ⏺️ Optional session log of everything that comes in, for --replay later
+    recorder = MidiRecorder(record, [port_name]) if record else None
+
+    try:
+        # --- LOOP FOR NEW SESSIONS ---
+        while True:
+            if not run_session(port_name, midi_out, timings, debounce, model, auto_key, recorder, dashboard):
+                break
+    finally:
+        midi_out.close()
+        if timings is not None or midi_out.dropped:
+            print(midi_out.report(), file=sys.stderr)
+        if recorder is not None:
+            recorder.close()
+            print(f"⏺️  Recorded {recorder.recorded:,} messages to {record}")
+        if timings is not None:
+            timings.dump()
+
+def parse_stream_spec(spec, port_names):
+    """'1:10=D:dorian:jazz' -> ((port name, channel 0-15), ('D', 'dorian', 'jazz'))."""
+    where, _, key = spec.partition('=')
+    port, _, channel = where.partition(':')
+    tonic, mode, style = (key.split(':') + ['pop'])[:3]
+    if tonic not in pitch_classes or mode not in mode_intervals:
+        raise ValueError(f"bad key in stream spec {spec!r}")
+    return (port_names[int(port)], int(channel) - 1), (tonic, mode, style)
+
+def run_multi(port_indices=None, stream_specs=(), tonic='C', mode='ionian', style='pop', instrument=False,
+              model=None, auto_key=False, record=None, output=None):
+    """Listen to several input ports at once, one chord stream per (port, channel)."""
+    import asyncio
+    import mido
+
+    ports = mido.get_input_names()
+    selected = [ports[i] for i in port_indices] if port_indices else ports
+    try:
+        stream_keys = dict(parse_stream_spec(spec, ports) for spec in stream_specs)
+    except (ValueError, IndexError) as e:
+        print(f"❌ {e}")
+        exit(1)
+
+    midi_out = open_midi_output(**(output or {}))
+    timings = stage_timings(instrument)
+    server = SessionServer(midi_out, tonic, mode, style, stream_keys, timings=timings, model=model,
+                           auto_key=auto_key)
+
+    print("🎛️ Listening on:")
+    for name in selected:
+        print(f"  {name}")
+    print(f"🎼 Default key: {tonic} {mode.replace('_', ' ').capitalize()}, style {style}")
+    for (name, channel), key in stream_keys.items():
+        print(f"  {name} ch{channel + 1}: {' '.join(key)}")
+
+    recorder = MidiRecorder(record, selected) if record else None
+    try:
+        asyncio.run(listen_multi_async(selected, server, recorder))
+    except KeyboardInterrupt:
+        print("\n⏹️  Stopped listening.\n")
+    finally:
+        midi_out.close()
+        if timings is not None or midi_out.dropped:
+            print(midi_out.report(), file=sys.stderr)
+        if recorder is not None:
+            recorder.close()
+            print(f"⏺️  Recorded {recorder.recorded:,} messages to {record}")
+        if timings is not None:
+            timings.dump()
+
+def run_session(port_name, midi_out, timings=None, debounce=0.0, model=None, auto_key=False, recorder=None,
+                dashboard=None):
+    """One prompt-then-listen session. Returns False when the user asks to quit."""
     print("\n🔁 New session — type 'exit' to quit.")
 
+    if auto_key:
+        # 🧭 No key prompts: start from C ionian and follow whatever gets played
+        style_input = input(f"🎧 Choose style ({', '.join(style_rules)}): ").strip().lower()
+        if style_input == 'exit':
+            print("👋 Bye diva!")
+            return False
+        return listen_session(port_name, midi_out, 'C', 'C', 'ionian', style_input, False,
+                              timings, debounce, model, auto_key=True, recorder=recorder, dashboard=dashboard)
+
     key_input = input("🎼 Enter tonic (e.g. C, D#, F, Bb): ").strip()
     if key_input.lower() == 'exit':
         print("👋 Bye diva!")
-        break
-
-    # ✅ Prefer flats if user typed 'b' or it's a flat key
-    flat_keys = ['F', 'Bb', 'Eb', 'Ab', 'Db', 'Gb', 'Cb']
-    prefer_flats = any(k.lower() in key_input.lower() for k in flat_keys) or 'b' in key_input.lower()
+        return False
 
     # 🎵 Initial tonic cleanup (preserve for display)
     if 'm' in key_input.lower() and not key_input.lower().endswith('maj'):
@@ -504,15 +3274,19 @@ while True:
 
     # Ask for quality *after* we normalize tonic
     quality = input("🌞 Major or 🌚 Minor? ").strip().lower()
-   
+
+    # Rule-pack modes go with major or minor by their third
+    major_modes = ['ionian', 'lydian', 'mixolydian'] + [m for m in rule_pack_modes if 4 in mode_intervals[m]]
+    minor_modes = ['dorian', 'phrygian', 'aeolian', 'locrian'] + [m for m in rule_pack_modes
+                                                                  if 4 not in mode_intervals[m]]
     if quality == 'major':
-        mode_input = input("🎹 Choose major mode (ionian, lydian, mixolydian): ").strip().lower()
-        if mode_input not in ['ionian', 'lydian', 'mixolydian']:
+        mode_input = input(f"🎹 Choose major mode ({', '.join(major_modes)}): ").strip().lower()
+        if mode_input not in major_modes:
             print("⚠️ Unknown major mode. Defaulting to ionian.")
             mode_input = 'ionian'
     elif quality == 'minor':
-        mode_input = input("🎹 Choose minor mode (dorian, phrygian, aeolian, locrian): ").strip().lower()
-        if mode_input not in ['dorian', 'phrygian', 'aeolian', 'locrian']:
+        mode_input = input(f"🎹 Choose minor mode ({', '.join(minor_modes)}): ").strip().lower()
+        if mode_input not in minor_modes:
             print("⚠️ Unknown minor mode. Defaulting to dorian.")
             mode_input = 'dorian'
         elif mode_input == 'aeolian':
@@ -528,39 +3302,207 @@ while True:
         tonic = 'C'
         mode_input = 'ionian'
 
-    style_input = input("🎧 Choose style (pop, jazz, classical): ").strip().lower()
+    style_input = input(f"🎧 Choose style ({', '.join(style_rules)}): ").strip().lower()
 
-    flat_keys = ['F', 'Bb', 'Eb', 'Ab', 'Db', 'Gb', 'Cb']
     prefer_flats = tonic in flat_keys
+    return listen_session(port_name, midi_out, tonic_internal, display_tonic, mode_input, style_input, prefer_flats,
+                          timings, debounce, model, recorder=recorder, dashboard=dashboard)
 
-    print(f"\n🎼 Mode: {display_tonic} {mode_input.replace('_', ' ').capitalize()}")
-    print(f"🎧 Style: {style_input}")
+def listen_session(port_name, midi_out, tonic, display_tonic, mode, style, prefer_flats,
+                   timings=None, debounce=0.0, model=None, auto_key=False, recorder=None, dashboard=None):
+    import asyncio
+
+    # Build this key's chord table and voicing moves now so the first chord doesn't pay for them
+    chord_name_table(pitch_classes[tonic], mode, prefer_flats)
+    engine = get_suggestion_engine(tonic, mode, style, prefer_flats, model)
+    voicing_table.warm(engine.plain_chords + [c for options in engine.jazz_voicings for c in options]
+                       if engine.voiced else engine.plain_chords)
+
+    if auto_key:
+        print("\n🧭 Key: detected from what you play")
+    else:
+        print(f"\n🎼 Mode: {display_tonic} {mode.replace('_', ' ').capitalize()}")
+    print(f"🎧 Style: {style}")
     print("🎹 Listening for chords... (Play 3+ notes!)")
 
-    active_notes = set()
-    last_chord = None
+    # dashboard: frames per second for a TerminalDashboard, or None for a printout per chord change
+    pipeline = LivePipeline(midi_out, tonic, mode, style, prefer_flats,
+                            timings=timings, debounce=debounce, model=model, auto_key=auto_key,
+                            dashboard=TerminalDashboard(dashboard) if dashboard else None)
 
     try:
-        with mido.open_input(port_name) as inport:
-            for msg in inport:
-                if msg.type == 'note_on' and msg.velocity > 0:
-                    active_notes.add(msg.note)
-                    midi_out.note_on(msg.note, msg.velocity)
-                elif msg.type in ('note_off', 'note_on') and msg.velocity == 0:
-                    active_notes.discard(msg.note)
-                    midi_out.note_off(msg.note, 0)
-
-                if len(active_notes) >= 3:
-                    chord = get_chord_name(active_notes, prefer_flats, tonic_note, mode_input)
-                    if chord and chord != last_chord:
-                        print(f"\n🎶 Chord: {chord}")
-                        suggestion = suggest_next_chords(chord, tonic_internal, mode_input, style_input, prefer_flats)
-                        print(f"👉 Suggested next chords: {', '.join(suggestion)}\n")
-                        last_chord = chord
-
+        asyncio.run(listen_async(port_name, pipeline, recorder))
     except KeyboardInterrupt:
         print("\n⏹️  Stopped listening. Returning to menu...\n")
 
-    finally:
-        midi_out.close()
-        pygame.midi.quit()
+    return True
+
+def main(argv=None):
+    import argparse
+
+    # Rule packs first: they add to the --mode and --style choices
+    rules_parser = argparse.ArgumentParser(add_help=False)
+    rules_parser.add_argument('--rules', nargs='+', default=[], metavar='PATH',
+                              help="rule-pack JSON files (or directories of them) adding modes, "
+                                   "chord qualities and styles")
+    rules_parser.add_argument('--rules-cache', metavar='DIR',
+                              help="where compiled rule packs are cached (default: ~/.cache/chord_suggester)")
+    rules_args, _ = rules_parser.parse_known_args(argv)
+    try:
+        use_rule_packs(rules_args.rules, rules_args.rules_cache)
+    except (OSError, ValueError) as e:
+        rules_parser.error(str(e))
+
+    parser = argparse.ArgumentParser(description="Name the chords you play and suggest what comes next.",
+                                     parents=[rules_parser])
+    parser.add_argument('--analyze', metavar='DIR',
+                        help="analyze every .mid file under DIR and print chord changes as JSONL")
+    parser.add_argument('--train', metavar='DIR',
+                        help="count the progressions in every .mid file under DIR (in --tonic/--mode) into --model")
+    parser.add_argument('--model', metavar='FILE',
+                        help="progression model file: written by --train, used to rank suggestions otherwise")
+    parser.add_argument('--order', type=int, default=2, choices=range(1, 6),
+                        help="n-gram order for a new --train model: chords of context (default: 2)")
+    parser.add_argument('--generate', type=int, metavar='CHORDS',
+                        help="print the best progressions of this many chords in --tonic/--mode/--style and exit")
+    parser.add_argument('--beam', type=int, default=16,
+                        help="beam width for --generate (default: 16)")
+    parser.add_argument('--top', type=int, default=5,
+                        help="how many progressions --generate prints (default: 5)")
+    parser.add_argument('--render', metavar='DIR',
+                        help="with --generate: write the --top progressions (and any --variations) as MIDI files "
+                             "into DIR instead of printing them")
+    parser.add_argument('--variations', type=int, metavar='N',
+                        help="--render N more progressions, each a seeded walk through the suggestions "
+                             "(seeds --seed, --seed + 1, ...)")
+    parser.add_argument('--tempo', type=float, metavar='BPM',
+                        help="--render tempo (default: 100)")
+    parser.add_argument('--rhythm', nargs='+', choices=list(rhythm_patterns), metavar='PATTERN',
+                        help=f"--render rhythm pattern(s), taken in turn per file: {', '.join(rhythm_patterns)} "
+                             f"(default: the style's)")
+    parser.add_argument('--serve', metavar='ADDRESS',
+                        help="answer NDJSON requests on a socket: unix:/path/to.sock, host:port or port")
+    parser.add_argument('--multi', action='store_true',
+                        help="listen to several ports at once, tracking every (port, channel) separately")
+    parser.add_argument('--ports', type=int, nargs='+', metavar='N',
+                        help="input port numbers for --multi (default: all)")
+    parser.add_argument('--stream', action='append', default=[], metavar='PORT:CH=TONIC:MODE[:STYLE]',
+                        help="per-stream key for --multi, e.g. 1:10=D:dorian:jazz (repeatable)")
+    parser.add_argument('--auto-key', action='store_true',
+                        help="live/--multi: detect the tonic and mode from the notes instead of asking (needs numpy)")
+    parser.add_argument('--output', default='loopMIDI', metavar='NAME',
+                        help="live/--multi: thru goes to the first output port whose name contains NAME "
+                             "(default: loopMIDI)")
+    parser.add_argument('--output-api', default='pygame', choices=['pygame', 'mido'],
+                        help="open --output through pygame.midi or through mido's backend (default: pygame)")
+    parser.add_argument('--thru-buffer', type=int, default=1024, metavar='EVENTS',
+                        help="live/--multi: thru events that can wait for the writer thread (default: 1024)")
+    parser.add_argument('--when-full', default='drop-on', choices=THRU_POLICIES,
+                        help="what thru does with a full buffer: drop new note-ons but keep note-offs, "
+                             "overwrite the oldest event, or block input until there's room (default: drop-on)")
+    parser.add_argument('--record', metavar='FILE',
+                        help="live/--multi: log every incoming message to FILE for --replay")
+    parser.add_argument('--replay', metavar='FILE',
+                        help="feed a --record log through the live pipeline (in --tonic/--mode/--style) and exit")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="--replay pace: 1 = as recorded, 2 = twice as fast, 0 = flat out (default: 1)")
+    parser.add_argument('--free-run', action='store_true',
+                        help="--replay without waiting for each message to be handled, so the analyzer can "
+                             "fall behind and skip states (updates may differ run to run)")
+    parser.add_argument('--instrument', action='store_true',
+                        help="live mode: time each stage and print latency percentiles on exit")
+    parser.add_argument('--debounce', type=float, default=0.0, metavar='MS',
+                        help="live mode: wait this long for rolled chords to settle before naming them")
+    parser.add_argument('--dashboard', action='store_true',
+                        help="live/--replay: a full-screen view redrawn at --fps instead of a printout per chord "
+                             "(needs a terminal)")
+    parser.add_argument('--fps', type=float, default=30,
+                        help="--dashboard frame rate cap (default: 30)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="processes for --analyze/--train/--render (default: one per CPU)")
+    parser.add_argument('--tonic', default='C',
+                        help="tonic for --analyze/--train/--generate/--multi/--serve/--replay (default: C)")
+    parser.add_argument('--mode', default='ionian', choices=list(mode_intervals),
+                        help="mode for --analyze/--train/--generate/--multi/--serve/--replay (default: ionian)")
+    parser.add_argument('--style', default='pop', choices=list(style_rules),
+                        help="suggestion style for --analyze/--generate/--multi/--serve/--replay (default: pop)")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="random seed for suggestions in --analyze/--replay/--render (default: 0)")
+    args = parser.parse_args(argv)
+
+    if args.tonic not in pitch_classes:
+        parser.error(f"unknown tonic {args.tonic!r}")
+    if args.serve:
+        try:
+            parse_address(args.serve)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.analyze and not os.path.isdir(args.analyze):
+        parser.error(f"--analyze needs a directory: {args.analyze} isn't one")
+    if args.render and args.generate is None:
+        parser.error("--render needs --generate CHORDS")
+    if args.generate is not None:
+        # The server's lower bounds: a progression needs room for a cadence, a search needs a beam
+        for option, field in (('generate', 'length'), ('beam', 'beam'), ('top', 'top')):
+            low = SERVER_GENERATE_LIMITS[field][0]
+            if getattr(args, option) < low:
+                parser.error(f"--{option} must be at least {low}")
+    for option in ('variations', 'tempo', 'rhythm'):
+        if getattr(args, option) is not None and not args.render:
+            parser.error(f"--{option} needs --render DIR")
+    if args.tempo is not None and args.tempo <= 0:
+        parser.error("--tempo must be more than 0 BPM")
+
+    if args.train:
+        if not args.model:
+            parser.error("--train needs --model FILE to write to")
+        try:
+            files = train_progression_model(args.train, args.model, args.tonic, args.mode, args.order, args.workers)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"📈 Counted {files} file(s) into {args.model} ({args.tonic} {args.mode})", file=sys.stderr)
+        return
+
+    try:
+        model = load_progression_model(args.model) if args.model else None
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    output = dict(port_name=args.output, api=args.output_api, capacity=args.thru_buffer, when_full=args.when_full)
+    if args.dashboard and args.fps <= 0:
+        parser.error("--fps has to be more than 0")
+    # Escape codes only mean something to a terminal; piped output keeps the plain printout
+    dashboard = args.fps if args.dashboard and sys.stdout.isatty() else None
+    if args.serve:
+        run_server(args.serve, args.tonic, args.mode, args.style, model)
+    elif args.replay:
+        try:
+            run_replay(args.replay, args.tonic, args.mode, args.style, args.speed, args.seed, args.instrument,
+                       args.debounce / 1000, model, args.auto_key, lockstep=not args.free_run,
+                       dashboard=dashboard)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    elif args.generate is not None and args.render:
+        start = time.perf_counter()
+        tempo = 100 if args.tempo is None else args.tempo
+        files, events = render_progressions(args.render, args.tonic, args.mode, args.style, args.generate,
+                                            args.top, args.beam, args.variations or 0, tempo, args.rhythm or (),
+                                            args.seed, args.workers, model_path=args.model, rules=args.rules)
+        print(f"🎹 Rendered {files} file(s), {events:,} events, into {args.render} "
+              f"in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+    elif args.generate is not None:
+        print(f"🎼 {args.tonic} {args.mode.replace('_', ' ').capitalize()}, {args.style}, {args.generate} chords:")
+        print_progressions(generate_progressions(args.tonic, args.mode, args.style, args.generate,
+                                                 args.beam, args.top, model=model), args.tonic in flat_keys)
+    elif args.analyze:
+        analyze_directory(args.analyze, args.tonic, args.mode, args.style, args.workers, args.seed,
+                          model_path=args.model, rules=args.rules)
+    elif args.multi:
+        run_multi(args.ports, args.stream, args.tonic, args.mode, args.style, instrument=args.instrument,
+                  model=model, auto_key=args.auto_key, record=args.record, output=output)
+    else:
+        run_live(instrument=args.instrument, debounce=args.debounce / 1000, model=model, auto_key=args.auto_key,
+                 record=args.record, output=output, dashboard=dashboard)
+
+if __name__ == '__main__':
+    main()